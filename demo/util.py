@@ -1,5 +1,6 @@
 import json
 import os
+from time import sleep
 
 import boto3
 from pymongo import MongoClient
@@ -32,7 +33,10 @@ def get_api_key(partner_name: str) -> str:
 def send_work_request(partner_name: str, key: str, pathogen: str, job: str):
 	auth = HTTPBasicAuth(partner_name, key)
 	url = f"{GH_WORK_REQUEST_URL}/{pathogen}/{job}"
-	_ = requests.get(url, auth=auth)
+	response = requests.get(url, auth=auth)
+	job_url = f"{GH_WORK_REQUEST_URL}/jobs/{response.json().get('id')}"
+	while requests.get(job_url, auth=auth).json().get("status") not in ("succeeded", "failed"):
+		sleep(2)
 
 
 def get_data(query: str, key: str) -> list[dict]:
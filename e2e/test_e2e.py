@@ -182,7 +182,15 @@ def send_work_request(partner_name: str, key: str, pathogen: str, job: str) -> N
 
     auth = HTTPBasicAuth(partner_name, key)
     url = f"{GH_WORK_REQUEST_URL}/{pathogen}/{job}"
-    _ = requests.get(url, auth=auth)
+    response = requests.get(url, auth=auth)
+    job_url = f"{GH_WORK_REQUEST_URL}/jobs/{response.json().get('id')}"
+    for _ in range(RETRIES):
+        if requests.get(job_url, auth=auth).json().get("status") in (
+            "succeeded",
+            "failed",
+        ):
+            return
+        sleep(WAIT_TIME)
 
 
 def get_gh_db_data(collection_name: str) -> list:
@@ -3,24 +3,56 @@ G.h federated system server
 Receives and delegates requests for work, publishes messages about data
 """
 
+from concurrent.futures import (
+    Future,
+    ThreadPoolExecutor,
+    TimeoutError as FutureTimeoutError,
+)
+import functools
+import hashlib
+import hmac
+import json
 import logging
 import os
+from tempfile import NamedTemporaryFile
+import threading
+from time import sleep
 
-import boto3
-from flask import Flask
+from botocore.exceptions import ClientError
+from flask import Flask, request
 from flask_httpauth import HTTPBasicAuth
 from google.protobuf.json_format import MessageToDict
 import pika
-
-from aws import get_jwt, store_data_in_s3, store_file_in_s3, get_certificate
-from db import store_data_in_db, get_curation_data
+import pyarrow.parquet as pq
+
+from arrow_cases import clean_cases_table, iter_case_batches, read_cases
+from aws import (
+    store_data_in_s3,
+    store_file_in_s3,
+    invalidate_certificate,
+    get_secret,
+)
+from cases_pb2 import CaseEncoding
+from db import (
+    store_data_in_db,
+    get_curation_data,
+    submit_job,
+    claim_job,
+    update_job,
+    get_job,
+)
 from graphics import create_plot
-from grpc_client import get_credentials, get_partner_cases, get_partner_rt_estimates
+from publisher import AMQPPublisher
+from grpc_client import stream_partner_cases, get_partner_rt_estimates
 from util import setup_logger, cleanup_file, clean_cases_data, clean_estimates_data
 from constants import (
     PathogenConfig,
     Partner,
     AMQP_CONFIG,
+    PUBLISHER_CHANNELS,
+    PUBLISHER_RECONNECT_WAIT,
+    PUBLISH_TIMEOUT,
+    DB_BATCH_SIZE,
     PATHOGEN_JOBS,
     PATHOGEN_DATA_SOURCES,
     PATHOGENS,
@@ -28,8 +60,21 @@ from constants import (
     GET_CASES_JOB,
     ESTIMATE_RT_JOB,
     RT_ESTIMATES_FOLDER,
-    LOCALSTACK_URL,
-    AWS_REGION,
+    RT_PARAMS,
+    CASE_KEY_FIELDS,
+    PARTNER_FIELD,
+    CASES_ENCODING,
+    CASES_PARQUET,
+    RT_KEY_FIELDS,
+    PARTNER_WORKERS,
+    PARTNER_TIMEOUT,
+    JOB_WORKERS,
+    JOB_REUSE_WINDOW,
+    JOB_TIMEOUT,
+    JOB_SUCCEEDED,
+    JOB_FAILED,
+    PARTNERS,
+    CERTIFICATE_EVENT_USERS,
 )
 
 
@@ -42,41 +87,70 @@ FLASK_DEBUG = os.environ.get("FLASK_DEBUG", False)
 
 AUTO_APPROVE_ROLE = "senior"
 
+JOB_RETRY_WAIT_TIME = 5
 
-def publish_message(message: str, pathogen_config: PathogenConfig) -> None:
+PUBLISHER = AMQPPublisher(
+    AMQP_CONFIG.host, PUBLISHER_CHANNELS, PUBLISHER_RECONNECT_WAIT, PUBLISH_TIMEOUT
+)
+
+CASES_ENCODING_VALUE = CaseEncoding.Value(f"CASE_ENCODING_{CASES_ENCODING.upper()}")
+
+
+def publish_message(message: str, pathogen_config: PathogenConfig) -> Future:
     """
-    Publish a message for a given pathogen
+    Publish a message for a given pathogen, without waiting for the broker
 
     Args:
         message (str): The message body for publication
         pathogen_config (PathogenConfig): The configuration for the pathogen, including exchange, routing, and queue
+
+    Returns:
+        Future: Resolved once the broker confirms the message
     """
 
     logging.debug(
         f"Publishing message to exchange {pathogen_config.topic_exchange} with routing key {pathogen_config.topic_route}"
     )
-    connection = pika.BlockingConnection(
-        pika.ConnectionParameters(host=AMQP_CONFIG.host)
-    )
-    channel = connection.channel()
-    channel.exchange_declare(
-        exchange=pathogen_config.topic_exchange, exchange_type="topic"
+    future = PUBLISHER.publish(
+        pathogen_config.topic_exchange,
+        "topic",
+        pathogen_config.topic_route,
+        pathogen_config.topic_queue,
+        message,
     )
-    channel.queue_declare(queue=pathogen_config.topic_queue, durable=True)
-    # TODO: ack_nack_callback
-    channel.confirm_delivery()
-    props = pika.BasicProperties(content_type="text/plain")
+
+    def log_result(future: Future) -> None:
+        if future.cancelled():
+            logging.warning(f"Message {message} cancelled")
+        elif future.exception():
+            logging.error(f"Message {message} not published: {future.exception()}")
+        else:
+            logging.debug(f"Message {message} published")
+
+    future.add_done_callback(log_result)
+    return future
+
+
+def publish_message_and_wait(message: str, pathogen_config: PathogenConfig) -> None:
+    """
+    Publish a message for a given pathogen, and wait for the broker to confirm it
+
+    Args:
+        message (str): The message body for publication
+        pathogen_config (PathogenConfig): The configuration for the pathogen, including exchange, routing, and queue
+
+    Raises:
+        FutureTimeoutError: The broker should confirm the message within the publish timeout
+        MessageNackedError: The broker should accept the message
+        MessageReturnedError: The broker should route the message
+    """
+
+    future = publish_message(message, pathogen_config)
     try:
-        channel.basic_publish(
-            exchange=pathogen_config.topic_exchange,
-            routing_key=pathogen_config.topic_route,
-            body=message,
-            properties=props,
-            mandatory=True,
-        )
-        logging.debug(f"Message {message} published")
-    except Exception:
-        logging.exception(f"Message {message} not published")
+        future.result(timeout=PUBLISH_TIMEOUT)
+    except FutureTimeoutError:
+        # Messages not sent yet are dropped, so they are not published after the job fails
+        future.cancel()
         raise
 
 
@@ -112,65 +186,127 @@ def add_curation_data(
 
     logging.debug("Adding curation data")
     name = curation_data.get("name", partner_name)
-    data_to_add = {"createdBy": name}
+    data_to_add = {"createdBy": name, PARTNER_FIELD: partner_name}
     if auto_approve:
         data_to_add["verifiedBy"] = name
     for data in cleaned_data:
         data.update(data_to_add)
 
 
-def run_get_cases_job(
-    pathogen_config: PathogenConfig, partner: Partner, metadata: list[tuple]
-):
+def run_get_cases_job(pathogen_config: PathogenConfig, partner: Partner) -> int:
     """
-    Get cases for a pathogen from a partner
+    Get cases for a pathogen from a partner, processing them one chunk at a time
 
     Args:
         pathogen_config (PathogenConfig): Pathogen configuration data
         partner (Partner): Partner configuration data
-        metadata (list[tuple]): gRPC request metadata
+
+    Returns:
+        int: The number of cases stored
     """
 
     logging.info(f"Getting cases for pathogen {pathogen_config.name}")
-    proto_cases = get_partner_cases(pathogen_config.name, partner, metadata)
-    dict_cases = MessageToDict(proto_cases, preserving_proto_field_name=True).get(
-        "cases"
-    )
-    if not dict_cases:
-        logging.warning(
-            f"No cases obtained from partner {partner.name} for pathogen {pathogen_config.name}"
-        )
-        return
-    logging.debug(f"New cases: {dict_cases}")
-    cleaned_cases = clean_cases_data(dict_cases)
-    logging.debug(f"Cleaned new cases: {cleaned_cases}")
     curation_data = get_curation_data(partner.name)
     auto_approve = should_auto_approve(curation_data)
-    store_data_in_s3(
-        cleaned_cases, pathogen_config.s3_bucket, f"{pathogen_config.name}.json"
-    )
-    add_curation_data(partner.name, curation_data, auto_approve, cleaned_cases)
-    store_data_in_db(cleaned_cases, pathogen_config.cases_collection)
+    num_cases = 0
+    # Cases are written to S3 as one JSON array, built up on disk
+    cases_file = NamedTemporaryFile("w", suffix=".json", delete=False)
+    # Arrow cases can also be written as Parquet, one row group per chunk
+    parquet_file_name = f"{os.path.splitext(cases_file.name)[0]}.parquet"
+    parquet_writer = None
+    try:
+        try:
+            with cases_file:
+                cases_file.write("[")
+                for chunk in stream_partner_cases(
+                    pathogen_config.name,
+                    partner,
+                    timeout=PARTNER_TIMEOUT,
+                    encoding=CASES_ENCODING_VALUE,
+                ):
+                    if chunk.arrow_cases:
+                        table = clean_cases_table(read_cases(chunk.arrow_cases))
+                        if CASES_PARQUET:
+                            if parquet_writer is None:
+                                parquet_writer = pq.ParquetWriter(
+                                    parquet_file_name, table.schema
+                                )
+                            parquet_writer.write_table(table)
+                        # Documents for the database are built one record batch at a time
+                        case_batches = iter_case_batches(table, DB_BATCH_SIZE)
+                    else:
+                        # Partners send case messages if they do not support the encoding
+                        dict_cases = MessageToDict(
+                            chunk, preserving_proto_field_name=True
+                        ).get("cases", [])
+                        case_batches = [clean_cases_data(dict_cases)]
+                    for cleaned_cases in case_batches:
+                        if not cleaned_cases:
+                            continue
+                        logging.debug(f"Cleaned {len(cleaned_cases)} new cases")
+                        for case in cleaned_cases:
+                            if num_cases:
+                                cases_file.write(",")
+                            json.dump(case, cases_file)
+                            num_cases += 1
+                        add_curation_data(
+                            partner.name, curation_data, auto_approve, cleaned_cases
+                        )
+                        store_data_in_db(
+                            cleaned_cases,
+                            pathogen_config.cases_collection,
+                            CASE_KEY_FIELDS,
+                        )
+                cases_file.write("]")
+        finally:
+            # Closing writes the Parquet footer, so the file is complete before upload
+            if parquet_writer is not None:
+                parquet_writer.close()
+        if not num_cases:
+            logging.warning(
+                f"No cases obtained from partner {partner.name} for pathogen {pathogen_config.name}"
+            )
+            return 0
+        store_file_in_s3(
+            pathogen_config.s3_bucket,
+            "",
+            cases_file.name,
+            f"{pathogen_config.name}.json",
+        )
+        if parquet_writer is not None:
+            store_file_in_s3(
+                pathogen_config.s3_bucket,
+                "",
+                parquet_file_name,
+                f"{pathogen_config.name}.parquet",
+            )
+    finally:
+        cleanup_file(cases_file.name)
+        cleanup_file(parquet_file_name)
+    logging.info(f"Stored {num_cases} new cases")
     if auto_approve:
-        publish_message("New cases stored", pathogen_config)
+        publish_message_and_wait("New cases stored", pathogen_config)
     else:
         logging.debug("New cases require manual approval")
+    return num_cases
 
 
-def run_estimate_rt_job(
-    pathogen_config: PathogenConfig, partner: Partner, metadata: list[tuple]
-):
+def run_estimate_rt_job(pathogen_config: PathogenConfig, partner: Partner) -> int:
     """
     Get R(t) estimates for a pathogen from a partner
 
     Args:
         pathogen_config (PathogenConfig): Pathogen configuration data
         partner (Partner): Partner configuration data
-        metadata (list[tuple]): gRPC request metadata
+
+    Returns:
+        int: The number of R(t) estimates stored
     """
 
     logging.info(f"Estimating R(t) for pathogen {pathogen_config.name}")
-    proto_estimates = get_partner_rt_estimates(pathogen_config.name, partner, metadata)
+    proto_estimates = get_partner_rt_estimates(
+        pathogen_config.name, partner, timeout=PARTNER_TIMEOUT
+    )
     dict_estimates = MessageToDict(
         proto_estimates, including_default_value_fields=True
     ).get("estimates")
@@ -178,7 +314,7 @@ def run_estimate_rt_job(
         logging.warning(
             f"No R(t) estimates obtained from partner {partner.name} for pathogen {pathogen_config.name}"
         )
-        return
+        return 0
     logging.debug(f"New estimates: {dict_estimates}")
     cleaned_estimates = clean_estimates_data(dict_estimates)
     logging.debug(f"Cleaned new estimates: {cleaned_estimates}")
@@ -188,39 +324,228 @@ def run_estimate_rt_job(
         cleaned_estimates, pathogen_config.s3_bucket, f"{pathogen_config.name}_rt.json"
     )
     add_curation_data(partner.name, curation_data, auto_approve, cleaned_estimates)
-    store_data_in_db(cleaned_estimates, pathogen_config.rt_collection)
+    store_data_in_db(cleaned_estimates, pathogen_config.rt_collection, RT_KEY_FIELDS)
     file_name = create_plot(cleaned_estimates, partner.location)
     store_file_in_s3(pathogen_config.s3_bucket, RT_ESTIMATES_FOLDER, file_name)
     if auto_approve:
-        publish_message("New R(t) estimates stored", pathogen_config)
+        publish_message_and_wait("New R(t) estimates stored", pathogen_config)
     else:
         logging.debug("New R(t) estimates requires manual approval")
     cleanup_file(file_name)
+    return len(cleaned_estimates)
 
 
-def run_jobs(pathogen_name: str, job_name: str):
+def run_partner_job(pathogen_name: str, job_name: str, partner: Partner) -> int:
     """
-    Run a requested job for a given pathogen
+    Run a requested job for a given pathogen with one partner
 
     Args:
         pathogen_name (str): Name of the pathogen
         job_name (str): Name of the job
+        partner (Partner): Partner configuration data
+
+    Returns:
+        int: The number of records stored
+    """
+
+    logging.info(f"Running {job_name} for {pathogen_name} with partner {partner.name}")
+    pathogen_config = PATHOGEN_DATA_DESTINATIONS.get(pathogen_name)
+    if job_name == GET_CASES_JOB:
+        return run_get_cases_job(pathogen_config, partner)
+    elif job_name == ESTIMATE_RT_JOB:
+        return run_estimate_rt_job(pathogen_config, partner)
+    return 0
+
+
+def run_jobs(pathogen_name: str, job_name: str) -> dict[str, int | Exception]:
+    """
+    Run a requested job for a given pathogen on all its partners in parallel
+
+    Args:
+        pathogen_name (str): Name of the pathogen
+        job_name (str): Name of the job
+
+    Returns:
+        dict[str, int | Exception]: The number of records stored, or the error running the job, by partner name
     """
 
     partners = PATHOGEN_DATA_SOURCES.get(pathogen_name)
+    if not partners:
+        logging.warning(f"No partners for {pathogen_name}, not running {job_name}")
+        return {}
     logging.info(f"Running {job_name} for {pathogen_name} on partners {partners}")
-    for partner in partners:
-        logging.info(
-            f"Running {job_name} for {pathogen_name} with partner {partner.name}"
+    results = {}
+    with ThreadPoolExecutor(
+        max_workers=min(PARTNER_WORKERS, len(partners)),
+        thread_name_prefix=f"{pathogen_name}_{job_name}",
+    ) as executor:
+        futures = {
+            partner.name: executor.submit(
+                run_partner_job, pathogen_name, job_name, partner
+            )
+            for partner in partners
+        }
+        for partner_name, future in futures.items():
+            try:
+                results[partner_name] = future.result()
+            except Exception as e:
+                logging.exception(
+                    f"Could not run {job_name} for {pathogen_name} with partner {partner_name}"
+                )
+                results[partner_name] = e
+    return results
+
+
+def declare_job_queue(channel: pika.adapters.blocking_connection.BlockingChannel):
+    """
+    Declare the durable exchange and queue for submitted jobs
+
+    Args:
+        channel (BlockingChannel): AMQP channel
+    """
+
+    channel.exchange_declare(
+        exchange=AMQP_CONFIG.exchange, exchange_type="direct", durable=True
+    )
+    channel.queue_declare(queue=AMQP_CONFIG.queue, durable=True)
+    channel.queue_bind(
+        queue=AMQP_CONFIG.queue,
+        exchange=AMQP_CONFIG.exchange,
+        routing_key=AMQP_CONFIG.route,
+    )
+
+
+def get_job_key(pathogen_name: str, job_name: str) -> str:
+    """
+    Identify jobs that would do the same work
+
+    Args:
+        pathogen_name (str): Name of the pathogen
+        job_name (str): Name of the job
+
+    Returns:
+        str: The job key
+    """
+
+    parameters = RT_PARAMS if job_name == ESTIMATE_RT_JOB else {}
+    data = json.dumps([pathogen_name, job_name, parameters], sort_keys=True)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def enqueue_job(job_id: str, pathogen_name: str, job_name: str) -> None:
+    """
+    Queue a submitted job to be run in the background
+
+    Args:
+        job_id (str): The job ID
+        pathogen_name (str): Name of the pathogen
+        job_name (str): Name of the job
+    """
+
+    logging.debug(f"Queueing job {job_id}")
+    connection = pika.BlockingConnection(
+        pika.ConnectionParameters(host=AMQP_CONFIG.host)
+    )
+    try:
+        channel = connection.channel()
+        declare_job_queue(channel)
+        channel.confirm_delivery()
+        channel.basic_publish(
+            exchange=AMQP_CONFIG.exchange,
+            routing_key=AMQP_CONFIG.route,
+            body=json.dumps({"id": job_id, "pathogen": pathogen_name, "job": job_name}),
+            properties=pika.BasicProperties(
+                content_type="application/json",
+                delivery_mode=pika.DeliveryMode.Persistent,
+            ),
+            mandatory=True,
         )
-        token = get_jwt()
-        certificate = get_certificate(partner.domain_name)
-        credentials = get_credentials(token, certificate)
-        pathogen_config = PATHOGEN_DATA_DESTINATIONS.get(pathogen_name)
-        if job_name == GET_CASES_JOB:
-            run_get_cases_job(pathogen_config, partner, credentials)
-        elif job_name == ESTIMATE_RT_JOB:
-            run_estimate_rt_job(pathogen_config, partner, credentials)
+    finally:
+        connection.close()
+
+
+def run_queued_job(message: dict) -> None:
+    """
+    Run a queued job, recording its status and results
+
+    Jobs that are running or finished already, such as redelivered jobs, are skipped.
+    Errors are recorded on the job, since nothing waits on its result.
+
+    Args:
+        message (dict): The job ID, pathogen name and job name
+    """
+
+    job_id = message.get("id")
+    try:
+        if claim_job(job_id, JOB_TIMEOUT) is None:
+            logging.warning(f"Job {job_id} already running or finished, skipping")
+            return
+        results = run_jobs(message["pathogen"], message["job"])
+        job_results = {
+            name: {"error": str(result)}
+            if isinstance(result, Exception)
+            else {"stored": result}
+            for name, result in results.items()
+        }
+        failed = all(isinstance(result, Exception) for result in results.values())
+        update_job(job_id, JOB_FAILED if failed else JOB_SUCCEEDED, job_results)
+    except Exception as e:
+        logging.exception(f"Job {job_id} failed")
+        try:
+            update_job(job_id, JOB_FAILED, {"error": str(e)})
+        except Exception:
+            # Left unfinished, the job is failed once it outlives the job timeout
+            logging.exception(f"Could not record failure of job {job_id}")
+
+
+def consume_jobs() -> None:
+    """
+    Run queued jobs in the background, up to JOB_WORKERS at a time
+
+    Jobs are acknowledged once finished, so jobs interrupted by a restart are delivered
+    again. Running jobs still within their lease, the job timeout, are not run twice,
+    and are failed as stale once it expires.
+    """
+
+    executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+    while True:
+        try:
+            connection = pika.BlockingConnection(
+                pika.ConnectionParameters(host=AMQP_CONFIG.host)
+            )
+            channel = connection.channel()
+            declare_job_queue(channel)
+            channel.basic_qos(prefetch_count=JOB_WORKERS)
+
+            def ack(delivery_tag: int) -> None:
+                try:
+                    channel.basic_ack(delivery_tag=delivery_tag)
+                except Exception:
+                    logging.exception(f"Could not acknowledge job {delivery_tag}")
+
+            def on_message(ch, method, properties, body):
+                try:
+                    message = json.loads(body)
+                except ValueError:
+                    logging.exception(f"Discarding malformed job {body}")
+                    ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+                    return
+                future = executor.submit(run_queued_job, message)
+                # Channels are not thread safe, so jobs are acknowledged on this thread
+                future.add_done_callback(
+                    lambda _: connection.add_callback_threadsafe(
+                        functools.partial(ack, method.delivery_tag)
+                    )
+                )
+
+            channel.basic_consume(
+                queue=AMQP_CONFIG.queue, on_message_callback=on_message
+            )
+            logging.info("Waiting for jobs")
+            channel.start_consuming()
+        except pika.exceptions.AMQPError:
+            logging.exception("Lost connection to job queue, reconnecting")
+            sleep(JOB_RETRY_WAIT_TIME)
 
 
 @AUTH.verify_password
@@ -236,19 +561,20 @@ def verify_password(username: str, password: str) -> bool:
         bool: True if correct, False otherwise
     """
 
-    secrets_client = None
-    if LOCALSTACK_URL:
-        secrets_client = boto3.client(
-            "secretsmanager", endpoint_url=LOCALSTACK_URL, region_name=AWS_REGION
-        )
-    else:
-        secrets_client = boto3.client("secretsmanager", region_name=AWS_REGION)
     # FIXME: brittle
-    response = secrets_client.get_secret_value(SecretId=f"{username}_api_key_password")
-    secret = response.get("SecretString", "")
-    if secret == password:
-        return True
-    return False
+    secret_id = f"{username}_api_key_password"
+    try:
+        secret, version_id = get_secret(secret_id)
+        if hmac.compare_digest(secret.encode("utf-8"), password.encode("utf-8")):
+            return True
+        # Partners rotate their keys, so check for a newer version before rejecting
+        secret, current_version_id = get_secret(secret_id, refresh=True)
+    except ClientError:
+        logging.exception(f"Could not get API key for user {username}")
+        return False
+    if current_version_id == version_id:
+        return False
+    return hmac.compare_digest(secret.encode("utf-8"), password.encode("utf-8"))
 
 
 @APP.route("/health")
@@ -263,17 +589,51 @@ def healthcheck() -> tuple[str, int]:
     return "OK", 200
 
 
+@APP.route("/events/certificates", methods=["POST"])
+@AUTH.login_required
+def certificate_event() -> tuple[str, int]:
+    """
+    Drop cached certificates named in an ACM event, such as after rotation
+
+    Partners may only report events for their own domain. Certificate event users
+    may report events for any domain or certificate ARN.
+
+    Returns:
+        tuple: Message + HTTP status code
+    """
+
+    event = request.get_json(silent=True) or {}
+    domain_name = event.get("detail", {}).get("CommonName", "")
+    certificate_arns = event.get("resources", [])
+    user_name = AUTH.current_user()
+    logging.info(
+        f"Certificate event {event.get('detail-type')} for {domain_name} {certificate_arns} from {user_name}"
+    )
+    if user_name not in CERTIFICATE_EVENT_USERS:
+        partner = next((p for p in PARTNERS if p.name == user_name), None)
+        if partner is None or not domain_name or domain_name != partner.domain_name:
+            return (
+                f"User {user_name} cannot report events for domain {domain_name}",
+                403,
+            )
+        # ARNs could name other partners' certificates
+        certificate_arns = []
+    invalidate_certificate(domain_name, certificate_arns)
+    return "OK", 200
+
+
 @APP.route("/<string:pathogen_name>/<string:job_name>")
 @AUTH.login_required
-def request_work(pathogen_name: str, job_name: str) -> tuple[str, int]:
-    """Summary
+def request_work(pathogen_name: str, job_name: str) -> tuple[dict | str, int]:
+    """
+    Submit a job to be run in the background
 
     Args:
         pathogen_name (str): Name of the pathogen
         job_name (str): Name of the job
 
     Returns:
-        tuple: Message + HTTP status code
+        tuple: Job ID or message + HTTP status code
     """
 
     if pathogen_name not in PATHOGENS:
@@ -282,11 +642,53 @@ def request_work(pathogen_name: str, job_name: str) -> tuple[str, int]:
         return f"Job {job_name} not available", 404
     if pathogen_name not in PATHOGEN_JOBS.get(job_name):
         return f"Job {job_name} not available for pathogen {pathogen_name}", 404
-    run_jobs(pathogen_name, job_name)
-    return f"Submitted job {job_name} for pathogen {pathogen_name}", 200
+    job, created = submit_job(
+        pathogen_name,
+        job_name,
+        request.authorization.username,
+        get_job_key(pathogen_name, job_name),
+        JOB_REUSE_WINDOW,
+        JOB_TIMEOUT,
+    )
+    job_id = job["_id"]
+    if created:
+        try:
+            enqueue_job(job_id, pathogen_name, job_name)
+        except Exception as e:
+            logging.exception(f"Could not queue job {job_id}")
+            update_job(job_id, JOB_FAILED, {"error": str(e)})
+            return f"Could not submit job {job_name} for pathogen {pathogen_name}", 503
+    else:
+        logging.info(f"Request for {job_name} for {pathogen_name} shares job {job_id}")
+    return {"id": job_id, "status": job["status"]}, 202
+
+
+@APP.route("/jobs/<string:job_id>")
+@AUTH.login_required
+def job_status(job_id: str) -> tuple[dict | str, int]:
+    """
+    Get the status of a submitted job
+
+    Args:
+        job_id (str): The job ID
+
+    Returns:
+        tuple: Job status or message + HTTP status code
+    """
+
+    job = get_job(job_id)
+    if not job:
+        return f"Job {job_id} not found", 404
+    job["id"] = job.pop("_id")
+    for field in ("submittedAt", "updatedAt"):
+        if field in job:
+            job[field] = job[field].isoformat()
+    return job, 200
 
 
 if __name__ == "__main__":
     setup_logger()
+    logging.info("Starting job consumer")
+    threading.Thread(target=consume_jobs, daemon=True).start()
     logging.info("Starting server")
     APP.run(FLASK_HOST, FLASK_PORT, debug=FLASK_DEBUG)
@@ -0,0 +1,85 @@
+"""
+Decoding of case data sent by partners as Arrow IPC streams
+"""
+
+from collections.abc import Iterator
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from constants import CASE_DATE_FORMAT, CASE_ID_FIELD
+
+
+def read_cases(data: bytes) -> pa.Table:
+    """
+    Read cases from an Arrow IPC stream
+
+    Args:
+        data (bytes): The Arrow IPC stream
+
+    Returns:
+        pa.Table: The cases, one column per field
+    """
+
+    return pa.ipc.open_stream(data).read_all()
+
+
+def table_to_cases(table: pa.Table) -> list[dict]:
+    """
+    Convert a table of cases to case data, as if decoded from case messages
+
+    Args:
+        table (pa.Table): The cases, one column per field
+
+    Returns:
+        list[dict]: Case data, without unset fields
+    """
+
+    columns = []
+    for name in table.column_names:
+        column = table.column(name)
+        if pa.types.is_date(column.type):
+            # Dates are formatted once per column, rather than once per case
+            column = pc.strftime(
+                column.cast(pa.timestamp("s")), format=CASE_DATE_FORMAT
+            )
+        columns.append(column.to_pylist())
+    return [
+        {k: v for k, v in zip(table.column_names, row) if v is not None}
+        for row in zip(*columns)
+    ]
+
+
+def clean_cases_table(table: pa.Table) -> pa.Table:
+    """
+    Clean a table of cases, as clean_cases_data does for case data
+
+    Args:
+        table (pa.Table): The cases, one column per field
+
+    Returns:
+        pa.Table: Cleaned cases
+    """
+
+    # Document IDs are set by the database
+    return table.rename_columns(
+        [CASE_ID_FIELD if name == "id" else name for name in table.column_names]
+    )
+
+
+def iter_case_batches(table: pa.Table, batch_size: int) -> Iterator[list[dict]]:
+    """
+    Convert a table of cases to case data, one record batch at a time
+
+    The database stores documents, so each case becomes a dict, but only a batch at once.
+
+    Args:
+        table (pa.Table): The cases, one column per field
+        batch_size (int): The maximum number of cases per batch
+
+    Yields:
+        list[dict]: Case data, without unset fields
+    """
+
+    for batch in table.to_batches(max_chunksize=batch_size):
+        yield table_to_cases(pa.Table.from_batches([batch]))
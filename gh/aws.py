@@ -4,17 +4,172 @@ Functions for interacting with AWS resources
 
 import logging
 import json
+import threading
+import time
 
 import boto3
+from botocore.exceptions import ClientError
 
 from constants import (
     LOCALSTACK_URL,
     AWS_REGION,
     COGNITO_USER_NAME,
     COGNITO_USER_PASSWORD,
+    JWT_REFRESH_MARGIN,
+    CERTIFICATE_TTL,
+    SECRET_CACHE_TTL,
+    SECRET_REFRESH_INTERVAL,
 )
 
 
+class TokenCache:
+
+    """
+    Cognito access token, refreshed in the background shortly before it expires
+
+    Attributes:
+        refresh_margin (int): Seconds before expiry that the token is refreshed
+        cognito_client (botocore.client.CognitoIdentityProvider | None): Cognito client, created on first use
+        client_id (str | None): The user pool client ID, looked up on first use
+        access_token (str | None): The access token
+        refresh_token (str | None): The refresh token
+        refresh_at (float): When the access token is due a refresh, in monotonic clock seconds
+        timer (threading.Timer | None): Timer for the next background refresh
+        lock (threading.Lock): Lock for the token and Cognito client
+    """
+
+    def __init__(self, refresh_margin: int):
+        """
+        Constructor for token cache
+
+        Args:
+            refresh_margin (int): Seconds before expiry that the token is refreshed
+        """
+
+        self.refresh_margin = refresh_margin
+        self.cognito_client = None
+        self.client_id = None
+        self.access_token = None
+        self.refresh_token = None
+        self.refresh_at = 0.0
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def get_token(self) -> str:
+        """
+        Get the access token, authenticating if there is no valid token
+
+        Returns:
+            str: The access token
+        """
+
+        with self.lock:
+            if self.access_token is None or time.monotonic() >= self.refresh_at:
+                self.refresh()
+            return self.access_token
+
+    def refresh(self) -> None:
+        """
+        Get a new access token, using the refresh token if there is one
+
+        Must be called with the lock held.
+        """
+
+        if self.cognito_client is None:
+            self.connect()
+        result = None
+        if self.refresh_token:
+            logging.debug("Refreshing JWT")
+            try:
+                result = self.authenticate(
+                    "REFRESH_TOKEN_AUTH", {"REFRESH_TOKEN": self.refresh_token}
+                )
+            except ClientError:
+                logging.warning("Could not refresh JWT, logging in again")
+                self.refresh_token = None
+        if result is None:
+            logging.debug("Getting JWT")
+            result = self.authenticate(
+                "USER_PASSWORD_AUTH",
+                {"USERNAME": COGNITO_USER_NAME, "PASSWORD": COGNITO_USER_PASSWORD},
+            )
+        self.access_token = result.get("AccessToken")
+        # Refreshing does not issue a new refresh token
+        self.refresh_token = result.get("RefreshToken", self.refresh_token)
+        expires_in = result.get("ExpiresIn", 3600)
+        # Short-lived tokens are refreshed halfway through their lifetime
+        refresh_in = expires_in - min(self.refresh_margin, expires_in / 2)
+        self.refresh_at = time.monotonic() + refresh_in
+        self.schedule_refresh(refresh_in)
+
+    def connect(self) -> None:
+        """
+        Create the Cognito client and look up the user pool client ID
+        """
+
+        if LOCALSTACK_URL:
+            logging.debug("Using localstack Cognito service")
+            self.cognito_client = boto3.client(
+                "cognito-idp", endpoint_url=LOCALSTACK_URL, region_name=AWS_REGION
+            )
+        else:
+            self.cognito_client = boto3.client("cognito-idp", region_name=AWS_REGION)
+
+        response = self.cognito_client.list_user_pools(MaxResults=1)
+        logging.debug(f"User pools: {response.get('UserPools')}")
+        pool_id = response.get("UserPools", [])[0].get("Id")
+
+        response = self.cognito_client.list_user_pool_clients(
+            UserPoolId=pool_id, MaxResults=1
+        )
+        self.client_id = response.get("UserPoolClients")[0].get("ClientId")
+
+    def authenticate(self, auth_flow: str, auth_parameters: dict) -> dict:
+        """
+        Authenticate with Cognito
+
+        Args:
+            auth_flow (str): The authentication flow
+            auth_parameters (dict): Parameters for the authentication flow
+
+        Returns:
+            dict: The authentication result
+        """
+
+        response = self.cognito_client.initiate_auth(
+            AuthFlow=auth_flow, AuthParameters=auth_parameters, ClientId=self.client_id
+        )
+        return response.get("AuthenticationResult", {})
+
+    def schedule_refresh(self, delay: float) -> None:
+        """
+        Schedule a background refresh of the access token
+
+        Args:
+            delay (float): Seconds until the refresh
+        """
+
+        if self.timer is not None:
+            self.timer.cancel()
+        self.timer = threading.Timer(max(delay, 0), self.refresh_in_background)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def refresh_in_background(self) -> None:
+        """
+        Refresh the access token, leaving it to the next request if that fails
+        """
+
+        with self.lock:
+            try:
+                self.refresh()
+            except Exception:
+                logging.exception("Could not refresh JWT in the background")
+
+
+TOKEN_CACHE = TokenCache(JWT_REFRESH_MARGIN)
+
+
 def get_jwt() -> str:
     """
     Get the G.h JWT
@@ -23,44 +178,118 @@ def get_jwt() -> str:
         str: The JWT
     """
 
-    logging.debug("Getting JWT")
-    cognito_client = None
-    if LOCALSTACK_URL:
-        logging.debug("Using localstack Cognito service")
-        cognito_client = boto3.client(
-            "cognito-idp", endpoint_url=LOCALSTACK_URL, region_name=AWS_REGION
-        )
-    else:
-        cognito_client = boto3.client("cognito-idp", region_name=AWS_REGION)
+    return TOKEN_CACHE.get_token()
+
+
+class CertificateCache:
+
+    """
+    Partner domain certificates, kept for a time to live or until rotated
+
+    Attributes:
+        ttl (int): Seconds certificates are kept for
+        certificates (dict[str, tuple]): Certificate, ARN and monotonic clock time fetched, by domain name
+        lock (threading.Lock): Lock for certificates
+    """
+
+    def __init__(self, ttl: int):
+        """
+        Constructor for certificate cache
+
+        Args:
+            ttl (int): Seconds certificates are kept for
+        """
+
+        self.ttl = ttl
+        self.certificates = {}
+        self.lock = threading.Lock()
+
+    def get(self, domain_name: str) -> bytes:
+        """
+        Get a certificate, fetching it from ACM if not cached or expired
+
+        Args:
+            domain_name (str): The partner domain name
 
-    response = cognito_client.list_user_pools(MaxResults=1)
-    logging.debug(f"User pools: {response.get('UserPools')}")
-    pool_id = response.get("UserPools", [])[0].get("Id")
+        Returns:
+            bytes: The certificate, or empty bytes if there is none
+        """
 
-    response = cognito_client.list_user_pool_clients(UserPoolId=pool_id, MaxResults=1)
-    client_id = response.get("UserPoolClients")[0].get("ClientId")
+        with self.lock:
+            cached = self.certificates.get(domain_name)
+            if cached and time.monotonic() - cached[2] < self.ttl:
+                return cached[0]
+        certificate, certificate_arn = fetch_certificate(domain_name)
+        # Missing certificates are not cached, so they are found once issued
+        if certificate:
+            with self.lock:
+                self.certificates[domain_name] = (
+                    certificate,
+                    certificate_arn,
+                    time.monotonic(),
+                )
+        return certificate
 
-    response = cognito_client.initiate_auth(
-        AuthFlow="USER_PASSWORD_AUTH",
-        AuthParameters={
-            "USERNAME": COGNITO_USER_NAME,
-            "PASSWORD": COGNITO_USER_PASSWORD,
-        },
-        ClientId=client_id,
-    )
-    token = response.get("AuthenticationResult", {}).get("AccessToken")
+    def invalidate(self, domain_name: str = "", certificate_arn: str = "") -> None:
+        """
+        Drop a rotated certificate, so it is fetched again on next use
 
-    return token
+        Args:
+            domain_name (str, optional): The partner domain name
+            certificate_arn (str, optional): The certificate ARN
+        """
+
+        with self.lock:
+            for domain, (_, arn, _) in list(self.certificates.items()):
+                if (domain_name and domain == domain_name) or (
+                    certificate_arn and arn == certificate_arn
+                ):
+                    logging.info(f"Dropping cached certificate for domain {domain}")
+                    del self.certificates[domain]
+
+
+CERTIFICATE_CACHE = CertificateCache(CERTIFICATE_TTL)
+
+
+def invalidate_certificate(domain_name: str, certificate_arns: list[str]) -> None:
+    """
+    Drop cached certificates, so rotated certificates are fetched on next use
+
+    Args:
+        domain_name (str): The partner domain name
+        certificate_arns (list[str]): Certificate ARNs
+    """
+
+    CERTIFICATE_CACHE.invalidate(domain_name)
+    for certificate_arn in certificate_arns:
+        CERTIFICATE_CACHE.invalidate(certificate_arn=certificate_arn)
 
 
 def get_certificate(domain_name: str) -> bytes:
     """
     Get the partner domain SSL/TLS certificate
 
+    Args:
+        domain_name (str): The partner domain name
+
     Returns:
         bytes: The certificate
     """
 
+    return CERTIFICATE_CACHE.get(domain_name)
+
+
+def fetch_certificate(domain_name: str) -> tuple[bytes, str]:
+    """
+    Fetch the partner domain SSL/TLS certificate from ACM
+
+    Args:
+        domain_name (str): The partner domain name
+
+    Returns:
+        tuple[bytes, str]: The certificate and its ARN
+    """
+
     logging.info(f"Getting certificate from AWS for domain {domain_name}")
     acm_client = None
     if LOCALSTACK_URL:
@@ -80,13 +309,105 @@ def get_certificate(domain_name: str) -> bytes:
 
     if not certificate_arn:
         logging.warning(f"No certificate for domain {domain_name}")
-        return b""
+        return b"", ""
 
     response = acm_client.get_certificate(CertificateArn=certificate_arn)
     cert_str = response.get("Certificate")
     certificate = bytes(cert_str, encoding="utf8")
 
-    return certificate
+    return certificate, certificate_arn
+
+
+class SecretCache:
+
+    """
+    Secrets Manager secrets, with their versions, kept for a time to live
+
+    Forced refreshes of a secret are limited to one per refresh interval.
+
+    Attributes:
+        ttl (int): Seconds secrets are kept for
+        refresh_interval (int): Minimum seconds between forced refreshes of a secret
+        secrets_client (botocore.client.SecretsManager | None): Secrets Manager client, created on first use
+        secrets (dict[str, tuple]): Secret, version ID and monotonic clock time fetched, by secret ID
+        lock (threading.Lock): Lock for secrets and the Secrets Manager client
+    """
+
+    def __init__(self, ttl: int, refresh_interval: int):
+        """
+        Constructor for secret cache
+
+        Args:
+            ttl (int): Seconds secrets are kept for
+            refresh_interval (int): Minimum seconds between forced refreshes of a secret
+        """
+
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.secrets_client = None
+        self.secrets = {}
+        self.lock = threading.Lock()
+
+    def get(self, secret_id: str, refresh: bool = False) -> tuple[str, str]:
+        """
+        Get the current version of a secret, fetching it if not cached, expired, or refreshing
+
+        Args:
+            secret_id (str): The secret ID
+            refresh (bool, optional): Whether to fetch the secret even if cached, unless fetched within the refresh interval
+
+        Returns:
+            tuple[str, str]: The secret and its version ID
+        """
+
+        with self.lock:
+            cached = self.secrets.get(secret_id)
+            if cached:
+                age = time.monotonic() - cached[2]
+                if age < (
+                    min(self.refresh_interval, self.ttl) if refresh else self.ttl
+                ):
+                    return cached[0], cached[1]
+            if self.secrets_client is None:
+                if LOCALSTACK_URL:
+                    self.secrets_client = boto3.client(
+                        "secretsmanager",
+                        endpoint_url=LOCALSTACK_URL,
+                        region_name=AWS_REGION,
+                    )
+                else:
+                    self.secrets_client = boto3.client(
+                        "secretsmanager", region_name=AWS_REGION
+                    )
+            secrets_client = self.secrets_client
+        response = secrets_client.get_secret_value(
+            SecretId=secret_id, VersionStage="AWSCURRENT"
+        )
+        secret = response.get("SecretString", "")
+        version_id = response.get("VersionId", "")
+        if cached and cached[1] != version_id:
+            logging.info(f"Secret {secret_id} rotated to version {version_id}")
+        with self.lock:
+            self.secrets[secret_id] = (secret, version_id, time.monotonic())
+        return secret, version_id
+
+
+SECRET_CACHE = SecretCache(SECRET_CACHE_TTL, SECRET_REFRESH_INTERVAL)
+
+
+def get_secret(secret_id: str, refresh: bool = False) -> tuple[str, str]:
+    """
+    Get the current version of a secret from Secrets Manager
+
+    Args:
+        secret_id (str): The secret ID
+        refresh (bool, optional): Whether to fetch the secret even if cached
+
+    Returns:
+        tuple[str, str]: The secret and its version ID
+    """
+
+    return SECRET_CACHE.get(secret_id, refresh)
 
 
 def store_data_in_s3(data: list, bucket_name: str, file_name: str) -> None:
@@ -113,7 +434,9 @@ def store_data_in_s3(data: list, bucket_name: str, file_name: str) -> None:
     logging.info("Stored data in S3")
 
 
-def store_file_in_s3(bucket_name: str, folder: str, file_name: str) -> None:
+def store_file_in_s3(
+    bucket_name: str, folder: str, file_name: str, key: str = ""
+) -> None:
     """
     Store a file in S3
 
@@ -121,6 +444,7 @@ def store_file_in_s3(bucket_name: str, folder: str, file_name: str) -> None:
         bucket_name (str): The bucket to store it in
         folder (str): The folder to store it in
         file_name (str): The file to store
+        key (str, optional): The key to use in the bucket, instead of the folder and file name
     """
 
     logging.info(f"Storing file {file_name} in bucket {bucket_name}")
@@ -131,7 +455,9 @@ def store_file_in_s3(bucket_name: str, folder: str, file_name: str) -> None:
         else:
             s3 = boto3.client("s3")
         s3.upload_file(
-            Filename=file_name, Bucket=bucket_name, Key=f"{folder}/{file_name}"
+            Filename=file_name,
+            Bucket=bucket_name,
+            Key=key or f"{folder}/{file_name}",
         )
     except Exception:
         logging.exception("An error occurred while trying to store file in S3")
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: cases.proto
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0b\x63\x61ses.proto\"e\n\x0c\x43\x61sesRequest\x12\x10\n\x08pathogen\x18\x01 \x01(\t\x12\x0e\n\x06\x63ursor\x18\x02 \x01(\x05\x12\x12\n\nchunk_size\x18\x03 \x01(\x05\x12\x1f\n\x08\x65ncoding\x18\x04 \x01(\x0e\x32\r.CaseEncoding\"\xb8\x17\n\x04\x43\x61se\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x10\n\x08pathogen\x18\x02 \x01(\t\x12\x18\n\x0b\x63\x61se_status\x18\x03 \x01(\tH\x00\x88\x01\x01\x12\x1c\n\x0fpathogen_status\x18\x04 \x01(\tH\x01\x88\x01\x01\x12!\n\x14location_information\x18\x05 \x01(\tH\x02\x88\x01\x01\x12\x10\n\x03\x61ge\x18\x06 \x01(\tH\x03\x88\x01\x01\x12\x19\n\x0csex_at_birth\x18\x07 \x01(\tH\x04\x88\x01\x01\x12\x1f\n\x12sex_at_birth_other\x18\x08 \x01(\tH\x05\x88\x01\x01\x12\x13\n\x06gender\x18\t \x01(\tH\x06\x88\x01\x01\x12\x19\n\x0cgender_other\x18\n \x01(\tH\x07\x88\x01\x01\x12\x11\n\x04race\x18\x0b \x01(\tH\x08\x88\x01\x01\x12\x17\n\nrace_other\x18\x0c \x01(\tH\t\x88\x01\x01\x12\x16\n\tethnicity\x18\r \x01(\tH\n\x88\x01\x01\x12\x1c\n\x0f\x65thnicity_other\x18\x0e \x01(\tH\x0b\x88\x01\x01\x12\x18\n\x0bnationality\x18\x0f \x01(\tH\x0c\x88\x01\x01\x12\x1e\n\x11nationality_other\x18\x10 \x01(\tH\r\x88\x01\x01\x12\x17\n\noccupation\x18\x11 \x01(\tH\x0e\x88\x01\x01\x12\x1e\n\x11healthcare_worker\x18\x12 \x01(\tH\x0f\x88\x01\x01\x12\x1f\n\x12previous_infection\x18\x13 \x01(\tH\x10\x88\x01\x01\x12\x19\n\x0c\x63o_infection\x18\x14 \x01(\tH\x11\x88\x01\x01\x12#\n\x16pre_existing_condition\x18\x15 \x01(\tH\x12\x88\x01\x01\x12\x1d\n\x10pregnancy_status\x18\x16 \x01(\tH\x13\x88\x01\x01\x12\x18\n\x0bvaccination\x18\x17 \x01(\tH\x14\x88\x01\x01\x12\x19\n\x0cvaccine_name\x18\x18 \x01(\tH\x15\x88\x01\x01\x12\x1d\n\x10vaccination_date\x18\x19 \x01(\tH\x16\x88\x01\x01\x12!\n\x14vaccine_side_effects\x18\x1a \x01(\tH\x17\x88\x01\x01\x12\x15\n\x08symptoms\x18\x1b \x01(\tH\x18\x88\x01\x01\x12\x17\n\ndate_onset\x18\x1c \x01(\tH\x19\x88\x01\x01\x12\x1e\n\x11\x64\x61te_confirmation\x18\x1d \x01(\tH\x1a\x88\x01\x01\x12 \n\x13\x63onfirmation_method\x18\x1e \x01(\tH\x1b\x88\x01\x01\x12\'\n\x1a\x64\x61te_of_first_consultation\x18\x1f \x01(\tH\x1c\x88\x01\x01\x12\x19\n\x0chospitalized\x18  \x01(\tH\x1d\x88\x01\x01\x12\'\n\x1areason_for_hospitalization\x18! \x01(\tH\x1e\x88\x01\x01\x12!\n\x14\x64\x61te_hospitalization\x18\" \x01(\tH\x1f\x88\x01\x01\x12$\n\x17\x64\x61te_discharge_hospital\x18# \x01(\tH \x88\x01\x01\x12\x1b\n\x0eintensive_care\x18$ \x01(\tH!\x88\x01\x01\x12\x1f\n\x12\x64\x61te_admission_icu\x18% \x01(\tH\"\x88\x01\x01\x12\x1f\n\x12\x64\x61te_discharge_icu\x18& \x01(\tH#\x88\x01\x01\x12\x1c\n\x0fhome_monitoring\x18\' \x01(\tH$\x88\x01\x01\x12\x15\n\x08isolated\x18( \x01(\tH%\x88\x01\x01\x12\x1b\n\x0e\x64\x61te_isolation\x18) \x01(\tH&\x88\x01\x01\x12\x14\n\x07outcome\x18* \x01(\tH\'\x88\x01\x01\x12\x17\n\ndate_death\x18+ \x01(\tH(\x88\x01\x01\x12\x1b\n\x0e\x64\x61te_recovered\x18, \x01(\tH)\x88\x01\x01\x12\x1e\n\x11\x63ontact_with_case\x18- \x01(\tH*\x88\x01\x01\x12\x17\n\ncontact_id\x18. \x01(\tH+\x88\x01\x01\x12\x1c\n\x0f\x63ontact_setting\x18/ \x01(\tH,\x88\x01\x01\x12\"\n\x15\x63ontact_setting_other\x18\x30 \x01(\tH-\x88\x01\x01\x12\x1b\n\x0e\x63ontact_animal\x18\x31 \x01(\tH.\x88\x01\x01\x12\x1c\n\x0f\x63ontact_comment\x18\x32 \x01(\tH/\x88\x01\x01\x12\x19\n\x0ctransmission\x18\x33 \x01(\tH0\x88\x01\x01\x12\x1b\n\x0etravel_history\x18\x34 \x01(\tH1\x88\x01\x01\x12!\n\x14travel_history_entry\x18\x35 \x01(\tH2\x88\x01\x01\x12!\n\x14travel_history_start\x18\x36 \x01(\tH3\x88\x01\x01\x12$\n\x17travel_history_location\x18\x37 \x01(\tH4\x88\x01\x01\x12\x1e\n\x11genomics_metadata\x18\x38 \x01(\tH5\x88\x01\x01\x12\x1d\n\x10\x61\x63\x63\x65ssion_number\x18\x39 \x01(\tH6\x88\x01\x01\x12\x13\n\x06source\x18: \x01(\tH7\x88\x01\x01\x12\x16\n\tsource_ii\x18; \x01(\tH8\x88\x01\x01\x12\x17\n\nsource_iii\x18< \x01(\tH9\x88\x01\x01\x12\x16\n\tsource_iv\x18= \x01(\tH:\x88\x01\x01\x12\x17\n\ndate_entry\x18> \x01(\tH;\x88\x01\x01\x12\x1f\n\x12\x64\x61te_last_modified\x18? \x01(\tH<\x88\x01\x01\x42\x0e\n\x0c_case_statusB\x12\n\x10_pathogen_statusB\x17\n\x15_location_informationB\x06\n\x04_ageB\x0f\n\r_sex_at_birthB\x15\n\x13_sex_at_birth_otherB\t\n\x07_genderB\x0f\n\r_gender_otherB\x07\n\x05_raceB\r\n\x0b_race_otherB\x0c\n\n_ethnicityB\x12\n\x10_ethnicity_otherB\x0e\n\x0c_nationalityB\x14\n\x12_nationality_otherB\r\n\x0b_occupationB\x14\n\x12_healthcare_workerB\x15\n\x13_previous_infectionB\x0f\n\r_co_infectionB\x19\n\x17_pre_existing_conditionB\x13\n\x11_pregnancy_statusB\x0e\n\x0c_vaccinationB\x0f\n\r_vaccine_nameB\x13\n\x11_vaccination_dateB\x17\n\x15_vaccine_side_effectsB\x0b\n\t_symptomsB\r\n\x0b_date_onsetB\x14\n\x12_date_confirmationB\x16\n\x14_confirmation_methodB\x1d\n\x1b_date_of_first_consultationB\x0f\n\r_hospitalizedB\x1d\n\x1b_reason_for_hospitalizationB\x17\n\x15_date_hospitalizationB\x1a\n\x18_date_discharge_hospitalB\x11\n\x0f_intensive_careB\x15\n\x13_date_admission_icuB\x15\n\x13_date_discharge_icuB\x12\n\x10_home_monitoringB\x0b\n\t_isolatedB\x11\n\x0f_date_isolationB\n\n\x08_outcomeB\r\n\x0b_date_deathB\x11\n\x0f_date_recoveredB\x14\n\x12_contact_with_caseB\r\n\x0b_contact_idB\x12\n\x10_contact_settingB\x18\n\x16_contact_setting_otherB\x11\n\x0f_contact_animalB\x12\n\x10_contact_commentB\x0f\n\r_transmissionB\x11\n\x0f_travel_historyB\x17\n\x15_travel_history_entryB\x17\n\x15_travel_history_startB\x1a\n\x18_travel_history_locationB\x14\n\x12_genomics_metadataB\x13\n\x11_accession_numberB\t\n\x07_sourceB\x0c\n\n_source_iiB\r\n\x0b_source_iiiB\x0c\n\n_source_ivB\r\n\x0b_date_entryB\x15\n\x13_date_last_modified\":\n\rCasesResponse\x12\x14\n\x05\x63\x61ses\x18\x01 \x03(\x0b\x32\x05.Case\x12\x13\n\x0b\x61rrow_cases\x18\x02 \x01(\x0c\"L\n\nCasesChunk\x12\x14\n\x05\x63\x61ses\x18\x01 \x03(\x0b\x32\x05.Case\x12\x13\n\x0bnext_cursor\x18\x02 \x01(\x05\x12\x13\n\x0b\x61rrow_cases\x18\x03 \x01(\x0c*@\n\x0c\x43\x61seEncoding\x12\x17\n\x13\x43\x41SE_ENCODING_PROTO\x10\x00\x12\x17\n\x13\x43\x41SE_ENCODING_ARROW\x10\x01\x32_\n\x05\x43\x61ses\x12)\n\x08GetCases\x12\r.CasesRequest\x1a\x0e.CasesResponse\x12+\n\x0bStreamCases\x12\r.CasesRequest\x1a\x0b.CasesChunk0\x01\x62\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'cases_pb2', _globals)
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _globals['_CASEENCODING']._serialized_start=3259
+  _globals['_CASEENCODING']._serialized_end=3323
+  _globals['_CASESREQUEST']._serialized_start=15
+  _globals['_CASESREQUEST']._serialized_end=116
+  _globals['_CASE']._serialized_start=119
+  _globals['_CASE']._serialized_end=3119
+  _globals['_CASESRESPONSE']._serialized_start=3121
+  _globals['_CASESRESPONSE']._serialized_end=3179
+  _globals['_CASESCHUNK']._serialized_start=3181
+  _globals['_CASESCHUNK']._serialized_end=3257
+  _globals['_CASES']._serialized_start=3325
+  _globals['_CASES']._serialized_end=3420
+# @@protoc_insertion_point(module_scope)
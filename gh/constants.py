@@ -19,6 +19,12 @@ PATHOGEN_C = os.environ.get("PATHOGEN_C", "")
 PATHOGENS = [PATHOGEN_A, PATHOGEN_B, PATHOGEN_C]
 
 AMQP_HOST = os.environ.get("AMQP_HOST")
+# Messages are published on a pool of channels over one long-lived connection
+PUBLISHER_CHANNELS = int(os.environ.get("PUBLISHER_CHANNELS", 2))
+PUBLISHER_RECONNECT_WAIT = int(os.environ.get("PUBLISHER_RECONNECT_WAIT", 5))
+
+# Seconds jobs wait for the broker to confirm a message, including while reconnecting
+PUBLISH_TIMEOUT = float(os.environ.get("PUBLISH_TIMEOUT", 30))
 DIRECT_EXCHANGE = "gh_direct_exchange"
 DIRECT_QUEUE = "gh_direct_queue"
 DIRECT_ROUTE = "gh_direct_route"
@@ -77,6 +83,26 @@ DATABASE_NAME = os.environ.get("DB_NAME")
 
 USERS_COLLECTION = os.environ.get("GH_USERS_COLLECTION")
 
+# Seconds curation data is cached for, since it is read on every job
+CURATION_CACHE_TTL = int(os.environ.get("CURATION_CACHE_TTL", 30))
+
+# Documents record the partner they came from, and partner case IDs are kept apart from document IDs
+PARTNER_FIELD = "partner"
+CASE_ID_FIELD = "case_id"
+
+# Documents are written in batches, replacing stored documents with the same key fields if set
+DB_BATCH_SIZE = int(os.environ.get("DB_BATCH_SIZE", 1000))
+CASE_KEY_FIELDS = [
+    f
+    for f in os.environ.get(
+        "CASE_KEY_FIELDS", f"{PARTNER_FIELD},{CASE_ID_FIELD}"
+    ).split(",")
+    if f
+]
+RT_KEY_FIELDS = [
+    f for f in os.environ.get("RT_KEY_FIELDS", f"{PARTNER_FIELD},date").split(",") if f
+]
+
 GH_A_COLLECTION = os.environ.get("GH_A_COLLECTION")
 GH_B_COLLECTION = os.environ.get("GH_B_COLLECTION")
 GH_C_COLLECTION = os.environ.get("GH_C_COLLECTION")
@@ -103,12 +129,66 @@ S3_C_BUCKET = os.environ.get("S3_C_BUCKET")
 
 RT_ESTIMATES_FOLDER = "rt_estimates"
 
+# Case data is streamed from partners in chunks, resuming after dropped connections
+CASES_CHUNK_SIZE = int(os.environ.get("CASES_CHUNK_SIZE", 1000))
+STREAM_RETRIES = int(os.environ.get("STREAM_RETRIES", 3))
+
+# Case data encoding requested from partners: "proto" for case messages, or "arrow" for Arrow IPC
+CASES_ENCODING = os.environ.get("CASES_ENCODING", "proto")
+# Whether cases sent as Arrow are also written to S3 as <pathogen>.parquet, next to <pathogen>.json
+CASES_PARQUET = os.environ.get("CASES_PARQUET", "false").lower() == "true"
+CASE_DATE_FORMAT = "%m-%d-%Y"
+
+# Channels to each partner are kept open, with keepalive pings, and calls spread across them
+GRPC_CHANNELS_PER_PARTNER = int(os.environ.get("GRPC_CHANNELS_PER_PARTNER", 2))
+GRPC_KEEPALIVE_TIME_MS = int(os.environ.get("GRPC_KEEPALIVE_TIME_MS", 60000))
+GRPC_KEEPALIVE_TIMEOUT_MS = int(os.environ.get("GRPC_KEEPALIVE_TIMEOUT_MS", 20000))
+
+# Jobs run on partners in parallel, each with a deadline in seconds for gRPC calls
+PARTNER_WORKERS = int(os.environ.get("PARTNER_WORKERS", 8))
+PARTNER_TIMEOUT = float(os.environ.get("PARTNER_TIMEOUT", 300))
+
+# Submitted jobs are queued and run in the background, with their status in the database
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+JOBS_COLLECTION = os.environ.get("GH_JOBS_COLLECTION", "jobs")
+
+# Seconds a finished job is reused for identical requests, instead of running again
+JOB_REUSE_WINDOW = int(os.environ.get("JOB_REUSE_WINDOW", 60))
+
+# Seconds after which an unfinished job is presumed lost, so identical requests start a new job
+JOB_TIMEOUT = float(os.environ.get("JOB_TIMEOUT", PARTNER_TIMEOUT))
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
 LOCALSTACK_URL = os.environ.get("LOCALSTACK_URL")
 AWS_REGION = os.environ.get("AWS_DEFAULT_REGION")
 
 COGNITO_USER_NAME = os.environ.get("COGNITO_USER_NAME")
 COGNITO_USER_PASSWORD = os.environ.get("COGNITO_USER_PASSWORD")
 
+# Seconds before expiry that the cached Cognito access token is refreshed
+JWT_REFRESH_MARGIN = int(os.environ.get("JWT_REFRESH_MARGIN", 300))
+
+# Seconds before cached user pool keys are fetched again, by the fake partner service
+JWKS_CACHE_TTL = int(os.environ.get("JWKS_CACHE_TTL", 3600))
+
+# Seconds partner certificates are cached for, unless rotated sooner
+CERTIFICATE_TTL = int(os.environ.get("CERTIFICATE_TTL", 3600))
+
+# Users allowed to report certificate events for any partner, such as the ACM event forwarder
+CERTIFICATE_EVENT_USERS = [
+    u for u in os.environ.get("CERTIFICATE_EVENT_USERS", "").split(",") if u
+]
+
+# Seconds partner API keys are cached for, unless rotated sooner
+SECRET_CACHE_TTL = int(os.environ.get("SECRET_CACHE_TTL", 300))
+
+# Minimum seconds between fetches of a partner API key on a mismatch, so bad keys cannot flood Secrets Manager
+SECRET_REFRESH_INTERVAL = int(os.environ.get("SECRET_REFRESH_INTERVAL", 10))
+
 
 @dataclass
 class Partner:
@@ -2,11 +2,45 @@
 Functions for interacting with database
 """
 
+from datetime import datetime, timedelta, timezone
+import functools
 import logging
+import threading
+import time
+import uuid
 
-from pymongo import MongoClient
+from pymongo import InsertOne, MongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
 
-from constants import DB_CONNECTION, DATABASE_NAME, USERS_COLLECTION
+from constants import (
+    DB_CONNECTION,
+    DATABASE_NAME,
+    USERS_COLLECTION,
+    JOBS_COLLECTION,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JOB_SUCCEEDED,
+    JOB_FAILED,
+    DB_BATCH_SIZE,
+    CURATION_CACHE_TTL,
+)
+
+
+# Curation data and monotonic clock time read, by partner name
+CURATION_CACHE = {}
+CURATION_CACHE_LOCK = threading.Lock()
+
+
+@functools.cache
+def get_client() -> MongoClient:
+    """
+    Get the database client, shared across the process
+
+    Returns:
+        MongoClient: The database client, which pools its own connections
+    """
+
+    return MongoClient(DB_CONNECTION)
 
 
 def get_curation_data(partner_name: str) -> dict:
@@ -18,13 +52,23 @@ def get_curation_data(partner_name: str) -> dict:
 
     Returns:
         dict: A partner's curation data
+
+    Raises:
+        ValueError: The partner should have curation data
     """
-    client = MongoClient(DB_CONNECTION)
-    db = client[DATABASE_NAME]
+    with CURATION_CACHE_LOCK:
+        cached = CURATION_CACHE.get(partner_name)
+        if cached and time.monotonic() - cached[1] < CURATION_CACHE_TTL:
+            return cached[0]
+    db = get_client()[DATABASE_NAME]
     collection = db[USERS_COLLECTION]
-    data = list(collection.find({"name": partner_name}))
+    data = collection.find_one({"name": partner_name})
     logging.debug(f"Got data from db: {data}")
-    return data[0]
+    if data is None:
+        raise ValueError(f"No curation data for partner {partner_name}")
+    with CURATION_CACHE_LOCK:
+        CURATION_CACHE[partner_name] = (data, time.monotonic())
+    return data
 
 
 def get_gh_db_data(collection_name: str) -> list[dict]:
@@ -37,30 +81,259 @@ def get_gh_db_data(collection_name: str) -> list[dict]:
     Returns:
         list[dict]: Requested data from the collection
     """
-    client = MongoClient(DB_CONNECTION)
-    db = client[DATABASE_NAME]
+    db = get_client()[DATABASE_NAME]
     collection = db[collection_name]
     data = list(collection.find())
     logging.debug(f"Got data from db collection {collection_name}: {data}")
     return data
 
 
-def store_data_in_db(data: list, collection_name: str) -> None:
+def store_data_in_db(
+    data: list, collection_name: str, key_fields: list[str] | None = None
+) -> None:
     """
-    Store data in a collection in the database
+    Store data in a collection in the database, in batches
 
     Args:
-        data (list): Description
+        data (list): The data to store
         collection_name (str): The collection name
+        key_fields (list[str] | None, optional): Fields identifying a document, to replace stored documents instead of adding duplicates. Documents missing any key field are added.
     """
     logging.info("Storing data in DB")
     try:
-        client = MongoClient(DB_CONNECTION)
-        db = client[DATABASE_NAME]
-        collection = db[collection_name]
-        for elem in data:
-            collection.insert_one(elem)
+        if key_fields:
+            index_key_fields(collection_name, tuple(key_fields))
+        collection = get_client()[DATABASE_NAME][collection_name]
+        for start in range(0, len(data), DB_BATCH_SIZE):
+            batch = data[start : start + DB_BATCH_SIZE]
+            if key_fields:
+                requests = []
+                for elem in batch:
+                    key = {field: elem.get(field) for field in key_fields}
+                    if None in key.values():
+                        # Documents missing key fields would all replace each other
+                        # Null key fields are left out, so the unique index skips them
+                        requests.append(
+                            InsertOne(
+                                {
+                                    k: v
+                                    for k, v in elem.items()
+                                    if v is not None or k not in key
+                                }
+                            )
+                        )
+                    else:
+                        requests.append(UpdateOne(key, {"$set": elem}, upsert=True))
+                num_unkeyed = sum(isinstance(r, InsertOne) for r in requests)
+                if num_unkeyed:
+                    logging.warning(
+                        f"Inserting {num_unkeyed} documents missing key fields {key_fields}"
+                    )
+                collection.bulk_write(requests, ordered=False)
+            else:
+                collection.insert_many(batch, ordered=False)
     except Exception:
         logging.exception("An error occurred while trying to store data in DB")
         raise
     logging.info("Stored data in DB")
+
+
+@functools.cache
+def index_key_fields(collection_name: str, key_fields: tuple[str, ...]) -> None:
+    """
+    Allow only one document per key in a collection, and look up documents by key
+
+    Documents missing any key field are not indexed. Existing duplicates are logged,
+    and leave the collection without the index.
+
+    Args:
+        collection_name (str): The collection name
+        key_fields (tuple[str, ...]): Fields identifying a document
+    """
+
+    db = get_client()[DATABASE_NAME]
+    try:
+        db[collection_name].create_index(
+            [(field, 1) for field in key_fields],
+            unique=True,
+            partialFilterExpression={field: {"$exists": True} for field in key_fields},
+        )
+    except OperationFailure:
+        logging.exception(
+            f"Could not index {key_fields} in collection {collection_name}"
+        )
+
+
+@functools.cache
+def index_jobs() -> None:
+    """
+    Allow only one unfinished job per job key
+    """
+
+    db = get_client()[DATABASE_NAME]
+    db[JOBS_COLLECTION].create_index(
+        "key", unique=True, partialFilterExpression={"active": True}
+    )
+
+
+def submit_job(
+    pathogen_name: str,
+    job_name: str,
+    user_name: str,
+    job_key: str,
+    reuse_window: int = 0,
+    timeout: float = 0,
+) -> tuple[dict, bool]:
+    """
+    Record a submitted job, unless an identical job is unfinished or just finished
+
+    Args:
+        pathogen_name (str): Name of the pathogen
+        job_name (str): Name of the job
+        user_name (str): Name of the user who submitted the job
+        job_key (str): Identifies jobs for the same pathogen, job and parameters
+        reuse_window (int, optional): Seconds a job that succeeded is reused for
+        timeout (float, optional): Seconds after which an unfinished job is failed instead of shared
+
+    Returns:
+        tuple[dict, bool]: The job, and whether it was newly created
+    """
+
+    index_jobs()
+    db = get_client()[DATABASE_NAME]
+    collection = db[JOBS_COLLECTION]
+    if reuse_window > 0:
+        since = datetime.now(timezone.utc) - timedelta(seconds=reuse_window)
+        job = collection.find_one(
+            {"key": job_key, "status": JOB_SUCCEEDED, "updatedAt": {"$gte": since}},
+            sort=[("updatedAt", -1)],
+        )
+        if job:
+            logging.debug(f"Reusing finished job {job['_id']}")
+            return job, False
+
+    if timeout > 0:
+        fail_stale_jobs(job_key, timeout)
+
+    job_id = uuid.uuid4().hex
+    new_job = {
+        "_id": job_id,
+        "pathogen": pathogen_name,
+        "job": job_name,
+        "submittedBy": user_name,
+        "status": JOB_QUEUED,
+        "submittedAt": datetime.now(timezone.utc),
+    }
+    try:
+        job = collection.find_one_and_update(
+            {"key": job_key, "active": True},
+            {"$setOnInsert": new_job},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # Another request created the job first
+        job = collection.find_one({"key": job_key, "active": True})
+    created = job["_id"] == job_id
+    logging.debug(f"{'Created' if created else 'Attached to'} job {job['_id']}")
+    return job, created
+
+
+def fail_stale_jobs(job_key: str, timeout: float) -> None:
+    """
+    Fail unfinished jobs that have not been updated within a timeout, such as jobs lost with a worker
+
+    Args:
+        job_key (str): Identifies jobs for the same pathogen, job and parameters
+        timeout (float): Seconds after which an unfinished job is failed
+    """
+
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(seconds=timeout)
+    db = get_client()[DATABASE_NAME]
+    result = db[JOBS_COLLECTION].update_many(
+        {
+            "key": job_key,
+            "active": True,
+            "$or": [
+                {"status": JOB_QUEUED, "submittedAt": {"$lt": cutoff}},
+                {"status": JOB_RUNNING, "updatedAt": {"$lt": cutoff}},
+            ],
+        },
+        {
+            "$set": {
+                "status": JOB_FAILED,
+                "active": False,
+                "results": {"error": f"Job did not finish within {timeout} seconds"},
+                "updatedAt": now,
+            }
+        },
+    )
+    if result.modified_count:
+        logging.warning(f"Failed {result.modified_count} stale jobs for key {job_key}")
+
+
+def update_job(job_id: str, status: str, results: dict | None = None) -> None:
+    """
+    Update the status of a job
+
+    Args:
+        job_id (str): The job ID
+        status (str): The job status
+        results (dict | None, optional): Results or errors by partner name, once finished
+    """
+
+    update = {"status": status, "updatedAt": datetime.now(timezone.utc)}
+    if status in (JOB_SUCCEEDED, JOB_FAILED):
+        update["active"] = False
+    if results is not None:
+        update["results"] = results
+    db = get_client()[DATABASE_NAME]
+    db[JOBS_COLLECTION].update_one({"_id": job_id}, {"$set": update})
+    logging.debug(f"Job {job_id} {status}")
+
+
+def claim_job(job_id: str, lease: float) -> dict | None:
+    """
+    Mark a queued job as running, unless it is running or finished already
+
+    Running jobs not updated within the lease, such as jobs lost with a worker, are
+    claimed again.
+
+    Args:
+        job_id (str): The job ID
+        lease (float): Seconds a running job is left to its worker
+
+    Returns:
+        dict | None: The claimed job, or None if it could not be claimed
+    """
+
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(seconds=lease)
+    db = get_client()[DATABASE_NAME]
+    return db[JOBS_COLLECTION].find_one_and_update(
+        {
+            "_id": job_id,
+            "$or": [
+                {"status": JOB_QUEUED},
+                {"status": JOB_RUNNING, "updatedAt": {"$lt": cutoff}},
+            ],
+        },
+        {"$set": {"status": JOB_RUNNING, "updatedAt": now}},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def get_job(job_id: str) -> dict | None:
+    """
+    Get a job
+
+    Args:
+        job_id (str): The job ID
+
+    Returns:
+        dict | None: The job, or None if not found
+    """
+
+    db = get_client()[DATABASE_NAME]
+    return db[JOBS_COLLECTION].find_one({"_id": job_id})
@@ -9,17 +9,17 @@ import os
 from typing import Any
 
 import boto3
-import cognitojwt
 from cryptography.hazmat.primitives import serialization
 import grpc
 from grpc_interceptor import ServerInterceptor
 from grpc_interceptor.exceptions import GrpcException
 
-from cases_pb2 import Case, CasesRequest, CasesResponse
+from cases_pb2 import Case, CasesChunk, CasesRequest, CasesResponse
 from cases_pb2_grpc import add_CasesServicer_to_server, CasesServicer
 from rt_estimate_pb2 import RtEstimate, RtEstimateRequest, RtEstimateResponse
 from rt_estimate_pb2_grpc import add_RtEstimatesServicer_to_server, RtEstimatesServicer
-from constants import LOCALSTACK_URL, AWS_REGION, PATHOGEN_A
+from constants import LOCALSTACK_URL, AWS_REGION, PATHOGEN_A, JWKS_CACHE_TTL
+from jwks import JwksCache
 from util import setup_logger
 
 
@@ -37,6 +37,10 @@ DECRYPTION_PASSPHRASE = os.environ.get("DECRYPTION_PASSPHRASE", "foobar")
 JWKS_HOST = os.environ.get("JWKS_HOST")
 JWKS_FILE = os.environ.get("JWKS_FILE")
 
+JWKS_CACHE = JwksCache(
+    COGNITO_CLIENT, AWS_REGION, JWKS_HOST, JWKS_FILE, JWKS_CACHE_TTL
+)
+
 
 def get_server_credentials(certificate_arn: str):
     logging.info("Getting server credentials")
@@ -92,7 +96,7 @@ class CasesService(CasesServicer):
 
         cases = [
             Case(
-                id=0,
+                id=1,
                 location_information="USA",
                 outcome="Something",
                 pathogen=PATHOGEN_A,
@@ -100,6 +104,28 @@ class CasesService(CasesServicer):
         ]
         return CasesResponse(cases=cases)
 
+    def StreamCases(self, request: CasesRequest, context: object) -> CasesChunk:
+        """
+        Stream case data
+
+        Args:
+            request (CasesRequest): A request for case data
+            context (grpc._server._Context): Context for request
+
+        Yields:
+            CasesChunk: A chunk of case data
+        """
+
+        cases = [
+            Case(
+                id=1,
+                location_information="USA",
+                outcome="Something",
+                pathogen=PATHOGEN_A,
+            )
+        ]
+        yield CasesChunk(cases=cases, next_cursor=1)
+
 
 class RtEstimateService(RtEstimatesServicer):
 
@@ -154,19 +180,9 @@ def validate_jwt(metadata: dict) -> None:
         raise GrpcException(status_code=status_code, details=details)
     token = auth_header.split()[-1]
 
-    # FIXME: matching
-    response = COGNITO_CLIENT.list_user_pools(MaxResults=1)
-    logging.debug(f"User pools: {response.get('UserPools')}")
-    pool_id = response.get("UserPools", [])[0].get("Id")
-    logging.debug(f"Pool id: {pool_id}")
-
-    # FIXME: Use only for localstack
-    jwks_url = f"{JWKS_HOST}/{pool_id}/{JWKS_FILE}"
-    logging.debug(f"Looking up JWK at {jwks_url}")
-    os.environ["AWS_COGNITO_JWKS_PATH"] = jwks_url
     try:
         logging.debug("Decoding JWT")
-        _ = cognitojwt.decode(token, AWS_REGION, pool_id)
+        _ = JWKS_CACHE.decode(token)
     except Exception:
         details = "JWT validation failed"
         logging.exception(details)
@@ -221,6 +237,10 @@ def serve():
     server = grpc.server(
         futures.ThreadPoolExecutor(max_workers=10),
         interceptors=[JWTValidationInterceptor()],
+        options=[
+            ("grpc.keepalive_permit_without_calls", 1),
+            ("grpc.http2.min_ping_interval_without_data_ms", 30000),
+        ],
     )
 
     add_CasesServicer_to_server(CasesService(), server)
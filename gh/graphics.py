@@ -4,12 +4,17 @@ Functions for creating data visualizations
 
 from datetime import date
 import logging
+import threading
 
 import matplotlib.pyplot as plt
 
 from constants import RT_PARAMS
 
 
+# pyplot keeps global state, so plots are drawn one at a time
+PLOT_LOCK = threading.Lock()
+
+
 def create_plot(data: list, location: str) -> str:
     """
     Create a plot for R(t) estimation
@@ -23,6 +28,21 @@ def create_plot(data: list, location: str) -> str:
     """
     file_name = f"{date.today()}_{location}.png"
     logging.debug(f"Creating plot: {file_name}")
+    with PLOT_LOCK:
+        draw_plot(data, location, file_name)
+    return file_name
+
+
+def draw_plot(data: list, location: str, file_name: str) -> None:
+    """
+    Draw a plot for R(t) estimation and save it
+
+    Args:
+        data (list): R(t) estimation data
+        location (str): Name of the location
+        file_name (str): File name for the plot
+    """
+
     plt.style.use("seaborn-white")
     fig, ax = plt.subplots(1, 1, figsize=(12, 4))
 
@@ -45,4 +65,4 @@ def create_plot(data: list, location: str) -> str:
     plt.xticks(rotation=45)
     plt.tight_layout()
     plt.savefig(file_name)
-    return file_name
+    plt.close(fig)
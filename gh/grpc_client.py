@@ -2,25 +2,171 @@
 Global.health gRPC client
 """
 
+from collections.abc import Iterator
+import itertools
 import logging
+import threading
+import time
 
 import grpc
 
-from cases_pb2 import CasesRequest, CasesResponse
+from cases_pb2 import CaseEncoding, CasesChunk, CasesRequest, CasesResponse
 from cases_pb2_grpc import CasesStub
 
 from rt_estimate_pb2 import RtEstimateRequest, RtEstimateResponse
 from rt_estimate_pb2_grpc import RtEstimatesStub
-from constants import Partner, RT_PARAMS
+from aws import get_jwt, get_certificate
+from constants import (
+    Partner,
+    RT_PARAMS,
+    CASES_CHUNK_SIZE,
+    STREAM_RETRIES,
+    GRPC_CHANNELS_PER_PARTNER,
+    GRPC_KEEPALIVE_TIME_MS,
+    GRPC_KEEPALIVE_TIMEOUT_MS,
+)
 
 
-def get_credentials(token: str, certificate: bytes) -> grpc.ChannelCredentials:
-    token_credentials = grpc.access_token_call_credentials(token)
-    channel_credentials = grpc.ssl_channel_credentials(certificate)
-    credentials = grpc.composite_channel_credentials(
-        channel_credentials, token_credentials
-    )
-    return credentials
+# Channel credentials and the certificates they were built from, by partner
+PARTNER_CREDENTIALS = {}
+PARTNER_CREDENTIALS_LOCK = threading.Lock()
+
+CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", GRPC_KEEPALIVE_TIME_MS),
+    ("grpc.keepalive_timeout_ms", GRPC_KEEPALIVE_TIMEOUT_MS),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    # Without a local pool, channels to the same partner share one connection
+    ("grpc.use_local_subchannel_pool", 1),
+]
+
+
+class ChannelRegistry:
+
+    """
+    Open channels to partners, reused across calls and jobs
+
+    Attributes:
+        channels_per_partner (int): The number of channels, each with its own connection, per partner
+        channels (dict[tuple, tuple]): Credentials, channels and a round-robin counter, by partner address
+        lock (threading.Lock): Lock for channels
+    """
+
+    def __init__(self, channels_per_partner: int):
+        """
+        Constructor for channel registry
+
+        Args:
+            channels_per_partner (int): The number of channels per partner
+        """
+
+        self.channels_per_partner = channels_per_partner
+        self.channels = {}
+        self.lock = threading.Lock()
+
+    def get_channel(self, partner: Partner) -> grpc.Channel:
+        """
+        Get a channel to a partner, opening channels on first use or if its certificate changed
+
+        Channels are opened with partner credentials, which add the current JWT to each
+        call, so they stay valid as tokens change.
+
+        Args:
+            partner (Partner): Partner configuration
+
+        Returns:
+            grpc.Channel: A channel to the partner
+        """
+
+        # Partner is not hashable, so channels are keyed by its address
+        key = (partner.name, partner.grpc_host, partner.grpc_port)
+        # Credentials are rebuilt only when the certificate changes
+        credentials = get_partner_credentials(partner)
+        with self.lock:
+            entry = self.channels.get(key)
+            if entry is None or entry[0] is not credentials:
+                logging.debug(
+                    f"Opening {self.channels_per_partner} channels to {partner.grpc_host}:{partner.grpc_port}"
+                )
+                # Replaced channels are released once their calls finish
+                channels = [
+                    grpc.secure_channel(
+                        f"{partner.grpc_host}:{partner.grpc_port}",
+                        credentials,
+                        options=CHANNEL_OPTIONS,
+                    )
+                    for _ in range(self.channels_per_partner)
+                ]
+                entry = (credentials, channels, itertools.count())
+                self.channels[key] = entry
+            _, channels, counter = entry
+            return channels[next(counter) % len(channels)]
+
+    def close(self) -> None:
+        """
+        Close all channels
+        """
+
+        with self.lock:
+            for _, channels, _ in self.channels.values():
+                for channel in channels:
+                    channel.close()
+            self.channels.clear()
+
+
+CHANNEL_REGISTRY = ChannelRegistry(GRPC_CHANNELS_PER_PARTNER)
+
+
+class JwtMetadataPlugin(grpc.AuthMetadataPlugin):
+
+    """
+    Adds the current G.h JWT to each call, so credentials outlive tokens
+    """
+
+    def __call__(
+        self,
+        context: grpc.AuthMetadataContext,
+        callback: grpc.AuthMetadataPluginCallback,
+    ):
+        """
+        Add the JWT to call metadata
+
+        Args:
+            context (grpc.AuthMetadataContext): Context for the call
+            callback (grpc.AuthMetadataPluginCallback): Callback for the metadata
+        """
+
+        try:
+            callback((("authorization", f"Bearer {get_jwt()}"),), None)
+        except Exception as e:
+            logging.exception("Could not get JWT for call")
+            callback((), e)
+
+
+def get_partner_credentials(partner: Partner) -> grpc.ChannelCredentials:
+    """
+    Get channel credentials for a partner, rebuilding them if its certificate changed
+
+    Args:
+        partner (Partner): Partner configuration
+
+    Returns:
+        grpc.ChannelCredentials: gRPC channel credentials
+    """
+
+    certificate = get_certificate(partner.domain_name)
+    key = (partner.name, partner.domain_name)
+    with PARTNER_CREDENTIALS_LOCK:
+        cached = PARTNER_CREDENTIALS.get(key)
+        if cached and cached[0] == certificate:
+            return cached[1]
+        logging.debug(f"Creating channel credentials for partner {partner.name}")
+        credentials = grpc.composite_channel_credentials(
+            grpc.ssl_channel_credentials(certificate),
+            grpc.metadata_call_credentials(JwtMetadataPlugin()),
+        )
+        PARTNER_CREDENTIALS[key] = (certificate, credentials)
+        return credentials
 
 
 def get_metadata(token: str) -> list[tuple]:
@@ -38,7 +184,10 @@ def get_metadata(token: str) -> list[tuple]:
 
 
 def get_partner_cases(
-    pathogen: str, partner: Partner, credentials: grpc.ChannelCredentials
+    pathogen: str,
+    partner: Partner,
+    timeout: float | None = None,
+    encoding: int = CaseEncoding.CASE_ENCODING_PROTO,
 ) -> CasesResponse:
     """
     Get case data from a partner
@@ -46,7 +195,8 @@ def get_partner_cases(
     Args:
         pathogen (str): Name of the pathogen
         partner (Partner): Partner configuration
-        credentials (grpc.ChannelCredentials): gRPC channel credentials
+        timeout (float | None, optional): Deadline for the call, in seconds
+        encoding (int, optional): The CaseEncoding to request
 
     Returns:
         CasesResponse: Response with case data
@@ -55,16 +205,67 @@ def get_partner_cases(
     logging.debug(
         f"Getting {pathogen} cases from {partner.grpc_host}:{partner.grpc_port}"
     )
-    channel = grpc.secure_channel(
-        f"{partner.grpc_host}:{partner.grpc_port}", credentials
-    )
+    channel = CHANNEL_REGISTRY.get_channel(partner)
     client = CasesStub(channel)
-    response = client.GetCases(CasesRequest(pathogen=pathogen))
+    request = CasesRequest(pathogen=pathogen, encoding=encoding)
+    response = client.GetCases(request, timeout=timeout)
     return response
 
 
+def stream_partner_cases(
+    pathogen: str,
+    partner: Partner,
+    cursor: int = 0,
+    chunk_size: int = CASES_CHUNK_SIZE,
+    timeout: float | None = None,
+    encoding: int = CaseEncoding.CASE_ENCODING_PROTO,
+) -> Iterator[CasesChunk]:
+    """
+    Stream case data from a partner in chunks, resuming if the stream is interrupted
+
+    Args:
+        pathogen (str): Name of the pathogen
+        partner (Partner): Partner configuration
+        cursor (int, optional): The case ID to resume after
+        chunk_size (int, optional): The maximum number of cases per chunk
+        timeout (float | None, optional): Deadline for the whole stream, including resumed calls, in seconds
+        encoding (int, optional): The CaseEncoding to request
+
+    Yields:
+        CasesChunk: A chunk of case data
+    """
+
+    logging.debug(
+        f"Streaming {pathogen} cases from {partner.grpc_host}:{partner.grpc_port}"
+    )
+    channel = CHANNEL_REGISTRY.get_channel(partner)
+    client = CasesStub(channel)
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    retries = 0
+    while True:
+        request = CasesRequest(
+            pathogen=pathogen, cursor=cursor, chunk_size=chunk_size, encoding=encoding
+        )
+        remaining = deadline - time.monotonic() if deadline is not None else None
+        try:
+            for chunk in client.StreamCases(request, timeout=remaining):
+                cursor = chunk.next_cursor
+                retries = 0
+                yield chunk
+            return
+        except grpc.RpcError as e:
+            if e.code() != grpc.StatusCode.UNAVAILABLE or retries >= STREAM_RETRIES:
+                raise
+            retries += 1
+            logging.warning(
+                f"Stream of {pathogen} cases interrupted, resuming from cursor {cursor}"
+            )
+
+
 def get_partner_rt_estimates(
-    pathogen: str, partner: Partner, credentials: grpc.ChannelCredentials
+    pathogen: str,
+    partner: Partner,
+    timeout: float | None = None,
 ) -> RtEstimateResponse:
     """
     Get R(t) estimate data from a partner
@@ -72,7 +273,7 @@ def get_partner_rt_estimates(
     Args:
         pathogen (str): Name of the pathogen
         partner (Partner): Partner configuration
-        credentials (grpc.ChannelCredentials): gRPC channel credentials
+        timeout (float | None, optional): Deadline for the call, in seconds
 
     Returns:
         RtEstimateResponse: Response with R(t) estimate data
@@ -81,9 +282,7 @@ def get_partner_rt_estimates(
     logging.debug(
         f"Getting {pathogen} R(t) estimates from {partner.grpc_host}:{partner.grpc_port}"
     )
-    channel = grpc.secure_channel(
-        f"{partner.grpc_host}:{partner.grpc_port}", credentials
-    )
+    channel = CHANNEL_REGISTRY.get_channel(partner)
     client = RtEstimatesStub(channel)
     request = RtEstimateRequest(
         pathogen=pathogen,
@@ -94,5 +293,5 @@ def get_partner_rt_estimates(
         gt_distribution=RT_PARAMS.get("gt_distribution"),
         delay_distribution=RT_PARAMS.get("delay_distribution"),
     )
-    response = client.GetRtEstimates(request)
+    response = client.GetRtEstimates(request, timeout=timeout)
     return response
@@ -0,0 +1,162 @@
+"""
+Cache for the Cognito user pool keys used to verify JWTs
+"""
+
+import logging
+import threading
+from time import monotonic
+from typing import Any
+
+from jose import jwt
+from jose.exceptions import JWTError
+import requests
+
+
+# Minimum seconds between fetches for unknown key IDs, so bad tokens cannot flood the pool
+MIN_REFRESH_INTERVAL = 10
+
+# Seconds to wait for the JWKS host
+JWKS_REQUEST_TIMEOUT = 10
+
+
+class JwksCache:
+
+    """
+    Cognito user pool signing keys by key ID, for verifying JWTs locally
+
+    The user pool ID is looked up once. Keys are fetched again when they expire, or
+    when a token is signed with a key ID not seen before.
+
+    Attributes:
+        cognito_client (Any): The Cognito identity provider client
+        region (str): The AWS region of the user pool
+        jwks_host (str | None): The host serving keys, or None for Cognito
+        jwks_file (str | None): The path of the keys under the user pool, with a JWKS host
+        ttl (int): Seconds before keys are fetched again
+        pool_id (str | None): The user pool ID, once looked up
+        keys (dict[str, dict]): Public keys, by key ID
+        fetched_at (float | None): When keys were last fetched
+        lock (threading.Lock): Lock for the pool ID and keys
+    """
+
+    def __init__(
+        self,
+        cognito_client: Any,
+        region: str,
+        jwks_host: str | None,
+        jwks_file: str | None,
+        ttl: int,
+    ):
+        """
+        Constructor for JWKS cache
+
+        Args:
+            cognito_client (Any): The Cognito identity provider client
+            region (str): The AWS region of the user pool
+            jwks_host (str | None): The host serving keys, or None for Cognito
+            jwks_file (str | None): The path of the keys under the user pool, with a JWKS host
+            ttl (int): Seconds before keys are fetched again
+        """
+
+        self.cognito_client = cognito_client
+        self.region = region
+        self.jwks_host = jwks_host
+        self.jwks_file = jwks_file
+        self.ttl = ttl
+        self.pool_id = None
+        self.keys = {}
+        self.fetched_at = None
+        self.lock = threading.Lock()
+
+    def decode(self, token: str) -> dict:
+        """
+        Verify a JWT signature and expiry, and decode its claims
+
+        Args:
+            token (str): The JWT
+
+        Returns:
+            dict: The claims
+
+        Raises:
+            JWTError: The JWT should be signed by a user pool key, and not expired
+        """
+
+        kid = jwt.get_unverified_header(token).get("kid")
+        if not kid:
+            raise JWTError("No key ID in JWT header")
+        key = self.get_key(kid)
+        # Same checks as cognitojwt: signature and expiry, no audience
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[key.get("alg", "RS256")],
+            options={"verify_aud": False},
+        )
+
+    def get_key(self, kid: str) -> dict:
+        """
+        Get a public key, fetching keys if it is unknown or keys have expired
+
+        Args:
+            kid (str): The key ID
+
+        Returns:
+            dict: The key, as a JWK
+
+        Raises:
+            JWTError: The key should belong to the user pool
+        """
+
+        with self.lock:
+            now = monotonic()
+            expired = self.fetched_at is None or now - self.fetched_at >= self.ttl
+            unknown = kid not in self.keys and (
+                self.fetched_at is None or now - self.fetched_at >= MIN_REFRESH_INTERVAL
+            )
+            if expired or unknown:
+                self.refresh()
+            key = self.keys.get(kid)
+        if key is None:
+            raise JWTError(f"Unknown key ID {kid}")
+        return key
+
+    def refresh(self) -> None:
+        """
+        Fetch the user pool keys, with the lock held
+        """
+
+        if self.pool_id is None:
+            self.pool_id = self.get_pool_id()
+        jwks_url = self.get_jwks_url()
+        logging.info(f"Fetching JWKS from {jwks_url}")
+        response = requests.get(jwks_url, timeout=JWKS_REQUEST_TIMEOUT)
+        response.raise_for_status()
+        self.keys = {k["kid"]: k for k in response.json().get("keys", [])}
+        self.fetched_at = monotonic()
+
+    def get_pool_id(self) -> str:
+        """
+        Look up the user pool ID
+
+        Returns:
+            str: The user pool ID
+        """
+
+        # FIXME: matching
+        response = self.cognito_client.list_user_pools(MaxResults=1)
+        pool_id = response.get("UserPools", [])[0].get("Id")
+        logging.debug(f"Pool id: {pool_id}")
+        return pool_id
+
+    def get_jwks_url(self) -> str:
+        """
+        Get the URL of the user pool keys
+
+        Returns:
+            str: The URL
+        """
+
+        if self.jwks_host:
+            return f"{self.jwks_host}/{self.pool_id}/{self.jwks_file}"
+        return f"https://cognito-idp.{self.region}.amazonaws.com/{self.pool_id}/.well-known/jwks.json"
@@ -0,0 +1,435 @@
+"""
+Long-lived AMQP publisher, with asynchronous publisher confirms
+"""
+
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import functools
+import itertools
+import logging
+import threading
+from time import monotonic, sleep
+
+import pika
+import pika.channel
+import pika.exceptions
+import pika.frame
+import pika.spec
+
+
+class MessageReturnedError(Exception):
+
+    """
+    Raised when the broker could not route a mandatory message
+    """
+
+    pass
+
+
+class MessageNackedError(Exception):
+
+    """
+    Raised when the broker did not accept a message
+    """
+
+    pass
+
+
+class PublisherChannel:
+
+    """
+    A channel in confirm mode, its declarations, and its unconfirmed messages
+
+    Attributes:
+        channel (pika.channel.Channel): The AMQP channel
+        delivery_tags (itertools.count): Delivery tags, as numbered by the broker
+        pending (dict[int, Future]): Unconfirmed messages, by delivery tag
+        returned (set[int]): Delivery tags of messages returned by the broker
+        declared (set[tuple]): Exchanges and queues declared on the channel
+    """
+
+    def __init__(self, channel: pika.channel.Channel):
+        """
+        Constructor for publisher channel
+
+        Args:
+            channel (pika.channel.Channel): The AMQP channel
+        """
+
+        self.channel = channel
+        self.delivery_tags = itertools.count(1)
+        self.pending = {}
+        self.returned = set()
+        self.declared = set()
+
+    def fail_pending(self, error: Exception) -> None:
+        """
+        Fail all unconfirmed messages
+
+        Args:
+            error (Exception): The reason
+        """
+
+        for future in self.pending.values():
+            future.set_exception(error)
+        self.pending.clear()
+        self.returned.clear()
+
+
+class AMQPPublisher:
+
+    """
+    Publisher that keeps a connection and a pool of channels open on an I/O thread
+
+    Messages are published without waiting for the broker. Each publish returns a
+    future, which is resolved when the broker confirms the message. The broker may
+    confirm many messages at once. Exchanges and queues are declared once per
+    channel, since commands are only ordered within a channel. After the connection
+    drops, it is reopened, and messages published in the meantime are sent once it
+    is, unless they time out first. Cancelled messages are not sent.
+
+    Attributes:
+        host (str): The AMQP host
+        num_channels (int): The number of channels to publish on
+        reconnect_wait (int): Seconds to wait before reconnecting
+        backlog_timeout (float): Seconds a message may wait for an open channel
+        connection (pika.SelectConnection | None): The connection, once opened
+        channels (list[PublisherChannel]): Open channels in confirm mode
+        backlog (deque): Messages waiting for an open channel, with their deadlines
+        counter (itertools.count): Counter to spread messages across channels
+        lock (threading.Lock): Lock for the backlog and I/O thread
+        thread (threading.Thread | None): The I/O thread, started on first publish
+        stopping (bool): Whether the publisher is shutting down
+    """
+
+    def __init__(
+        self, host: str, num_channels: int, reconnect_wait: int, backlog_timeout: float
+    ):
+        """
+        Constructor for AMQP publisher
+
+        Args:
+            host (str): The AMQP host
+            num_channels (int): The number of channels to publish on
+            reconnect_wait (int): Seconds to wait before reconnecting
+            backlog_timeout (float): Seconds a message may wait for an open channel
+        """
+
+        self.host = host
+        self.num_channels = num_channels
+        self.reconnect_wait = reconnect_wait
+        self.backlog_timeout = backlog_timeout
+        self.connection = None
+        self.channels = []
+        self.backlog = deque()
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stopping = False
+
+    def publish(
+        self,
+        exchange: str,
+        exchange_type: str,
+        routing_key: str,
+        queue: str,
+        body: str,
+    ) -> Future:
+        """
+        Publish a message, declaring its exchange and queue if needed
+
+        Args:
+            exchange (str): The exchange
+            exchange_type (str): The exchange type
+            routing_key (str): The routing key
+            queue (str): The durable queue to declare with the exchange
+            body (str): The message body
+
+        Returns:
+            Future: Resolved once the broker confirms the message, and cancellable until sent
+        """
+
+        future = Future()
+        deadline = monotonic() + self.backlog_timeout
+        with self.lock:
+            self.backlog.append(
+                (deadline, exchange, exchange_type, routing_key, queue, body, future)
+            )
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name="amqp_publisher", daemon=True
+                )
+                self.thread.start()
+        connection = self.connection
+        if connection is not None and connection.is_open:
+            try:
+                connection.ioloop.add_callback_threadsafe(self.flush_backlog)
+            except Exception:
+                # The backlog is sent once the connection is reopened
+                logging.debug("Could not wake AMQP publisher")
+        return future
+
+    def close(self) -> None:
+        """
+        Close the connection and stop the I/O thread
+        """
+
+        self.stopping = True
+        connection = self.connection
+        if connection is not None and connection.is_open:
+            connection.ioloop.add_callback_threadsafe(connection.close)
+        if self.thread is not None:
+            self.thread.join(self.reconnect_wait)
+
+    def run(self) -> None:
+        """
+        Run the connection's I/O loop, reconnecting when it closes
+        """
+
+        while not self.stopping:
+            logging.info(f"Connecting AMQP publisher to {self.host}")
+            self.connection = pika.SelectConnection(
+                pika.ConnectionParameters(host=self.host),
+                on_open_callback=self.on_connection_open,
+                on_open_error_callback=self.on_connection_error,
+                on_close_callback=self.on_connection_closed,
+            )
+            self.connection.ioloop.start()
+            if not self.stopping:
+                self.expire_backlog()
+                sleep(self.reconnect_wait)
+                self.expire_backlog()
+
+    def on_connection_open(self, connection: pika.SelectConnection) -> None:
+        """
+        Open the channel pool
+
+        Args:
+            connection (pika.SelectConnection): The connection
+        """
+
+        logging.info("AMQP publisher connected")
+        for _ in range(self.num_channels):
+            connection.channel(on_open_callback=self.on_channel_open)
+
+    def on_connection_error(
+        self, connection: pika.SelectConnection, error: Exception
+    ) -> None:
+        """
+        Give up on a connection that could not be opened
+
+        Args:
+            connection (pika.SelectConnection): The connection
+            error (Exception): The reason
+        """
+
+        logging.error(f"AMQP publisher could not connect: {error}")
+        connection.ioloop.stop()
+
+    def on_connection_closed(
+        self, connection: pika.SelectConnection, reason: Exception
+    ) -> None:
+        """
+        Fail unconfirmed messages and stop the I/O loop, so the connection is reopened
+
+        Args:
+            connection (pika.SelectConnection): The connection
+            reason (Exception): The reason
+        """
+
+        logging.warning(f"AMQP publisher connection closed: {reason}")
+        for publisher_channel in self.channels:
+            publisher_channel.fail_pending(
+                pika.exceptions.AMQPConnectionError(str(reason))
+            )
+        self.channels = []
+        connection.ioloop.stop()
+
+    def on_channel_open(self, channel: pika.channel.Channel) -> None:
+        """
+        Put a new channel in confirm mode
+
+        Args:
+            channel (pika.channel.Channel): The channel
+        """
+
+        publisher_channel = PublisherChannel(channel)
+        channel.add_on_close_callback(
+            functools.partial(self.on_channel_closed, publisher_channel)
+        )
+        channel.add_on_return_callback(
+            functools.partial(self.on_return, publisher_channel)
+        )
+        channel.confirm_delivery(
+            ack_nack_callback=functools.partial(self.on_confirm, publisher_channel),
+            callback=functools.partial(self.on_confirm_mode, publisher_channel),
+        )
+
+    def on_confirm_mode(self, publisher_channel: PublisherChannel, _) -> None:
+        """
+        Start publishing on a channel once it is in confirm mode
+
+        Args:
+            publisher_channel (PublisherChannel): The channel
+        """
+
+        self.channels.append(publisher_channel)
+        self.flush_backlog()
+
+    def on_channel_closed(
+        self,
+        publisher_channel: PublisherChannel,
+        channel: pika.channel.Channel,
+        reason: Exception,
+    ) -> None:
+        """
+        Fail a closed channel's unconfirmed messages, and replace the channel
+
+        Args:
+            publisher_channel (PublisherChannel): The channel
+            channel (pika.channel.Channel): The AMQP channel
+            reason (Exception): The reason
+        """
+
+        logging.warning(f"AMQP publisher channel closed: {reason}")
+        if publisher_channel in self.channels:
+            self.channels.remove(publisher_channel)
+        publisher_channel.fail_pending(pika.exceptions.ChannelClosed(0, str(reason)))
+        if self.connection.is_open and not self.stopping:
+            self.connection.channel(on_open_callback=self.on_channel_open)
+
+    def on_return(
+        self,
+        publisher_channel: PublisherChannel,
+        channel: pika.channel.Channel,
+        method: pika.spec.Basic.Return,
+        properties: pika.spec.BasicProperties,
+        body: bytes,
+    ) -> None:
+        """
+        Record a message the broker could not route, before it is confirmed
+
+        Args:
+            publisher_channel (PublisherChannel): The channel
+            channel (pika.channel.Channel): The AMQP channel
+            method (pika.spec.Basic.Return): The return method
+            properties (pika.spec.BasicProperties): The message properties
+            body (bytes): The message body
+        """
+
+        logging.warning(f"Message {body} returned: {method.reply_text}")
+        if properties.message_id:
+            publisher_channel.returned.add(int(properties.message_id))
+
+    def on_confirm(
+        self, publisher_channel: PublisherChannel, frame: pika.frame.Method
+    ) -> None:
+        """
+        Resolve messages the broker confirmed, one or many at a time
+
+        Args:
+            publisher_channel (PublisherChannel): The channel
+            frame (pika.frame.Method): The ack or nack frame
+        """
+
+        method = frame.method
+        if method.multiple:
+            delivery_tags = [
+                t for t in publisher_channel.pending if t <= method.delivery_tag
+            ]
+        else:
+            delivery_tags = [method.delivery_tag]
+        nacked = isinstance(method, pika.spec.Basic.Nack)
+        for delivery_tag in delivery_tags:
+            future = publisher_channel.pending.pop(delivery_tag, None)
+            if future is None:
+                continue
+            if nacked:
+                future.set_exception(MessageNackedError("Message not accepted"))
+            elif delivery_tag in publisher_channel.returned:
+                publisher_channel.returned.discard(delivery_tag)
+                future.set_exception(MessageReturnedError("Message not routed"))
+            else:
+                future.set_result(None)
+
+    def expire_backlog(self) -> None:
+        """
+        Fail waiting messages past their deadline, such as while disconnected
+        """
+
+        now = monotonic()
+        with self.lock:
+            expired = [m for m in self.backlog if m[0] <= now]
+            if not expired:
+                return
+            self.backlog = deque(m for m in self.backlog if m[0] > now)
+        logging.warning(f"{len(expired)} messages timed out waiting to be published")
+        for *_, future in expired:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(
+                    FutureTimeoutError("Message not published before timeout")
+                )
+
+    def flush_backlog(self) -> None:
+        """
+        Send waiting messages on open channels, from the I/O thread
+        """
+
+        self.expire_backlog()
+        while self.channels:
+            with self.lock:
+                if not self.backlog:
+                    return
+                _, *message = self.backlog.popleft()
+            publisher_channel = self.channels[next(self.counter) % len(self.channels)]
+            self.send(publisher_channel, *message)
+
+    def send(
+        self,
+        publisher_channel: PublisherChannel,
+        exchange: str,
+        exchange_type: str,
+        routing_key: str,
+        queue: str,
+        body: str,
+        future: Future,
+    ) -> None:
+        """
+        Send a message on a channel, from the I/O thread
+
+        Args:
+            publisher_channel (PublisherChannel): The channel
+            exchange (str): The exchange
+            exchange_type (str): The exchange type
+            routing_key (str): The routing key
+            queue (str): The durable queue to declare with the exchange
+            body (str): The message body
+            future (Future): Resolved once the broker confirms the message
+        """
+
+        if not future.set_running_or_notify_cancel():
+            logging.debug(f"Message {body} cancelled before it was sent")
+            return
+        channel = publisher_channel.channel
+        delivery_tag = None
+        try:
+            if (exchange, queue) not in publisher_channel.declared:
+                # Commands on a channel are ordered, so publishing need not wait for these
+                channel.exchange_declare(exchange=exchange, exchange_type=exchange_type)
+                channel.queue_declare(queue=queue, durable=True)
+                publisher_channel.declared.add((exchange, queue))
+            delivery_tag = next(publisher_channel.delivery_tags)
+            publisher_channel.pending[delivery_tag] = future
+            channel.basic_publish(
+                exchange=exchange,
+                routing_key=routing_key,
+                body=body,
+                properties=pika.BasicProperties(
+                    content_type="text/plain", message_id=str(delivery_tag)
+                ),
+                mandatory=True,
+            )
+        except Exception as e:
+            logging.exception(f"Could not publish message {body}")
+            publisher_channel.pending.pop(delivery_tag, None)
+            future.set_exception(e)
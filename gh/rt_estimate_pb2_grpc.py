@@ -0,0 +1,99 @@
+# Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
+"""Client and server classes corresponding to protobuf-defined services."""
+import grpc
+
+import rt_estimate_pb2 as rt__estimate__pb2
+
+
+class RtEstimatesStub(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.GetRtEstimates = channel.unary_unary(
+                '/RtEstimates/GetRtEstimates',
+                request_serializer=rt__estimate__pb2.RtEstimateRequest.SerializeToString,
+                response_deserializer=rt__estimate__pb2.RtEstimateResponse.FromString,
+                )
+        self.GetRtEstimatesBatch = channel.unary_unary(
+                '/RtEstimates/GetRtEstimatesBatch',
+                request_serializer=rt__estimate__pb2.RtEstimateBatchRequest.SerializeToString,
+                response_deserializer=rt__estimate__pb2.RtEstimateBatchResponse.FromString,
+                )
+
+
+class RtEstimatesServicer(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def GetRtEstimates(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetRtEstimatesBatch(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_RtEstimatesServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'GetRtEstimates': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetRtEstimates,
+                    request_deserializer=rt__estimate__pb2.RtEstimateRequest.FromString,
+                    response_serializer=rt__estimate__pb2.RtEstimateResponse.SerializeToString,
+            ),
+            'GetRtEstimatesBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetRtEstimatesBatch,
+                    request_deserializer=rt__estimate__pb2.RtEstimateBatchRequest.FromString,
+                    response_serializer=rt__estimate__pb2.RtEstimateBatchResponse.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'RtEstimates', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+
+
+ # This class is part of an EXPERIMENTAL API.
+class RtEstimates(object):
+    """Missing associated documentation comment in .proto file."""
+
+    @staticmethod
+    def GetRtEstimates(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/RtEstimates/GetRtEstimates',
+            rt__estimate__pb2.RtEstimateRequest.SerializeToString,
+            rt__estimate__pb2.RtEstimateResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def GetRtEstimatesBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/RtEstimates/GetRtEstimatesBatch',
+            rt__estimate__pb2.RtEstimateBatchRequest.SerializeToString,
+            rt__estimate__pb2.RtEstimateBatchResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
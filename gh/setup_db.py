@@ -84,6 +84,18 @@ def create_database() -> None:
     logging.info("Created database and collections")
 
 
+def create_indexes() -> None:
+    """
+    Create indexes for lookups made on every job
+    """
+
+    logging.info(f"Creating index on name in collection {USERS_COLLECTION}")
+    client = MongoClient(DB_CONNECTION)
+    database = client[DATABASE_NAME]
+    database[USERS_COLLECTION].create_index("name")
+    logging.info("Created indexes")
+
+
 def create_users(users: list[dict]) -> None:
     """
     Create a document for each user
@@ -106,5 +118,6 @@ if __name__ == "__main__":
     logging.info("Starting local/testing setup script")
     wait_for_database()
     create_database()
+    create_indexes()
     create_users(USERS)
     logging.info("Done")
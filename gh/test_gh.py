@@ -2,23 +2,49 @@
 Global.health system components test suite
 """
 
+import base64
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import date, datetime, timedelta, timezone
 import json
 import logging
 import multiprocessing
 import os
+import time
 from time import sleep
+import uuid
 
 import boto3
 import pika
 import pika.exceptions
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pymongo import MongoClient
 import pytest
 import requests
 from requests.auth import HTTPBasicAuth
 
-from amqp_server import publish_message, FLASK_PORT
-from aws import get_jwt, get_certificate
-from db import get_gh_db_data
+from amqp_server import publish_message, run_jobs, FLASK_PORT
+from publisher import (
+    AMQPPublisher,
+    MessageNackedError,
+    MessageReturnedError,
+    PublisherChannel,
+)
+from util import clean_cases_data
+import amqp_server
+from cases_pb2 import CasesChunk
+import aws
+from aws import CertificateCache, SecretCache, TokenCache
+import db
+from db import (
+    claim_job,
+    get_curation_data,
+    get_gh_db_data,
+    get_job,
+    store_data_in_db,
+    submit_job,
+    update_job,
+)
 from constants import (
     PARTNER_A_NAME,
     ESTIMATE_RT_JOB,
@@ -37,11 +63,24 @@ from constants import (
     PartnerA,
     PATHOGEN_DATA_DESTINATIONS,
     USERS_COLLECTION,
+    JOBS_COLLECTION,
+    JOB_RUNNING,
+    JOB_SUCCEEDED,
+    JOB_FAILED,
     AMQP_HOST,
     TOPIC_A_EXCHANGE,
     TOPIC_A_ROUTE,
+    CASE_KEY_FIELDS,
+    SECRET_REFRESH_INTERVAL,
+)
+import grpc_client
+from grpc_client import (
+    CHANNEL_REGISTRY,
+    ChannelRegistry,
+    get_partner_cases,
+    get_partner_credentials,
+    stream_partner_cases,
 )
-from grpc_client import get_partner_cases, get_credentials
 
 
 SECRETS_CLIENT = boto3.client(
@@ -120,7 +159,30 @@ def send_work_request(key: str, pathogen: str, job: str):
 
     auth = HTTPBasicAuth(PartnerA.name, key)
     url = f"{GH_WORK_REQUEST_URL}/{pathogen}/{job}"
-    _ = requests.get(url, auth=auth)
+    response = requests.get(url, auth=auth)
+    assert response.status_code == 202
+    wait_for_job(auth, response.json().get("id"))
+
+
+def wait_for_job(auth: HTTPBasicAuth, job_id: str) -> dict:
+    """
+    Wait for a submitted job to finish
+
+    Args:
+        auth (HTTPBasicAuth): Credentials for the Global.health server
+        job_id (str): The job ID
+
+    Returns:
+        dict: The finished job
+    """
+
+    url = f"{GH_WORK_REQUEST_URL}/jobs/{job_id}"
+    for _ in range(RETRIES):
+        job = requests.get(url, auth=auth).json()
+        if job.get("status") in ("succeeded", "failed"):
+            return job
+        sleep(WAIT_TIME)
+    pytest.fail(f"Job {job_id} did not finish")
 
 
 def approve_data(collection_name: str):
@@ -237,21 +299,88 @@ def test_server_publishes_messages():
     )
 
     try:
-        publish_message(message=FAKE_MESSAGE, pathogen_config=pathogen_config)
-    except pika.exceptions.UnroutableError:
+        publish_message(message=FAKE_MESSAGE, pathogen_config=pathogen_config).result(
+            timeout=WAIT_TIME * RETRIES
+        )
+    except MessageReturnedError:
         pytest.fail("Message was returned")
 
 
+def test_publisher_declares_per_channel():
+    """
+    Each channel should declare exchanges and queues before publishing, and skip cancelled messages
+    """
+
+    class FakeChannel:
+        def __init__(self):
+            self.calls = []
+
+        def exchange_declare(self, **kwargs):
+            self.calls.append("exchange_declare")
+
+        def queue_declare(self, **kwargs):
+            self.calls.append("queue_declare")
+
+        def basic_publish(self, **kwargs):
+            self.calls.append("basic_publish")
+
+    publisher = AMQPPublisher("localhost", 2, 1, 1)
+    channels = [PublisherChannel(FakeChannel()) for _ in range(2)]
+    for channel in channels + channels:
+        publisher.send(channel, "exchange", "topic", "route", "queue", "body", Future())
+    for channel in channels:
+        assert channel.channel.calls == [
+            "exchange_declare",
+            "queue_declare",
+            "basic_publish",
+            "basic_publish",
+        ]
+
+    cancelled = Future()
+    cancelled.cancel()
+    publisher.send(
+        channels[0], "exchange", "topic", "route", "queue", "body", cancelled
+    )
+    assert channels[0].channel.calls.count("basic_publish") == 2
+
+
+def test_publisher_backlog_times_out():
+    """
+    Messages should fail if they cannot be published before the backlog timeout
+    """
+
+    publisher = AMQPPublisher("127.0.0.1", 1, 1, 0.1)
+    try:
+        future = publisher.publish("exchange", "topic", "route", "queue", "body")
+        assert isinstance(future.exception(timeout=10), FutureTimeoutError)
+    finally:
+        publisher.close()
+
+
+def test_jobs_wait_for_confirms(monkeypatch):
+    """
+    Jobs should fail if the broker does not accept their messages
+    """
+
+    class NackingPublisher:
+        def publish(self, *args) -> Future:
+            future = Future()
+            future.set_exception(MessageNackedError("Message not accepted"))
+            return future
+
+    monkeypatch.setattr(amqp_server, "PUBLISHER", NackingPublisher())
+    pathogen_config = PATHOGEN_DATA_DESTINATIONS.get(PATHOGEN_A)
+    with pytest.raises(MessageNackedError):
+        amqp_server.publish_message_and_wait(FAKE_MESSAGE, pathogen_config)
+
+
 def test_get_partner_cases():
     """
     The gRPC client should get cases from a partner and store them in a database
     """
 
-    token = get_jwt()
-    certificate = get_certificate(PartnerA.domain_name)
-    credentials = get_credentials(token, certificate)
     try:
-        cases = get_partner_cases(PATHOGEN_A, PartnerA, credentials)
+        cases = get_partner_cases(PATHOGEN_A, PartnerA)
     except Exception:
         pytest.fail("Failed to get cases")
     finally:
@@ -260,6 +389,311 @@ def test_get_partner_cases():
     assert cases
 
 
+def test_stream_partner_cases():
+    """
+    The gRPC client should stream cases from a partner in chunks
+    """
+
+    try:
+        chunks = list(stream_partner_cases(PATHOGEN_A, PartnerA))
+    except Exception:
+        pytest.fail("Failed to stream cases")
+    assert chunks
+    assert all(chunk.next_cursor for chunk in chunks)
+
+
+def test_jwt_refreshed_in_background():
+    """
+    The JWT should be refreshed in the background, the refresh margin before it expires
+    """
+
+    class FakeCognitoClient:
+        def __init__(self, expires_in: int):
+            self.expires_in = expires_in
+            self.auth_flows = []
+
+        def initiate_auth(self, AuthFlow, AuthParameters, ClientId):
+            self.auth_flows.append(AuthFlow)
+            return {
+                "AuthenticationResult": {
+                    "AccessToken": f"token-{len(self.auth_flows)}",
+                    "RefreshToken": "refresh",
+                    "ExpiresIn": self.expires_in,
+                }
+            }
+
+    cache = TokenCache(300)
+    cache.cognito_client = FakeCognitoClient(3600)
+    cache.client_id = "client"
+    try:
+        start = time.monotonic()
+        assert cache.get_token() == "token-1"
+        end = time.monotonic()
+        assert start + 3300 <= cache.refresh_at <= end + 3300
+    finally:
+        cache.timer.cancel()
+
+    # Short-lived tokens are refreshed halfway through their lifetime
+    cache = TokenCache(300)
+    cache.cognito_client = FakeCognitoClient(2)
+    cache.client_id = "client"
+    try:
+        assert cache.get_token() == "token-1"
+        sleep(1.5)
+        assert cache.access_token == "token-2"
+        assert cache.get_token() == "token-2"
+        assert cache.cognito_client.auth_flows == [
+            "USER_PASSWORD_AUTH",
+            "REFRESH_TOKEN_AUTH",
+        ]
+    finally:
+        cache.timer.cancel()
+
+
+def test_certificates_cached(monkeypatch):
+    """
+    Certificates should be cached until their time to live passes or they are rotated
+    """
+
+    fetched = []
+
+    def fake_fetch_certificate(domain_name: str) -> tuple[bytes, str]:
+        fetched.append(domain_name)
+        return f"certificate-{len(fetched)}".encode(), f"arn:{domain_name}"
+
+    monkeypatch.setattr(aws, "fetch_certificate", fake_fetch_certificate)
+    cache = CertificateCache(3600)
+    assert cache.get("a") == b"certificate-1"
+    assert cache.get("a") == b"certificate-1"
+    assert cache.get("b") == b"certificate-2"
+
+    cache.invalidate(domain_name="a")
+    assert cache.get("a") == b"certificate-3"
+    cache.invalidate(certificate_arn="arn:b")
+    assert cache.get("b") == b"certificate-4"
+    assert fetched == ["a", "b", "a", "b"]
+
+    cache = CertificateCache(1)
+    assert cache.get("a") == b"certificate-5"
+    assert cache.get("a") == b"certificate-5"
+    sleep(1.1)
+    assert cache.get("a") == b"certificate-6"
+
+
+def test_certificate_events_authorized(monkeypatch):
+    """
+    Partners should only be able to drop their own cached certificates
+    """
+
+    invalidated = []
+    monkeypatch.setattr(amqp_server, "get_secret", lambda *args, **kwargs: ("pw", "1"))
+    monkeypatch.setattr(
+        amqp_server,
+        "invalidate_certificate",
+        lambda domain_name, arns: invalidated.append((domain_name, arns)),
+    )
+    monkeypatch.setattr(amqp_server, "CERTIFICATE_EVENT_USERS", ["events"])
+    client = amqp_server.APP.test_client()
+
+    def post_event(user_name: str, domain_name: str) -> int:
+        credentials = base64.b64encode(f"{user_name}:pw".encode()).decode()
+        response = client.post(
+            "/events/certificates",
+            json={"detail": {"CommonName": domain_name}, "resources": ["arn:x"]},
+            headers={"Authorization": f"Basic {credentials}"},
+        )
+        return response.status_code
+
+    assert post_event(PartnerA.name, PartnerA.domain_name) == 200
+    assert post_event(PartnerA.name, "other.example.com") == 403
+    assert post_event("stranger", PartnerA.domain_name) == 403
+    assert post_event("events", "other.example.com") == 200
+    assert invalidated == [
+        (PartnerA.domain_name, []),
+        ("other.example.com", ["arn:x"]),
+    ]
+
+
+def test_partner_credentials_cached():
+    """
+    The gRPC client should reuse channel credentials, which stay valid as tokens change
+    """
+
+    credentials = get_partner_credentials(PartnerA)
+    assert get_partner_credentials(PartnerA) is credentials
+    cases = get_partner_cases(PATHOGEN_A, PartnerA)
+    assert cases.cases
+
+
+def test_partner_channels_reused():
+    """
+    The gRPC client should spread calls over the same open channels to a partner
+    """
+
+    channels = [
+        CHANNEL_REGISTRY.get_channel(PartnerA)
+        for _ in range(2 * CHANNEL_REGISTRY.channels_per_partner)
+    ]
+    assert len(set(map(id, channels))) == CHANNEL_REGISTRY.channels_per_partner
+    for _ in range(2):
+        assert get_partner_cases(PATHOGEN_A, PartnerA).cases
+
+
+def test_run_jobs_without_partners():
+    """
+    Jobs for a pathogen without partners should do nothing
+    """
+
+    assert run_jobs("No such pathogen", GET_CASES_JOB) == {}
+
+
+def test_channels_keyed_by_certificate(monkeypatch):
+    """
+    Channels to a partner should be reused across calls until its certificate changes
+    """
+
+    certificate = {"value": b"certificate-1"}
+    monkeypatch.setattr(
+        grpc_client, "get_certificate", lambda domain_name: certificate["value"]
+    )
+    registry = ChannelRegistry(2)
+    try:
+        channels = [registry.get_channel(PartnerA) for _ in range(4)]
+        assert len(set(map(id, channels))) == 2
+        assert channels[:2] == channels[2:]
+
+        certificate["value"] = b"certificate-2"
+        rotated = registry.get_channel(PartnerA)
+        assert rotated not in channels
+    finally:
+        registry.close()
+
+
+def test_curation_data_cached(monkeypatch):
+    """
+    Curation data should be read once per time to live
+    """
+
+    reads = []
+
+    class FakeUsersCollection:
+        def find_one(self, query: dict) -> dict:
+            reads.append(query)
+            return {"name": query["name"], "roles": [f"role-{len(reads)}"]}
+
+    fake_client = {DATABASE_NAME: {USERS_COLLECTION: FakeUsersCollection()}}
+    monkeypatch.setattr(db, "get_client", lambda: fake_client)
+    monkeypatch.setattr(db, "CURATION_CACHE", {})
+    monkeypatch.setattr(db, "CURATION_CACHE_TTL", 1)
+
+    assert get_curation_data(PartnerA.name)["roles"] == ["role-1"]
+    assert get_curation_data(PartnerA.name)["roles"] == ["role-1"]
+    assert len(reads) == 1
+    sleep(1.1)
+    assert get_curation_data(PartnerA.name)["roles"] == ["role-2"]
+    assert len(reads) == 2
+
+
+def test_store_data_upserts():
+    """
+    Storing data with key fields should replace documents instead of duplicating them
+    """
+
+    collection_name = CASE_COLLECTIONS.get(PATHOGEN_A)
+    cases = clean_cases_data([{"id": i, "outcome": "recovered"} for i in range(1, 6)])
+    for case in cases:
+        case["partner"] = PartnerA.name
+    store_data_in_db(cases, collection_name, CASE_KEY_FIELDS)
+    updated = [{**case, "outcome": "death"} for case in cases]
+    store_data_in_db(updated, collection_name, CASE_KEY_FIELDS)
+    # Without a case ID, documents cannot be matched, so they are added
+    unkeyed = [{"partner": PartnerA.name, "outcome": "death"} for _ in range(2)]
+    store_data_in_db(unkeyed, collection_name, CASE_KEY_FIELDS)
+
+    data = get_gh_db_data(collection_name)
+    assert len(data) == 7
+    assert all(d.get("outcome") == "death" for d in data)
+    assert sorted(d["case_id"] for d in data if "case_id" in d) == [1, 2, 3, 4, 5]
+    # Upserts look documents up by key, and concurrent jobs cannot add duplicates
+    indexes = MongoClient(DB_CONNECTION)[DATABASE_NAME][
+        collection_name
+    ].index_information()
+    assert any(
+        index.get("unique") and [k for k, _ in index["key"]] == CASE_KEY_FIELDS
+        for index in indexes.values()
+    )
+
+    reset_database(collection_name)
+
+
+def test_get_cases_job_keeps_arrow_cases_columnar(monkeypatch):
+    """
+    Cases sent as Arrow should be stored as documents in batches and as JSON in S3, and as Parquet if enabled
+    """
+
+    table = pa.table(
+        {
+            "pathogen": pa.array([PATHOGEN_A] * 3).dictionary_encode(),
+            "id": pa.array([1, 2, 3], type=pa.int32()),
+            "outcome": pa.array(["recovered", None, "death"]).dictionary_encode(),
+            "date_confirmation": pa.array(
+                [date(2023, 1, 1), date(2023, 1, 2), None], type=pa.date32()
+            ),
+        }
+    )
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    chunk = CasesChunk(arrow_cases=sink.getvalue().to_pybytes(), next_cursor=3)
+
+    stored = []
+    uploaded = {}
+
+    def fake_store_file_in_s3(bucket_name, folder, file_name, key=""):
+        if key.endswith(".parquet"):
+            uploaded[key] = pq.read_table(file_name)
+        else:
+            with open(file_name) as fh:
+                uploaded[key] = json.load(fh)
+
+    monkeypatch.setattr(amqp_server, "DB_BATCH_SIZE", 2)
+    monkeypatch.setattr(amqp_server, "stream_partner_cases", lambda *a, **k: [chunk])
+    monkeypatch.setattr(
+        amqp_server, "get_curation_data", lambda name: {"name": name, "roles": []}
+    )
+    monkeypatch.setattr(
+        amqp_server,
+        "store_data_in_db",
+        lambda data, collection_name, key_fields: stored.append(data),
+    )
+    monkeypatch.setattr(amqp_server, "store_file_in_s3", fake_store_file_in_s3)
+
+    pathogen_config = PATHOGEN_DATA_DESTINATIONS.get(PATHOGEN_A)
+    monkeypatch.setattr(amqp_server, "CASES_PARQUET", False)
+    assert amqp_server.run_get_cases_job(pathogen_config, PartnerA) == 3
+    assert list(uploaded) == [f"{PATHOGEN_A}.json"]
+    json_cases = uploaded[f"{PATHOGEN_A}.json"]
+    assert [c["case_id"] for c in json_cases] == [1, 2, 3]
+    assert json_cases[0]["date_confirmation"] == "01-01-2023"
+
+    assert [len(batch) for batch in stored] == [2, 1]
+    documents = [document for batch in stored for document in batch]
+    assert [d["case_id"] for d in documents] == [1, 2, 3]
+    assert documents[0]["date_confirmation"] == "01-01-2023"
+    assert "outcome" not in documents[1]
+    assert "date_confirmation" not in documents[2]
+    assert all(d["partner"] == PartnerA.name for d in documents)
+
+    stored.clear()
+    uploaded.clear()
+    monkeypatch.setattr(amqp_server, "CASES_PARQUET", True)
+    assert amqp_server.run_get_cases_job(pathogen_config, PartnerA) == 3
+    assert list(uploaded) == [f"{PATHOGEN_A}.json", f"{PATHOGEN_A}.parquet"]
+    parquet_table = uploaded[f"{PATHOGEN_A}.parquet"]
+    assert parquet_table.column("case_id").to_pylist() == [1, 2, 3]
+    assert pa.types.is_date(parquet_table.column("date_confirmation").type)
+
+
 def test_rest_to_grpc_to_data():
     """
     The server should receive work requests for case data, delegate the work to a partner, and store the results in a database and data store
@@ -520,6 +954,175 @@ def test_curator_data_not_public():
     reset_database(collection_name)
 
 
+def test_job_status():
+    """
+    Submitted jobs should be queued and report their status when finished
+    """
+
+    api_key = get_api_key()
+    auth = HTTPBasicAuth(PartnerA.name, api_key)
+    response = requests.get(
+        f"{GH_WORK_REQUEST_URL}/{PATHOGEN_A}/{GET_CASES_JOB}", auth=auth
+    )
+    assert response.status_code == 202
+    job = wait_for_job(auth, response.json().get("id"))
+    assert job.get("status") == "succeeded"
+    assert job.get("results", {}).get(PartnerA.name, {}).get("stored")
+
+    response = requests.get(f"{GH_WORK_REQUEST_URL}/jobs/unknown", auth=auth)
+    assert response.status_code == 404
+
+
+def test_identical_jobs_shared():
+    """
+    Identical jobs submitted before the first finishes should share one job
+    """
+
+    job_key = uuid.uuid4().hex
+    first, first_created = submit_job(PATHOGEN_A, ESTIMATE_RT_JOB, "a", job_key)
+    second, second_created = submit_job(PATHOGEN_A, ESTIMATE_RT_JOB, "b", job_key)
+    assert first_created
+    assert not second_created
+    assert first["_id"] == second["_id"]
+
+    update_job(first["_id"], JOB_SUCCEEDED)
+    third, third_created = submit_job(PATHOGEN_A, ESTIMATE_RT_JOB, "a", job_key)
+    assert third_created
+    assert third["_id"] != first["_id"]
+
+    reset_database(JOBS_COLLECTION)
+
+
+def test_stale_jobs_not_shared():
+    """
+    Unfinished jobs older than the job timeout should be failed instead of shared
+    """
+
+    job_key = uuid.uuid4().hex
+    first, _ = submit_job(PATHOGEN_A, ESTIMATE_RT_JOB, "a", job_key, timeout=60)
+    update_job(first["_id"], JOB_RUNNING)
+    collection = MongoClient(DB_CONNECTION)[DATABASE_NAME][JOBS_COLLECTION]
+    collection.update_one(
+        {"_id": first["_id"]},
+        {"$set": {"updatedAt": datetime.now(timezone.utc) - timedelta(seconds=120)}},
+    )
+
+    second, created = submit_job(PATHOGEN_A, ESTIMATE_RT_JOB, "a", job_key, timeout=60)
+    assert created
+    assert second["_id"] != first["_id"]
+    assert get_job(first["_id"])["status"] == JOB_FAILED
+
+    reset_database(JOBS_COLLECTION)
+
+
+def test_running_jobs_claimed_once():
+    """
+    Queued jobs should be claimed once, and running jobs only once their lease expires
+    """
+
+    job_key = uuid.uuid4().hex
+    job, _ = submit_job(PATHOGEN_A, ESTIMATE_RT_JOB, "a", job_key)
+    assert claim_job(job["_id"], 60)["status"] == JOB_RUNNING
+    assert claim_job(job["_id"], 60) is None
+
+    collection = MongoClient(DB_CONNECTION)[DATABASE_NAME][JOBS_COLLECTION]
+    collection.update_one(
+        {"_id": job["_id"]},
+        {"$set": {"updatedAt": datetime.now(timezone.utc) - timedelta(seconds=120)}},
+    )
+    assert claim_job(job["_id"], 60)["status"] == JOB_RUNNING
+
+    update_job(job["_id"], JOB_SUCCEEDED)
+    assert claim_job(job["_id"], 0) is None
+
+    reset_database(JOBS_COLLECTION)
+
+
+def test_queued_job_errors_recorded(monkeypatch):
+    """
+    Queued jobs should be failed, not lost, when the database errors, and skipped when already claimed
+    """
+
+    updates = []
+
+    def fail_claim(job_id, lease):
+        raise ConnectionError("Database unavailable")
+
+    monkeypatch.setattr(amqp_server, "claim_job", fail_claim)
+    monkeypatch.setattr(amqp_server, "update_job", lambda *args: updates.append(args))
+    amqp_server.run_queued_job(
+        {"id": "job", "pathogen": PATHOGEN_A, "job": GET_CASES_JOB}
+    )
+    assert updates == [("job", JOB_FAILED, {"error": "Database unavailable"})]
+
+    def run_jobs(pathogen_name, job_name):
+        pytest.fail("Claimed jobs should not run again")
+
+    monkeypatch.setattr(amqp_server, "claim_job", lambda job_id, lease: None)
+    monkeypatch.setattr(amqp_server, "run_jobs", run_jobs)
+    amqp_server.run_queued_job(
+        {"id": "job", "pathogen": PATHOGEN_A, "job": GET_CASES_JOB}
+    )
+    assert len(updates) == 1
+
+
+def test_rotated_api_key():
+    """
+    The server should accept a partner's new API key once it is rotated
+    """
+
+    old_key = get_api_key()
+    url = f"{GH_WORK_REQUEST_URL}/{PATHOGEN_A}/{ESTIMATE_RT_JOB}"
+    response = requests.get(url, auth=HTTPBasicAuth(PartnerA.name, old_key))
+    assert response.status_code == 202
+    wait_for_job(HTTPBasicAuth(PartnerA.name, old_key), response.json().get("id"))
+
+    new_key = SECRETS_CLIENT.get_random_password(ExcludePunctuation=True).get(
+        "RandomPassword"
+    )
+    SECRETS_CLIENT.put_secret_value(
+        SecretId=f"{PartnerA.name}_api_key_password", SecretString=new_key
+    )
+    try:
+        # Keys are fetched again at most once per refresh interval
+        sleep(SECRET_REFRESH_INTERVAL)
+        response = requests.get(url, auth=HTTPBasicAuth(PartnerA.name, new_key))
+        assert response.status_code == 202
+        wait_for_job(HTTPBasicAuth(PartnerA.name, new_key), response.json().get("id"))
+        response = requests.get(url, auth=HTTPBasicAuth(PartnerA.name, old_key))
+        assert response.status_code == 401
+    finally:
+        SECRETS_CLIENT.put_secret_value(
+            SecretId=f"{PartnerA.name}_api_key_password", SecretString=old_key
+        )
+        sleep(SECRET_REFRESH_INTERVAL)
+
+    reset_database(RT_COLLECTIONS.get(PATHOGEN_A))
+
+
+def test_secret_refreshes_limited():
+    """
+    Forced refreshes of a secret should be limited to one per refresh interval
+    """
+
+    class FakeSecretsClient:
+        def __init__(self):
+            self.calls = 0
+
+        def get_secret_value(self, SecretId, VersionStage):
+            self.calls += 1
+            return {"SecretString": "secret", "VersionId": str(self.calls)}
+
+    cache = SecretCache(300, 1)
+    cache.secrets_client = FakeSecretsClient()
+    assert cache.get("a") == ("secret", "1")
+    assert cache.get("a", refresh=True) == ("secret", "1")
+    assert cache.get("b", refresh=True) == ("secret", "2")
+    sleep(1.1)
+    assert cache.get("a") == ("secret", "1")
+    assert cache.get("a", refresh=True) == ("secret", "3")
+
+
 def test_healthchecks():
     """
     Healthcheck endpoints should work
@@ -6,6 +6,8 @@ import logging
 import os
 import sys
 
+from constants import CASE_ID_FIELD
+
 
 ESTIMATE_INT_FIELDS = ["cases"]
 ESTIMATE_FLOAT_FIELDS = ["rMean", "rVar", "qLower", "qUpper"]
@@ -52,6 +54,9 @@ def clean_cases_data(cases_data: list) -> list:
     for case in cases_data:
         clean_case = {}
         for k, v in case.items():
+            if k == "id":
+                # Document IDs are set by the database
+                k = CASE_ID_FIELD
             clean_case[k] = v
         clean_data.append(clean_case)
 
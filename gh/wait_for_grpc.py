@@ -5,9 +5,8 @@ Wait for the gRPC server to accept connections
 import logging
 from time import sleep
 
-from aws import get_jwt, get_certificate
 from constants import PATHOGEN_A, PartnerA
-from grpc_client import get_credentials, get_partner_cases
+from grpc_client import get_partner_cases
 from util import setup_logger
 
 
@@ -26,10 +25,7 @@ def wait_for_grpc() -> None:
     logging.info("Waiting for gRPC")
     for _ in range(MAX_ATTEMPTS):
         try:
-            token = get_jwt()
-            certificate = get_certificate(PartnerA.domain_name)
-            credentials = get_credentials(token, certificate)
-            _ = get_partner_cases(PATHOGEN_A, PartnerA, credentials)
+            _ = get_partner_cases(PATHOGEN_A, PartnerA)
             logging.info("gRPC ready")
             return
         except Exception:
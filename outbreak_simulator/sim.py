@@ -2,6 +2,7 @@
 Outbreak simulator
 """
 
+from datetime import datetime, timezone
 import logging
 import os
 import random
@@ -55,6 +56,9 @@ TRANSMISSIONS = [
     "UNK",
 ]
 
+# Format of dates in case requests
+DATE_FORMAT = "%m-%d-%Y"
+
 SIM_PORT = os.environ.get("SIM_PORT")
 
 FAKE = Faker()
@@ -111,8 +115,9 @@ class Case:
 
         self.symptoms = request.get("symptoms")
         self.date_onset = request.get("date_onset", FAKE.date(pattern="%m-%d-%Y"))
-        self.date_confirmation = request.get(
-            "date_confirmation", FAKE.date(pattern="%m-%d-%Y")
+        # Stored as a date, which partners filter and count cases by
+        self.date_confirmation = parse_date(
+            request.get("date_confirmation", FAKE.date(pattern=DATE_FORMAT))
         )
         self.confirmation_method = request.get("confirmation_method")
         self.date_of_first = request.get("date_of_first", FAKE.date(pattern="%m-%d-%Y"))
@@ -171,6 +176,24 @@ class Case:
         )
 
 
+def parse_date(value: str | None) -> datetime | None:
+    """
+    Parse a date from a case request
+
+    Args:
+        value (str | None): The date, in MM-DD-YYYY format
+
+    Returns:
+        datetime | None: Midnight UTC on the date, or None without a date
+
+    Raises:
+        ValueError: The date should be in MM-DD-YYYY format
+    """
+    if not value:
+        return None
+    return datetime.strptime(value, DATE_FORMAT).replace(tzinfo=timezone.utc)
+
+
 def save_cases(cases: list) -> None:
     """
     Save cases to the partner database
@@ -2,6 +2,7 @@
 Outbreak simulator test suite
 """
 
+from datetime import datetime, timezone
 import os
 
 import psycopg
@@ -34,7 +35,7 @@ def test_sim_creates_input_cases():
 
     assert case.location_information == location
     assert case.outcome == outcome
-    assert case.date_confirmation == date_confirmation
+    assert case.date_confirmation == datetime(1985, 3, 27, tzinfo=timezone.utc)
     assert case.hospitalized == hospitalized
 
 
@@ -60,7 +61,7 @@ def test_sim_saves_cases():
 
     location = case.location_information
     outcome = case.outcome
-    date_confirmation = case.date_confirmation
+    date_confirmation = case.date_confirmation.date()
     hospitalized = case.hospitalized
     expected = {
         "location_information": location,
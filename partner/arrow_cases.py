@@ -0,0 +1,81 @@
+"""
+Columnar encoding of case data as Arrow IPC streams
+"""
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from constants import CASE_FIELDS, DATE_FIELDS, FIELD_VALIDATIONS, VALID_DATE
+
+
+# Fields with few distinct values, stored once per batch
+DICTIONARY_FIELDS = frozenset(
+    ["pathogen"] + [k for k in FIELD_VALIDATIONS if k not in DATE_FIELDS]
+)
+
+
+def build_case_column(name: str, values: list) -> pa.Array:
+    """
+    Build a column of case data, typed by field
+
+    Args:
+        name (str): The case field
+        values (list): Field values, as strings or None, or case IDs
+
+    Returns:
+        pa.Array: The column
+
+    Raises:
+        pa.ArrowInvalid: Dates should be in the G.h date format
+    """
+
+    if name == "id":
+        return pa.array(values, type=pa.int32())
+    column = pa.array(values, type=pa.string())
+    if name in DATE_FIELDS:
+        return pc.strptime(column, format=VALID_DATE, unit="s").cast(pa.date32())
+    if name in DICTIONARY_FIELDS:
+        return column.dictionary_encode()
+    return column
+
+
+def encode_cases(db_cases: list[dict], pathogen_name: str) -> bytes:
+    """
+    Encode cases from the database as an Arrow IPC stream of one record batch
+
+    Args:
+        db_cases (list[dict]): Case data
+        pathogen_name (str): The name of the pathogen
+
+    Returns:
+        bytes: The Arrow IPC stream, or no bytes without cases
+    """
+
+    if not db_cases:
+        return b""
+    # Same fields as case messages
+    names = [k for k in db_cases[0] if k in CASE_FIELDS]
+    columns = {"pathogen": [pathogen_name] * len(db_cases)}
+    columns.update({name: [case[name] for case in db_cases] for name in names})
+    batch = pa.RecordBatch.from_pydict(
+        {name: build_case_column(name, values) for name, values in columns.items()}
+    )
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def read_cases(data: bytes) -> pa.Table:
+    """
+    Read cases from an Arrow IPC stream
+
+    Args:
+        data (bytes): The Arrow IPC stream
+
+    Returns:
+        pa.Table: The cases
+    """
+
+    return pa.ipc.open_stream(data).read_all()
@@ -0,0 +1,139 @@
+"""
+Validator for case data against the G.h schema, compiled once from the case message
+"""
+
+from datetime import date, datetime
+import re
+
+from google.protobuf.descriptor import Descriptor
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+# Date formats checked with a precompiled pattern instead of strptime, which is slow per call
+DATE_PATTERNS = {
+    "%m-%d-%Y": re.compile(
+        r"(?P<month>[0-9]{1,2})-(?P<day>[0-9]{1,2})-(?P<year>[0-9]{4})"
+    )
+}
+
+
+def parse_date(value: str, date_format: str) -> date:
+    """
+    Parse a date string, as strptime would
+
+    Args:
+        value (str): The date string
+        date_format (str): The date format
+
+    Returns:
+        date: The date
+
+    Raises:
+        ValueError: The date string should be a valid date in the format
+    """
+
+    pattern = DATE_PATTERNS.get(date_format)
+    if pattern is None:
+        return datetime.strptime(value, date_format).date()
+    match = pattern.fullmatch(value)
+    if match is None:
+        raise ValueError(f"time data {value!r} does not match format {date_format!r}")
+    return date(int(match["year"]), int(match["month"]), int(match["day"]))
+
+
+class CaseValidator:
+
+    """
+    Validator for the set fields of case messages
+
+    Allowed values are kept in sets, and dates are parsed with precompiled patterns.
+    Fields without validations are not checked.
+
+    Attributes:
+        field_validations (dict): Allowed values or date formats, by field name
+        allowed_values (dict[str, frozenset]): Allowed values, by field name
+        date_formats (dict[str, str]): Date formats, by field name
+    """
+
+    def __init__(
+        self, descriptor: Descriptor, field_validations: dict, date_fields: list
+    ):
+        """
+        Constructor for case validator
+
+        Args:
+            descriptor (Descriptor): The case message descriptor
+            field_validations (dict): Allowed values or date formats, by field name
+            date_fields (list): Names of date fields
+        """
+
+        self.field_validations = field_validations
+        self.allowed_values = {}
+        self.date_formats = {}
+        for name, validation in field_validations.items():
+            if name not in descriptor.fields_by_name:
+                # Cases cannot set fields outside the message
+                continue
+            if name in date_fields:
+                self.date_formats[name] = validation
+            else:
+                self.allowed_values[name] = frozenset(validation)
+
+    def validate(self, cases: list) -> None:
+        """
+        Validate case messages
+
+        Args:
+            cases (list): Case messages
+
+        Raises:
+            ValueError: Case fields should contain valid values
+        """
+
+        allowed_values = self.allowed_values
+        date_formats = self.date_formats
+        for case in cases:
+            # Only set fields are listed, as with MessageToDict
+            for field, value in case.ListFields():
+                name = field.name
+                valid_values = allowed_values.get(name)
+                if valid_values is not None:
+                    if value not in valid_values:
+                        raise ValueError(
+                            f"Field {name} is set to {value} but requires a value in {self.field_validations[name]}."
+                        )
+                    continue
+                date_format = date_formats.get(name)
+                if date_format is not None:
+                    parse_date(value, date_format)
+
+    def validate_table(self, table: pa.Table) -> None:
+        """
+        Validate cases in a table, checking each distinct value once
+
+        Args:
+            table (pa.Table): Cases, one column per field
+
+        Raises:
+            ValueError: Case fields should contain valid values
+        """
+
+        for name in table.column_names:
+            valid_values = self.allowed_values.get(name)
+            date_format = self.date_formats.get(name)
+            if valid_values is None and date_format is None:
+                continue
+            column = table.column(name)
+            if pa.types.is_date(column.type):
+                # Parsed when encoded
+                continue
+            for value in pc.unique(column.cast(pa.string())).to_pylist():
+                if value is None:
+                    continue
+                if valid_values is not None and value not in valid_values:
+                    raise ValueError(
+                        f"Field {name} is set to {value} but requires a value in {self.field_validations[name]}."
+                    )
+                if date_format is not None:
+                    parse_date(value, date_format)
@@ -0,0 +1,99 @@
+# Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
+"""Client and server classes corresponding to protobuf-defined services."""
+import grpc
+
+import cases_pb2 as cases__pb2
+
+
+class CasesStub(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.GetCases = channel.unary_unary(
+                '/Cases/GetCases',
+                request_serializer=cases__pb2.CasesRequest.SerializeToString,
+                response_deserializer=cases__pb2.CasesResponse.FromString,
+                )
+        self.StreamCases = channel.unary_stream(
+                '/Cases/StreamCases',
+                request_serializer=cases__pb2.CasesRequest.SerializeToString,
+                response_deserializer=cases__pb2.CasesChunk.FromString,
+                )
+
+
+class CasesServicer(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def GetCases(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def StreamCases(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_CasesServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'GetCases': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetCases,
+                    request_deserializer=cases__pb2.CasesRequest.FromString,
+                    response_serializer=cases__pb2.CasesResponse.SerializeToString,
+            ),
+            'StreamCases': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamCases,
+                    request_deserializer=cases__pb2.CasesRequest.FromString,
+                    response_serializer=cases__pb2.CasesChunk.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'Cases', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+
+
+ # This class is part of an EXPERIMENTAL API.
+class Cases(object):
+    """Missing associated documentation comment in .proto file."""
+
+    @staticmethod
+    def GetCases(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/Cases/GetCases',
+            cases__pb2.CasesRequest.SerializeToString,
+            cases__pb2.CasesResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def StreamCases(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/Cases/StreamCases',
+            cases__pb2.CasesRequest.SerializeToString,
+            cases__pb2.CasesChunk.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
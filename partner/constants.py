@@ -45,6 +45,35 @@ TABLE_NAME = os.environ.get("DB_TABLE_NAME")
 
 DB_CONNECTION = f"host={DB_HOST} dbname={DB_NAME} user={DB_USER} password={DB_PASSWORD}"
 
+# Process-wide database connection pool
+DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", 2))
+DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+
+# Rows fetched per round trip from server-side database cursors
+DB_BATCH_SIZE = int(os.environ.get("DB_BATCH_SIZE", 5000))
+
+# Notification channel for case inserts, used to invalidate cached results
+CASES_INSERTED_CHANNEL = f"{TABLE_NAME}_cases_inserted"
+
+# Cached R(t) results, in memory and optionally on disk
+RT_CACHE_SIZE = int(os.environ.get("RT_CACHE_SIZE", 128))
+RT_CACHE_DIR = os.environ.get("RT_CACHE_DIR", "")
+
+# State kept for incremental R(t) estimation, which survives case inserts
+RT_STATE_DIR = os.environ.get("RT_STATE_DIR", "")
+
+# Worker processes for R(t) estimation, and estimates that can wait for one
+RT_WORKERS = int(os.environ.get("RT_WORKERS", os.cpu_count() or 1))
+RT_QUEUE_DEPTH = int(os.environ.get("RT_QUEUE_DEPTH", 10))
+
+# Streamed case data is sent in bounded chunks to stay under gRPC message limits
+CASES_CHUNK_SIZE = int(os.environ.get("CASES_CHUNK_SIZE", 1000))
+MAX_CASES_CHUNK_SIZE = int(os.environ.get("MAX_CASES_CHUNK_SIZE", 10000))
+
+# Clients keep their channels alive with pings, which are allowed this often
+GRPC_MIN_PING_INTERVAL_MS = int(os.environ.get("GRPC_MIN_PING_INTERVAL_MS", 30000))
+
 LOCALSTACK_URL = os.environ.get("LOCALSTACK_URL")
 AWS_REGION = os.environ.get("AWS_DEFAULT_REGION")
 
@@ -55,6 +84,12 @@ USER_PASSWORD = os.environ.get("COGNITO_USER_PASSWORD")
 JWKS_HOST = os.environ.get("LOCALSTACK_URL")
 JWKS_FILE = os.environ.get("JWKS_FILE")
 
+# Seconds before cached user pool keys are fetched again
+JWKS_CACHE_TTL = int(os.environ.get("JWKS_CACHE_TTL", 3600))
+
+# Verified JWTs kept until they expire, so repeat calls skip signature checks
+VERIFIED_TOKEN_CACHE_SIZE = int(os.environ.get("VERIFIED_TOKEN_CACHE_SIZE", 1024))
+
 # Data validation fields
 CASE_FIELDS = Case.DESCRIPTOR.fields_by_name.keys()
 
@@ -2,34 +2,55 @@
 Partner gRPC server
 """
 
-from collections.abc import Callable
+from collections.abc import Callable, Iterator
 from concurrent import futures
 from ctypes import c_int
 from datetime import datetime
+from itertools import islice
 import logging
 import multiprocessing
 import os
 import sys
+import threading
 from typing import Any
 
 import boto3
-import cognitojwt
 from cryptography.hazmat.primitives import serialization
 from flask import Flask
 from flask.views import View
-from google.protobuf.json_format import MessageToDict
 import grpc
 from grpc_interceptor import ServerInterceptor
 from grpc_interceptor.exceptions import GrpcException
 import pika
-import psycopg
-from psycopg.rows import dict_row
 
-from cases_pb2 import Case, CasesResponse
+from cases_pb2 import Case, CaseEncoding, CasesChunk, CasesResponse
 from cases_pb2_grpc import add_CasesServicer_to_server, CasesServicer
-from rt_estimate_pb2 import RtEstimate, RtEstimateResponse
+from rt_estimate_pb2 import (
+    RtEstimate,
+    RtEstimateBatchResponse,
+    RtEstimateGroup,
+    RtEstimateResponse,
+)
 from rt_estimate_pb2_grpc import add_RtEstimatesServicer_to_server, RtEstimatesServicer
-from run_epyestim import estimate_rt
+from jwks import JwksCache, VerifiedTokenCache
+from db import (
+    close_pool,
+    get_db_daily_case_counts,
+    iter_db_cases,
+    iter_db_grouped_daily_case_counts,
+    listen_for_new_cases,
+)
+from arrow_cases import encode_cases, read_cases
+from case_validation import CaseValidator
+from rt_cache import get_cache_key, RtEstimateCache
+from run_epyestim import (
+    estimate_rt_from_counts,
+    estimate_rt_incremental,
+    estimate_rt_batch,
+    group_daily_counts,
+    BAG_PARAMETERS,
+)
+from workers import BoundedProcessPool, WorkQueueFullError
 from constants import (
     LOCALSTACK_URL,
     AWS_REGION,
@@ -38,12 +59,20 @@ from constants import (
     USER_PASSWORD,
     JWKS_HOST,
     JWKS_FILE,
-    DB_CONNECTION,
-    TABLE_NAME,
+    JWKS_CACHE_TTL,
+    VERIFIED_TOKEN_CACHE_SIZE,
     PARTNER_NAME,
-    CASE_FIELDS,
+    CASES_CHUNK_SIZE,
+    MAX_CASES_CHUNK_SIZE,
+    GRPC_MIN_PING_INTERVAL_MS,
+    RT_CACHE_SIZE,
+    RT_CACHE_DIR,
+    RT_STATE_DIR,
+    RT_WORKERS,
+    RT_QUEUE_DEPTH,
     FIELD_VALIDATIONS,
     DATE_FIELDS,
+    VALID_DATE,
     PATHOGEN_A,
     PATHOGEN_B,
     PATHOGEN_EXCHANGES,
@@ -71,6 +100,13 @@ FLASK_DEBUG = os.environ.get("FLASK_DEBUG", False)
 
 FLASK_APP = Flask(__name__)
 
+RT_CACHE = RtEstimateCache(RT_CACHE_SIZE, RT_CACHE_DIR)
+RT_STATE = RtEstimateCache(RT_CACHE_SIZE, RT_STATE_DIR)
+RT_WORKERS_POOL = BoundedProcessPool(RT_WORKERS, RT_QUEUE_DEPTH)
+JWKS_CACHE = JwksCache(COGNITO_CLIENT, AWS_REGION, JWKS_HOST, JWKS_FILE, JWKS_CACHE_TTL)
+VERIFIED_TOKENS = VerifiedTokenCache(VERIFIED_TOKEN_CACHE_SIZE)
+CASE_VALIDATOR = CaseValidator(Case.DESCRIPTOR, FIELD_VALIDATIONS, DATE_FIELDS)
+
 
 def setup_logger():
     """
@@ -163,34 +199,26 @@ def get_jwt(client_id: str) -> str:
     return token
 
 
-def get_db_cases(pathogen_name: str) -> list[dict]:
+def build_case(db_case: dict, pathogen_name: str) -> Case:
     """
-    Get cases from the database
+    Build a case message from a database row
 
     Args:
+        db_case (dict): Case data
         pathogen_name (str): The name of the pathogen
 
     Returns:
-        list[dict]: Case data
+        Case: The case message
     """
 
-    logging.debug(f"Getting cases from database for pathogen: {pathogen_name}")
-    results = []
-    try:
-        with psycopg.connect(DB_CONNECTION, row_factory=dict_row) as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    f"""SELECT * FROM "{TABLE_NAME}" WHERE pathogen = '{pathogen_name}';"""
-                )
-                results = cur.fetchall()
-    except Exception:
-        logging.exception("Could not get cases from database")
-        raise
-    finally:
-        conn.close()
-
-    logging.debug(f"Got cases from database: {results}")
-    return results
+    return Case(
+        id=db_case["id"],
+        location_information=db_case["location_information"],
+        outcome=db_case["outcome"],
+        date_confirmation=db_case["date_confirmation"],
+        hospitalized=db_case["hospitalized"],
+        pathogen=pathogen_name,
+    )
 
 
 class CountActiveChannelsInterceptor(ServerInterceptor):
@@ -231,13 +259,14 @@ class CountActiveChannelsInterceptor(ServerInterceptor):
         """
 
         response = None
+        streaming = False
         try:
-            with self.num_active_channels.get_lock():
-                self.num_active_channels.value += 1
-                logging.debug(
-                    f"increment num_active_channels: {self.num_active_channels.value}"
-                )
+            self.increment()
             response = method(request, context)
+            if isinstance(response, Iterator):
+                # Streamed responses stay active until the last chunk is sent
+                streaming = True
+                return self.count_stream(response)
             return response
         except GrpcException as e:
             context.set_code(e.status_code)
@@ -249,11 +278,46 @@ class CountActiveChannelsInterceptor(ServerInterceptor):
             raise
         finally:
             logging.info("End first interceptor")
-            with self.num_active_channels.get_lock():
-                self.num_active_channels.value -= 1
-                logging.debug(
-                    f"decrement num_active_channels: {self.num_active_channels.value}"
-                )
+            if not streaming:
+                self.decrement()
+
+    def count_stream(self, response: Iterator) -> Iterator:
+        """
+        Keep a streamed response counted as active until it completes
+
+        Args:
+            response (Iterator): The streamed response
+
+        Yields:
+            Any: Response messages
+        """
+
+        try:
+            yield from response
+        finally:
+            self.decrement()
+
+    def increment(self) -> None:
+        """
+        Increment the number of active gRPC channels
+        """
+
+        with self.num_active_channels.get_lock():
+            self.num_active_channels.value += 1
+            logging.debug(
+                f"increment num_active_channels: {self.num_active_channels.value}"
+            )
+
+    def decrement(self) -> None:
+        """
+        Decrement the number of active gRPC channels
+        """
+
+        with self.num_active_channels.get_lock():
+            self.num_active_channels.value -= 1
+            logging.debug(
+                f"decrement num_active_channels: {self.num_active_channels.value}"
+            )
 
 
 class JWTValidationInterceptor(ServerInterceptor):
@@ -314,21 +378,17 @@ def validate_jwt(metadata: dict) -> None:
         details = "No authorization header in request"
         raise GrpcException(status_code=status_code, details=details)
     token = auth_header.split()[-1]
+    if VERIFIED_TOKENS.contains(token):
+        return
 
-    # FIXME: matching
-    response = COGNITO_CLIENT.list_user_pools(MaxResults=1)
-    pool_id = response.get("UserPools", [])[0].get("Id")
-
-    # FIXME: Use only for localstack
-    jwks_url = f"{JWKS_HOST}/{pool_id}/{JWKS_FILE}"
-    logging.debug(f"Using JWKS at {jwks_url}")
-    os.environ["AWS_COGNITO_JWKS_PATH"] = jwks_url
     try:
-        _ = cognitojwt.decode(token, AWS_REGION, pool_id)
+        claims = JWKS_CACHE.decode(token)
     except Exception:
         details = "JWT validation failed"
         logging.exception(details)
         raise GrpcException(status_code=status_code, details=details)
+    VERIFIED_TOKENS.put(token, claims.get("exp", 0))
+    logging.debug(f"Verified token cache: {VERIFIED_TOKENS.stats()}")
 
 
 class CaseDataValidationInterceptor(ServerInterceptor):
@@ -359,31 +419,13 @@ class CaseDataValidationInterceptor(ServerInterceptor):
             response = method(request, context)
             response_type = type(response)
             logging.info(f"Response type: {response_type}")
+            if isinstance(response, Iterator):
+                return self.validate_stream(response)
             if response_type != CasesResponse:
-                return method(request, context)
-            dict_response = MessageToDict(response, preserving_proto_field_name=True)
-            for _, data in dict_response.items():
-                for elem in data:
-                    for k, v in elem.items():
-                        if k not in CASE_FIELDS:
-                            raise AttributeError(f"Field {k} not a valid case field")
-
-                        if k in FIELD_VALIDATIONS:
-                            # if k is a date-based field and v not m-d-Y, raise
-                            if k in DATE_FIELDS:
-                                try:
-                                    datetime.strptime(v, FIELD_VALIDATIONS[k])
-                                except ValueError:
-                                    raise
-                            # if k has an enum and v not in enum, raise
-                            else:
-                                valid_values = FIELD_VALIDATIONS[k]
-                                if v not in valid_values:
-                                    raise ValueError(
-                                        f"Field {k} is set to {v} but requires a value in {valid_values}."
-                                    )
+                return response
+            validate_case_data(response)
             logging.debug("Case data validated")
-            return method(request, context)
+            return response
         except GrpcException as e:
             logging.exception("gRPC exception during data validation")
             context.set_code(e.status_code)
@@ -393,6 +435,44 @@ class CaseDataValidationInterceptor(ServerInterceptor):
             logging.exception("Something went wrong during case data validation")
             raise
 
+    def validate_stream(self, response: Iterator) -> Iterator:
+        """
+        Validate case data contained in each chunk of a streamed response
+
+        Args:
+            response (Iterator): The streamed response
+
+        Yields:
+            Any: Validated response messages
+        """
+
+        for chunk in response:
+            if type(chunk) == CasesChunk:
+                try:
+                    validate_case_data(chunk)
+                except Exception:
+                    logging.exception(
+                        "Something went wrong during case data validation"
+                    )
+                    raise
+            yield chunk
+
+
+def validate_case_data(response: CasesResponse | CasesChunk) -> None:
+    """
+    Validate case data against the G.h schema
+
+    Args:
+        response (CasesResponse | CasesChunk): A message containing case data
+
+    Raises:
+        ValueError: Case fields should contain valid values
+    """
+
+    CASE_VALIDATOR.validate(response.cases)
+    if response.arrow_cases:
+        CASE_VALIDATOR.validate_table(read_cases(response.arrow_cases))
+
 
 class CasesService(CasesServicer):
 
@@ -413,19 +493,41 @@ class CasesService(CasesServicer):
         """
 
         logging.debug(f"Getting cases for pathogen {request.pathogen}")
-        db_cases = get_db_cases(request.pathogen)
-        cases = [
-            Case(
-                location_information=case["location_information"],
-                outcome=case["outcome"],
-                date_confirmation=case["date_confirmation"],
-                hospitalized=case["hospitalized"],
-                pathogen=request.pathogen,
+        db_cases = iter_db_cases(request.pathogen)
+        if request.encoding == CaseEncoding.CASE_ENCODING_ARROW:
+            return CasesResponse(
+                arrow_cases=encode_cases(list(db_cases), request.pathogen)
             )
-            for case in db_cases
-        ]
+        cases = [build_case(case, request.pathogen) for case in db_cases]
         return CasesResponse(cases=cases)
 
+    def StreamCases(self, request, context):
+        """
+        Stream case data in chunks, ordered by case ID
+
+        Args:
+            request (CasesRequest): A request for case data, optionally with a cursor to resume from
+            context (grpc._server._Context): Context for request
+
+        Yields:
+            CasesChunk: A chunk of case data, with a cursor for resuming the stream
+        """
+
+        chunk_size = min(request.chunk_size or CASES_CHUNK_SIZE, MAX_CASES_CHUNK_SIZE)
+        cursor = request.cursor
+        logging.debug(
+            f"Streaming cases for pathogen {request.pathogen} from cursor {cursor} in chunks of {chunk_size}"
+        )
+        db_cases = iter_db_cases(request.pathogen, cursor, chunk_size)
+        while db_chunk := list(islice(db_cases, chunk_size)):
+            cursor = db_chunk[-1]["id"]
+            if request.encoding == CaseEncoding.CASE_ENCODING_ARROW:
+                arrow_cases = encode_cases(db_chunk, request.pathogen)
+                yield CasesChunk(arrow_cases=arrow_cases, next_cursor=cursor)
+                continue
+            cases = [build_case(case, request.pathogen) for case in db_chunk]
+            yield CasesChunk(cases=cases, next_cursor=cursor)
+
 
 class RtEstimateService(RtEstimatesServicer):
 
@@ -446,24 +548,149 @@ class RtEstimateService(RtEstimatesServicer):
         """
 
         logging.debug(f"Getting R(t) estimates for pathogen {request.pathogen}")
-        db_cases = get_db_cases(request.pathogen)
-        date_range = [request.start_date, request.end_date]
+        daily_counts = get_db_daily_case_counts(
+            request.pathogen,
+            datetime.strptime(request.start_date, VALID_DATE).date(),
+            datetime.strptime(request.end_date, VALID_DATE).date(),
+        )
         quantiles = [request.q_lower, request.q_upper]
         gt_dist = request.gt_distribution
         delay_dist = request.delay_distribution
-        results = estimate_rt(db_cases, date_range, quantiles, gt_dist, delay_dist)
-        rt_estimates = [
-            RtEstimate(
-                date=estimate["date"].strftime("%m-%d-%Y"),
-                cases=str(int(estimate["cases"])),
-                r_mean=str(estimate["R_mean"]),
-                r_var=str(estimate["R_var"]),
-                q_lower=str(estimate["q_lower"]),
-                q_upper=str(estimate["q_upper"]),
+        # Incremental and full estimates differ, so neither is served for the other
+        cache_key = get_cache_key(
+            daily_counts,
+            quantiles,
+            gt_dist,
+            delay_dist,
+            BAG_PARAMETERS,
+            request.incremental,
+        )
+        results = RT_CACHE.get(request.pathogen, cache_key)
+        if results is None:
+            # Incremental state is keyed without counts, so it can be reused as they change
+            state_key = get_cache_key(
+                [], request.start_date, quantiles, gt_dist, delay_dist, BAG_PARAMETERS
+            )
+            try:
+                if request.incremental:
+                    future = RT_WORKERS_POOL.submit(
+                        estimate_rt_incremental,
+                        daily_counts,
+                        quantiles,
+                        list(gt_dist),
+                        list(delay_dist),
+                        RT_STATE.get(request.pathogen, state_key),
+                    )
+                else:
+                    future = RT_WORKERS_POOL.submit(
+                        estimate_rt_from_counts,
+                        daily_counts,
+                        quantiles,
+                        list(gt_dist),
+                        list(delay_dist),
+                    )
+            except WorkQueueFullError as e:
+                raise GrpcException(
+                    status_code=grpc.StatusCode.RESOURCE_EXHAUSTED, details=str(e)
+                )
+            if request.incremental:
+                results, state = future.result()
+                RT_STATE.put(request.pathogen, state_key, state)
+            else:
+                results = future.result()
+            RT_CACHE.put(request.pathogen, cache_key, results)
+        return RtEstimateResponse(estimates=build_rt_estimates(results))
+
+    def GetRtEstimatesBatch(self, request, context):
+        """
+        Get R(t) estimate data for each pathogen and location
+
+        Args:
+            request (RtEstimateBatchRequest): A request for R(t) estimate data
+            context (grpc._server._Context): Context for request
+
+        Returns:
+            RtEstimateBatchResponse: A response containing R(t) estimate data per pathogen and location
+        """
+
+        logging.debug(f"Getting batch R(t) estimates for pathogens {request.pathogens}")
+        rows = iter_db_grouped_daily_case_counts(
+            list(request.pathogens),
+            datetime.strptime(request.start_date, VALID_DATE).date(),
+            datetime.strptime(request.end_date, VALID_DATE).date(),
+        )
+        grouped_counts = group_daily_counts(rows)
+        quantiles = [request.q_lower, request.q_upper]
+        gt_dist = list(request.gt_distribution)
+        delay_dist = list(request.delay_distribution)
+
+        results = {}
+        cache_keys = {}
+        for group, daily_counts in grouped_counts.items():
+            cache_keys[group] = get_cache_key(
+                daily_counts, quantiles, gt_dist, delay_dist, BAG_PARAMETERS
             )
-            for estimate in results
-        ]
-        return RtEstimateResponse(estimates=rt_estimates)
+            cached = RT_CACHE.get(group[0], cache_keys[group])
+            if cached is not None:
+                results[group] = cached
+        uncached = {k: v for k, v in grouped_counts.items() if k not in results}
+
+        if uncached:
+            # Each group takes a slot in the pool, so batches share the queue bound
+            # Groups wait for slots within the request deadline, once the batch is admitted
+            try:
+                estimates = estimate_rt_batch(
+                    uncached,
+                    quantiles,
+                    gt_dist,
+                    delay_dist,
+                    RT_WORKERS_POOL,
+                    context.time_remaining() if context else None,
+                )
+            except WorkQueueFullError as e:
+                raise GrpcException(
+                    status_code=grpc.StatusCode.RESOURCE_EXHAUSTED, details=str(e)
+                )
+            for group, group_results in estimates.items():
+                if not isinstance(group_results, Exception):
+                    RT_CACHE.put(group[0], cache_keys[group], group_results)
+                results[group] = group_results
+
+        groups = []
+        for (pathogen, location), group_results in results.items():
+            group = RtEstimateGroup(
+                pathogen=pathogen, location_information=location or ""
+            )
+            if isinstance(group_results, Exception):
+                group.error = str(group_results)
+            else:
+                group.estimates.extend(build_rt_estimates(group_results))
+            groups.append(group)
+        return RtEstimateBatchResponse(groups=groups)
+
+
+def build_rt_estimates(results: list[dict]) -> list[RtEstimate]:
+    """
+    Build R(t) estimate messages from analysis results
+
+    Args:
+        results (list[dict]): Analysis results
+
+    Returns:
+        list[RtEstimate]: The R(t) estimate messages
+    """
+
+    return [
+        RtEstimate(
+            date=estimate["date"].strftime("%m-%d-%Y"),
+            cases=str(int(estimate["cases"])),
+            r_mean=str(estimate["R_mean"]),
+            r_var=str(estimate["R_var"]),
+            q_lower=str(estimate["q_lower"]),
+            q_upper=str(estimate["q_upper"]),
+        )
+        for estimate in results
+    ]
 
 
 class StatusView(View):
@@ -515,7 +742,12 @@ def make_grpc_server(max_workers: int, interceptors: list) -> grpc.Server:
     """
 
     return grpc.server(
-        futures.ThreadPoolExecutor(max_workers=max_workers), interceptors=interceptors
+        futures.ThreadPoolExecutor(max_workers=max_workers),
+        interceptors=interceptors,
+        options=[
+            ("grpc.keepalive_permit_without_calls", 1),
+            ("grpc.http2.min_ping_interval_without_data_ms", GRPC_MIN_PING_INTERVAL_MS),
+        ],
     )
 
 
@@ -534,6 +766,10 @@ def serve_grpc(server: grpc.Server, server_credentials) -> None:
     logging.debug("Added cases service")
     add_RtEstimatesServicer_to_server(RtEstimateService(), server)
     logging.debug("Added R(t) estimation service")
+    threading.Thread(
+        target=listen_for_new_cases, args=(RT_CACHE.invalidate,), daemon=True
+    ).start()
+    logging.debug("Listening for new cases")
     try:
         server.add_secure_port("[::]:50051", server_credentials)
         logging.debug("Starting gRPC server")
@@ -543,7 +779,11 @@ def serve_grpc(server: grpc.Server, server_credentials) -> None:
         raise
 
     logging.info("Serving gRPC")
-    server.wait_for_termination()
+    try:
+        server.wait_for_termination()
+    finally:
+        RT_WORKERS_POOL.shutdown()
+        close_pool()
 
 
 def run_flask_server() -> None:
@@ -618,7 +858,11 @@ def get_certificate_arn() -> str:
             return certificate.get("CertificateArn", "")
 
 
-if __name__ == "__main__":
+def main() -> None:
+    """
+    Start the AMQP consumers, gRPC server, and Flask server
+    """
+
     setup_logger()
     logging.info("Starting client")
 
@@ -673,3 +917,7 @@ if __name__ == "__main__":
             sys.exit(0)
         except SystemExit:
             os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
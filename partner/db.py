@@ -0,0 +1,242 @@
+"""
+Functions for interacting with the partner database
+"""
+
+from collections.abc import Callable, Iterator
+from datetime import date
+import logging
+import threading
+from time import sleep
+
+import psycopg
+from psycopg import sql
+from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool
+
+from constants import (
+    DB_CONNECTION,
+    TABLE_NAME,
+    DB_BATCH_SIZE,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_TIMEOUT,
+    CASES_INSERTED_CHANNEL,
+)
+
+
+# Only the columns the servicers need
+# Dates are formatted here, so the output does not depend on the server's DateStyle
+DB_CASE_COLUMNS = sql.SQL(", ").join(
+    [
+        sql.Identifier("id"),
+        sql.Identifier("location_information"),
+        sql.Identifier("outcome"),
+        sql.SQL("to_char(date_confirmation, 'MM-DD-YYYY') AS date_confirmation"),
+        sql.Identifier("hospitalized"),
+    ]
+)
+
+POOL = None
+POOL_LOCK = threading.Lock()
+
+LISTEN_RETRY_WAIT_TIME = 5
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Get the process-wide database connection pool, creating it on first use
+
+    Returns:
+        ConnectionPool: The connection pool
+    """
+
+    global POOL
+    with POOL_LOCK:
+        if POOL is None:
+            logging.info(
+                f"Opening database connection pool, size {DB_POOL_MIN_SIZE}-{DB_POOL_MAX_SIZE}"
+            )
+            POOL = ConnectionPool(
+                DB_CONNECTION,
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=DB_POOL_MAX_SIZE,
+                timeout=DB_POOL_TIMEOUT,
+                check=ConnectionPool.check_connection,
+                name="partner",
+                # Prepare parameterized queries on their first execution
+                kwargs={"prepare_threshold": 0},
+                open=True,
+            )
+    return POOL
+
+
+def close_pool() -> None:
+    """
+    Close the database connection pool, if open
+    """
+
+    global POOL
+    with POOL_LOCK:
+        if POOL is not None:
+            logging.info("Closing database connection pool")
+            POOL.close()
+            POOL = None
+
+
+def iter_db_cases(
+    pathogen_name: str,
+    cursor: int = 0,
+    batch_size: int = DB_BATCH_SIZE,
+    start_date: date | None = None,
+    end_date: date | None = None,
+) -> Iterator[dict]:
+    """
+    Stream cases from the database with a server-side cursor, ordered by ID
+
+    Args:
+        pathogen_name (str): The name of the pathogen
+        cursor (int, optional): Only get cases with an ID greater than this
+        batch_size (int, optional): The number of rows to fetch per round trip
+        start_date (date | None, optional): Only get cases confirmed on or after this date
+        end_date (date | None, optional): Only get cases confirmed on or before this date
+
+    Yields:
+        dict: Case data
+    """
+
+    logging.debug(f"Getting cases from database for pathogen: {pathogen_name}")
+    conditions = [sql.SQL("pathogen = %s"), sql.SQL("id > %s")]
+    params = [pathogen_name, cursor]
+    if start_date:
+        conditions.append(sql.SQL("date_confirmation >= %s"))
+        params.append(start_date)
+    if end_date:
+        conditions.append(sql.SQL("date_confirmation <= %s"))
+        params.append(end_date)
+    query = sql.SQL("SELECT {columns} FROM {table} WHERE {conditions} ORDER BY id")
+    query = query.format(
+        columns=DB_CASE_COLUMNS,
+        table=sql.Identifier(TABLE_NAME),
+        conditions=sql.SQL(" AND ").join(conditions),
+    )
+    num_cases = 0
+    try:
+        with get_pool().connection() as conn:
+            with conn.cursor(
+                name=f"{pathogen_name}_cases", row_factory=dict_row
+            ) as cur:
+                cur.itersize = batch_size
+                cur.execute(query, params)
+                for case in cur:
+                    num_cases += 1
+                    yield case
+    except Exception:
+        logging.exception("Could not get cases from database")
+        raise
+
+    logging.debug(f"Got {num_cases} cases from database")
+
+
+def get_db_daily_case_counts(
+    pathogen_name: str, start_date: date, end_date: date
+) -> list[tuple[date, int]]:
+    """
+    Count cases per day of confirmation in a date window, in the database
+
+    Args:
+        pathogen_name (str): The name of the pathogen
+        start_date (date): The first day of the window
+        end_date (date): The last day of the window
+
+    Returns:
+        list[tuple[date, int]]: (day, count) pairs, ordered by day, for days with cases
+    """
+
+    logging.debug(
+        f"Counting daily cases in database for pathogen {pathogen_name} from {start_date} to {end_date}"
+    )
+    query = sql.SQL(
+        """SELECT date_confirmation AS day, count(*) FROM {table}
+        WHERE pathogen = %s AND date_confirmation BETWEEN %s AND %s
+        GROUP BY day ORDER BY day"""
+    ).format(table=sql.Identifier(TABLE_NAME))
+    try:
+        with get_pool().connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (pathogen_name, start_date, end_date), prepare=True)
+                results = cur.fetchall()
+    except Exception:
+        logging.exception("Could not count cases in database")
+        raise
+
+    logging.debug(f"Got case counts for {len(results)} days from database")
+    return results
+
+
+def iter_db_grouped_daily_case_counts(
+    pathogen_names: list[str], start_date: date, end_date: date
+) -> Iterator[tuple[str, str, date, int]]:
+    """
+    Count cases per pathogen, location, and day of confirmation in a date window, in the database
+
+    Args:
+        pathogen_names (list[str]): The names of the pathogens, or an empty list for all pathogens
+        start_date (date): The first day of the window
+        end_date (date): The last day of the window
+
+    Yields:
+        tuple[str, str, date, int]: (pathogen, location, day, count) tuples, ordered by day within each group
+    """
+
+    logging.debug(
+        f"Counting daily cases in database for pathogens {pathogen_names} from {start_date} to {end_date}"
+    )
+    conditions = [sql.SQL("date_confirmation BETWEEN %s AND %s")]
+    params = [start_date, end_date]
+    if pathogen_names:
+        conditions.append(sql.SQL("pathogen = ANY(%s)"))
+        params.append(pathogen_names)
+    query = sql.SQL(
+        """SELECT pathogen, location_information, date_confirmation AS day, count(*)
+        FROM {table} WHERE {conditions}
+        GROUP BY pathogen, location_information, day
+        ORDER BY pathogen, location_information, day"""
+    ).format(
+        table=sql.Identifier(TABLE_NAME),
+        conditions=sql.SQL(" AND ").join(conditions),
+    )
+    try:
+        with get_pool().connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params, prepare=True)
+                yield from cur
+    except Exception:
+        logging.exception("Could not count cases in database")
+        raise
+
+
+def listen_for_new_cases(callback: Callable[[str], None]) -> None:
+    """
+    Call back with the pathogen name whenever cases are inserted, reconnecting as needed
+
+    Args:
+        callback (Callable[[str], None]): Function to call with the name of the pathogen
+    """
+
+    while True:
+        try:
+            # Held open indefinitely, so not taken from the pool
+            with psycopg.connect(DB_CONNECTION, autocommit=True) as conn:
+                conn.execute(
+                    sql.SQL("LISTEN {channel}").format(
+                        channel=sql.Identifier(CASES_INSERTED_CHANNEL)
+                    )
+                )
+                logging.info(f"Listening for new cases on {CASES_INSERTED_CHANNEL}")
+                for notification in conn.notifies():
+                    callback(notification.payload)
+        except Exception:
+            logging.exception(
+                f"Stopped listening for new cases, retrying in {LISTEN_RETRY_WAIT_TIME} seconds"
+            )
+            sleep(LISTEN_RETRY_WAIT_TIME)
@@ -0,0 +1,264 @@
+"""
+Caches for the Cognito user pool keys used to verify JWTs, and for verified JWTs
+"""
+
+from collections import OrderedDict
+import hashlib
+import logging
+import threading
+from time import monotonic, time
+from typing import Any
+
+from jose import jwt
+from jose.exceptions import JWTError
+import requests
+
+
+# Minimum seconds between fetches for unknown key IDs, so bad tokens cannot flood the pool
+MIN_REFRESH_INTERVAL = 10
+
+# Seconds to wait for the JWKS host
+JWKS_REQUEST_TIMEOUT = 10
+
+
+class JwksCache:
+
+    """
+    Cognito user pool signing keys by key ID, for verifying JWTs locally
+
+    The user pool ID is looked up once. Keys are fetched again when they expire, or
+    when a token is signed with a key ID not seen before.
+
+    Attributes:
+        cognito_client (Any): The Cognito identity provider client
+        region (str): The AWS region of the user pool
+        jwks_host (str | None): The host serving keys, or None for Cognito
+        jwks_file (str | None): The path of the keys under the user pool, with a JWKS host
+        ttl (int): Seconds before keys are fetched again
+        pool_id (str | None): The user pool ID, once looked up
+        keys (dict[str, dict]): Public keys, by key ID
+        fetched_at (float | None): When keys were last fetched
+        lock (threading.Lock): Lock for the pool ID and keys
+    """
+
+    def __init__(
+        self,
+        cognito_client: Any,
+        region: str,
+        jwks_host: str | None,
+        jwks_file: str | None,
+        ttl: int,
+    ):
+        """
+        Constructor for JWKS cache
+
+        Args:
+            cognito_client (Any): The Cognito identity provider client
+            region (str): The AWS region of the user pool
+            jwks_host (str | None): The host serving keys, or None for Cognito
+            jwks_file (str | None): The path of the keys under the user pool, with a JWKS host
+            ttl (int): Seconds before keys are fetched again
+        """
+
+        self.cognito_client = cognito_client
+        self.region = region
+        self.jwks_host = jwks_host
+        self.jwks_file = jwks_file
+        self.ttl = ttl
+        self.pool_id = None
+        self.keys = {}
+        self.fetched_at = None
+        self.lock = threading.Lock()
+
+    def decode(self, token: str) -> dict:
+        """
+        Verify a JWT signature and expiry, and decode its claims
+
+        Args:
+            token (str): The JWT
+
+        Returns:
+            dict: The claims
+
+        Raises:
+            JWTError: The JWT should be signed by a user pool key, and not expired
+        """
+
+        kid = jwt.get_unverified_header(token).get("kid")
+        if not kid:
+            raise JWTError("No key ID in JWT header")
+        key = self.get_key(kid)
+        # Same checks as cognitojwt: signature and expiry, no audience
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[key.get("alg", "RS256")],
+            options={"verify_aud": False},
+        )
+
+    def get_key(self, kid: str) -> dict:
+        """
+        Get a public key, fetching keys if it is unknown or keys have expired
+
+        Args:
+            kid (str): The key ID
+
+        Returns:
+            dict: The key, as a JWK
+
+        Raises:
+            JWTError: The key should belong to the user pool
+        """
+
+        with self.lock:
+            now = monotonic()
+            expired = self.fetched_at is None or now - self.fetched_at >= self.ttl
+            unknown = kid not in self.keys and (
+                self.fetched_at is None or now - self.fetched_at >= MIN_REFRESH_INTERVAL
+            )
+            if expired or unknown:
+                self.refresh()
+            key = self.keys.get(kid)
+        if key is None:
+            raise JWTError(f"Unknown key ID {kid}")
+        return key
+
+    def refresh(self) -> None:
+        """
+        Fetch the user pool keys, with the lock held
+        """
+
+        if self.pool_id is None:
+            self.pool_id = self.get_pool_id()
+        jwks_url = self.get_jwks_url()
+        logging.info(f"Fetching JWKS from {jwks_url}")
+        response = requests.get(jwks_url, timeout=JWKS_REQUEST_TIMEOUT)
+        response.raise_for_status()
+        self.keys = {k["kid"]: k for k in response.json().get("keys", [])}
+        self.fetched_at = monotonic()
+
+    def get_pool_id(self) -> str:
+        """
+        Look up the user pool ID
+
+        Returns:
+            str: The user pool ID
+        """
+
+        # FIXME: matching
+        response = self.cognito_client.list_user_pools(MaxResults=1)
+        pool_id = response.get("UserPools", [])[0].get("Id")
+        logging.debug(f"Pool id: {pool_id}")
+        return pool_id
+
+    def get_jwks_url(self) -> str:
+        """
+        Get the URL of the user pool keys
+
+        Returns:
+            str: The URL
+        """
+
+        if self.jwks_host:
+            return f"{self.jwks_host}/{self.pool_id}/{self.jwks_file}"
+        return f"https://cognito-idp.{self.region}.amazonaws.com/{self.pool_id}/.well-known/jwks.json"
+
+
+class VerifiedTokenCache:
+
+    """
+    LRU cache of verified JWTs, each valid until the token expires
+
+    Tokens are kept as hashes, so the cache holds no credentials.
+
+    Attributes:
+        max_entries (int): The maximum number of tokens kept
+        entries (OrderedDict[str, float]): Expiry times, by token hash, least recently used first
+        hits (int): The number of lookups for a verified token
+        misses (int): The number of lookups for an unknown or expired token
+        lock (threading.Lock): Lock for entries and counters
+    """
+
+    def __init__(self, max_entries: int):
+        """
+        Constructor for verified token cache
+
+        Args:
+            max_entries (int): The maximum number of tokens kept
+        """
+
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_key(token: str) -> str:
+        """
+        Hash a token
+
+        Args:
+            token (str): The JWT
+
+        Returns:
+            str: The cache key
+        """
+
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def contains(self, token: str) -> bool:
+        """
+        Check whether a token was verified and has not expired since
+
+        Args:
+            token (str): The JWT
+
+        Returns:
+            bool: Whether the token can be trusted without verifying it again
+        """
+
+        key = self.get_key(token)
+        with self.lock:
+            exp = self.entries.get(key)
+            if exp is not None and exp > time():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True
+            if exp is not None:
+                del self.entries[key]
+            self.misses += 1
+            return False
+
+    def put(self, token: str, exp: float) -> None:
+        """
+        Record a verified token, evicting the least recently used tokens if full
+
+        Args:
+            token (str): The JWT
+            exp (float): When the token expires, in seconds since the epoch
+        """
+
+        if self.max_entries <= 0 or exp <= time():
+            return
+        key = self.get_key(token)
+        with self.lock:
+            self.entries[key] = exp
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """
+        Get the hit and miss counts
+
+        Returns:
+            dict: Hits, misses and the number of tokens kept
+        """
+
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self.entries),
+            }
@@ -0,0 +1,191 @@
+"""
+Cache for R(t) estimation results
+"""
+
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import threading
+from typing import Any
+
+
+def get_cache_key(daily_counts: list[tuple], *parameters) -> str:
+    """
+    Fingerprint daily case counts and estimation parameters
+
+    Args:
+        daily_counts (list[tuple]): (day, count) pairs
+        parameters (Any): Estimation parameters, such as quantiles and distributions
+
+    Returns:
+        str: The cache key
+    """
+
+    data = {
+        "counts": [(day.isoformat(), int(count)) for day, count in daily_counts],
+        "parameters": parameters,
+    }
+    # Repeated protobuf fields serialize as lists
+    return hashlib.sha256(json.dumps(data, default=list).encode("utf-8")).hexdigest()
+
+
+class RtEstimateCache:
+
+    """
+    LRU cache of R(t) estimation results or state, with an optional on-disk tier
+
+    Attributes:
+        max_entries (int): The maximum number of results kept in memory
+        cache_dir (str): Directory for results on disk, or an empty string to keep results in memory only
+        entries (OrderedDict): Results and pathogen names, by cache key, least recently used first
+        lock (threading.Lock): Lock for entries
+    """
+
+    def __init__(self, max_entries: int, cache_dir: str = ""):
+        """
+        Constructor for R(t) estimate cache
+
+        Args:
+            max_entries (int): The maximum number of results kept in memory
+            cache_dir (str, optional): Directory for results on disk
+        """
+
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, pathogen: str, key: str) -> Any:
+        """
+        Get cached results, checking memory first and then disk
+
+        Args:
+            pathogen (str): The name of the pathogen the results are for
+            key (str): The cache key
+
+        Returns:
+            Any: The results, or None if not cached
+        """
+
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                logging.debug(f"R(t) cache hit for {key}")
+                return self.entries[key][1]
+
+        results = self.read_file(pathogen, key)
+        if results is None:
+            logging.debug(f"R(t) cache miss for {key}")
+            return None
+        logging.debug(f"R(t) disk cache hit for {key}")
+        self.put_in_memory(key, pathogen, results)
+        return results
+
+    def put(self, pathogen: str, key: str, results: Any) -> None:
+        """
+        Cache results
+
+        Args:
+            pathogen (str): The name of the pathogen the results are for
+            key (str): The cache key
+            results (Any): The results
+        """
+
+        self.put_in_memory(key, pathogen, results)
+        self.write_file(pathogen, key, results)
+
+    def put_in_memory(self, key: str, pathogen: str, results: Any) -> None:
+        """
+        Cache results in memory, evicting the least recently used results if full
+
+        Args:
+            key (str): The cache key
+            pathogen (str): The name of the pathogen the results are for
+            results (Any): The results
+        """
+
+        with self.lock:
+            self.entries[key] = (pathogen, results)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, pathogen: str) -> None:
+        """
+        Drop cached results for a pathogen, from memory and disk
+
+        Args:
+            pathogen (str): The name of the pathogen
+        """
+
+        logging.info(f"Invalidating cached R(t) estimates for pathogen {pathogen}")
+        with self.lock:
+            for key in [k for k, v in self.entries.items() if v[0] == pathogen]:
+                del self.entries[key]
+        if self.cache_dir:
+            shutil.rmtree(self.get_pathogen_dir(pathogen), ignore_errors=True)
+
+    def get_pathogen_dir(self, pathogen: str) -> str:
+        """
+        Get the directory for a pathogen's results on disk
+
+        Args:
+            pathogen (str): The name of the pathogen
+
+        Returns:
+            str: The directory
+        """
+
+        name = hashlib.sha256(pathogen.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, name)
+
+    def read_file(self, pathogen: str, key: str) -> Any:
+        """
+        Read cached results from disk, if enabled
+
+        Args:
+            pathogen (str): The name of the pathogen the results are for
+            key (str): The cache key
+
+        Returns:
+            Any: The results, or None if not on disk
+        """
+
+        if not self.cache_dir:
+            return None
+        file_name = os.path.join(self.get_pathogen_dir(pathogen), f"{key}.pkl")
+        try:
+            with open(file_name, "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logging.exception(f"Could not read cached R(t) estimates {file_name}")
+            return None
+
+    def write_file(self, pathogen: str, key: str, results: Any) -> None:
+        """
+        Write cached results to disk, if enabled
+
+        Args:
+            pathogen (str): The name of the pathogen the results are for
+            key (str): The cache key
+            results (Any): The results
+        """
+
+        if not self.cache_dir:
+            return
+        pathogen_dir = self.get_pathogen_dir(pathogen)
+        file_name = os.path.join(pathogen_dir, f"{key}.pkl")
+        try:
+            os.makedirs(pathogen_dir, exist_ok=True)
+            temp_file_name = f"{file_name}.{threading.get_ident()}.tmp"
+            with open(temp_file_name, "wb") as f:
+                pickle.dump(results, f)
+            os.replace(temp_file_name, file_name)
+        except Exception:
+            logging.exception(f"Could not write cached R(t) estimates {file_name}")
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: rt_estimate.proto
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x11rt_estimate.proto\"\xb7\x01\n\x11RtEstimateRequest\x12\x10\n\x08pathogen\x18\x01 \x01(\t\x12\x12\n\nstart_date\x18\x02 \x01(\t\x12\x10\n\x08\x65nd_date\x18\x03 \x01(\t\x12\x0f\n\x07q_lower\x18\x04 \x01(\x02\x12\x0f\n\x07q_upper\x18\x05 \x01(\x02\x12\x17\n\x0fgt_distribution\x18\x06 \x03(\x02\x12\x1a\n\x12\x64\x65lay_distribution\x18\x07 \x03(\x02\x12\x13\n\x0bincremental\x18\x08 \x01(\x08\"j\n\nRtEstimate\x12\x0c\n\x04\x64\x61te\x18\x01 \x01(\t\x12\r\n\x05\x63\x61ses\x18\x02 \x01(\t\x12\x0e\n\x06r_mean\x18\x03 \x01(\t\x12\r\n\x05r_var\x18\x04 \x01(\t\x12\x0f\n\x07q_lower\x18\x05 \x01(\t\x12\x0f\n\x07q_upper\x18\x06 \x01(\t\"4\n\x12RtEstimateResponse\x12\x1e\n\testimates\x18\x01 \x03(\x0b\x32\x0b.RtEstimate\"\xa8\x01\n\x16RtEstimateBatchRequest\x12\x11\n\tpathogens\x18\x01 \x03(\t\x12\x12\n\nstart_date\x18\x02 \x01(\t\x12\x10\n\x08\x65nd_date\x18\x03 \x01(\t\x12\x0f\n\x07q_lower\x18\x04 \x01(\x02\x12\x0f\n\x07q_upper\x18\x05 \x01(\x02\x12\x17\n\x0fgt_distribution\x18\x06 \x03(\x02\x12\x1a\n\x12\x64\x65lay_distribution\x18\x07 \x03(\x02\"p\n\x0fRtEstimateGroup\x12\x10\n\x08pathogen\x18\x01 \x01(\t\x12\x1c\n\x14location_information\x18\x02 \x01(\t\x12\x1e\n\testimates\x18\x03 \x03(\x0b\x32\x0b.RtEstimate\x12\r\n\x05\x65rror\x18\x04 \x01(\t\";\n\x17RtEstimateBatchResponse\x12 \n\x06groups\x18\x01 \x03(\x0b\x32\x10.RtEstimateGroup2\x92\x01\n\x0bRtEstimates\x12\x39\n\x0eGetRtEstimates\x12\x12.RtEstimateRequest\x1a\x13.RtEstimateResponse\x12H\n\x13GetRtEstimatesBatch\x12\x17.RtEstimateBatchRequest\x1a\x18.RtEstimateBatchResponseb\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'rt_estimate_pb2', _globals)
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _globals['_RTESTIMATEREQUEST']._serialized_start=22
+  _globals['_RTESTIMATEREQUEST']._serialized_end=205
+  _globals['_RTESTIMATE']._serialized_start=207
+  _globals['_RTESTIMATE']._serialized_end=313
+  _globals['_RTESTIMATERESPONSE']._serialized_start=315
+  _globals['_RTESTIMATERESPONSE']._serialized_end=367
+  _globals['_RTESTIMATEBATCHREQUEST']._serialized_start=370
+  _globals['_RTESTIMATEBATCHREQUEST']._serialized_end=538
+  _globals['_RTESTIMATEGROUP']._serialized_start=540
+  _globals['_RTESTIMATEGROUP']._serialized_end=652
+  _globals['_RTESTIMATEBATCHRESPONSE']._serialized_start=654
+  _globals['_RTESTIMATEBATCHRESPONSE']._serialized_end=713
+  _globals['_RTESTIMATES']._serialized_start=716
+  _globals['_RTESTIMATES']._serialized_end=862
+# @@protoc_insertion_point(module_scope)
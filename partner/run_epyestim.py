@@ -2,13 +2,28 @@
 R(t) analysis module
 """
 
+from collections import defaultdict
+from collections.abc import Iterable
 from datetime import datetime
 import logging
+from time import monotonic
 
 from epyestim import bagging_r
 import numpy as np
 import pandas as pd
 
+from workers import BoundedProcessPool, WorkQueueFullError
+
+
+A_PRIOR = 1
+B_PRIOR = 3
+N_SAMPLES = 100
+SMOOTHING_WINDOW = 14
+R_WINDOW_SIZE = 1
+
+# Estimation settings that change results, beyond those in requests
+BAG_PARAMETERS = (A_PRIOR, B_PRIOR, N_SAMPLES, SMOOTHING_WINDOW, R_WINDOW_SIZE)
+
 
 def bag(
     cases: pd.Series, quantiles: list, gt_dist: list, delay_dist: list
@@ -33,17 +48,64 @@ def bag(
         confirmed_cases=cases,
         gt_distribution=gt_distribution,
         delay_distribution=delay_distribution,
-        a_prior=1,
-        b_prior=3,
-        n_samples=100,
-        smoothing_window=14,
-        r_window_size=1,
+        a_prior=A_PRIOR,
+        b_prior=B_PRIOR,
+        n_samples=N_SAMPLES,
+        smoothing_window=SMOOTHING_WINDOW,
+        r_window_size=R_WINDOW_SIZE,
         quantiles=quantiles,
     )
 
 
+def daily_case_series(counts: pd.Series) -> pd.Series:
+    """
+    Turn case counts per day into a cumulative series over a complete daily calendar
+
+    Args:
+        counts (pd.Series): Case counts, indexed by day
+
+    Returns:
+        pd.Series: Running case counts for every day from the first to the last day with cases
+    """
+
+    counts = counts.sort_index()
+    if counts.empty:
+        return counts
+    calendar = pd.date_range(counts.index[0], counts.index[-1], freq="D")
+    return counts.reindex(calendar, fill_value=0).cumsum()
+
+
+def count_cases_by_day(
+    partner_cases: list | pd.DataFrame, start_date: datetime, end_date: datetime
+) -> pd.Series:
+    """
+    Count cases per day of confirmation in a time period
+
+    Args:
+        partner_cases (list | pd.DataFrame): Case data, with dates of confirmation in m-d-Y format
+        start_date (datetime): The first day of the time period
+        end_date (datetime): The last day of the time period
+
+    Returns:
+        pd.Series: Case counts, indexed by day
+    """
+
+    if isinstance(partner_cases, pd.DataFrame):
+        dates = partner_cases["date_confirmation"]
+    else:
+        dates = pd.Series(
+            [case.get("date_confirmation") for case in partner_cases], dtype=object
+        )
+    # Count distinct date strings first, so each is only parsed once
+    counts = dates.value_counts(sort=False)
+    counts.index = pd.to_datetime(counts.index, format="%m-%d-%Y")
+    counts = counts.groupby(level=0).sum()
+    in_range = (counts.index >= start_date) & (counts.index <= end_date)
+    return counts[in_range]
+
+
 def estimate_rt(
-    partner_cases: list,
+    partner_cases: list | pd.DataFrame,
     date_range: list,
     quantiles: list,
     gt_dist: list,
@@ -53,7 +115,7 @@ def estimate_rt(
     Perform R(t) estimation
 
     Args:
-        partner_cases (list): Case data
+        partner_cases (list | pd.DataFrame): Case data
         date_range (list): Time period for analysis
         quantiles (list): Points in a distribution that relate to its rank order of values
         gt_dist (list): The generation time distribution
@@ -72,22 +134,222 @@ def estimate_rt(
     logging.debug(f"Lower quantile: {q_lower}, upper quantile: {q_upper}")
     logging.debug(f"G(t) distribution: {gt_dist}")
     logging.debug(f"Delay distribution: {delay_dist}")
-    counts_by_day = {}
-    for case in partner_cases:
-        date = case.get("date_confirmation")
-        dt_date = datetime.strptime(date, "%m-%d-%Y")
-        if dt_date < start_date or dt_date > end_date:
-            continue
-        if counts_by_day.get(dt_date):
-            counts_by_day[dt_date] += 1
+    counts = count_cases_by_day(partner_cases, start_date, end_date)
+    cases = daily_case_series(counts)
+    return bag_records(cases, quantiles, gt_dist, delay_dist)
+
+
+def estimate_rt_from_counts(
+    daily_counts: list[tuple],
+    quantiles: list,
+    gt_dist: list,
+    delay_dist: list,
+) -> list[dict]:
+    """
+    Perform R(t) estimation on daily case counts
+
+    Args:
+        daily_counts (list[tuple]): (day, count) pairs, for days in the time period for analysis
+        quantiles (list): Points in a distribution that relate to its rank order of values
+        gt_dist (list): The generation time distribution
+        delay_dist (list): The delay distribution
+
+    Returns:
+        list[dict]: Analysis results
+    """
+
+    logging.debug(f"Estimating R(t) from counts for {len(daily_counts)} days")
+    cases = daily_case_series(counts_to_series(daily_counts))
+    return bag_records(cases, quantiles, gt_dist, delay_dist)
+
+
+def estimate_rt_incremental(
+    daily_counts: list[tuple],
+    quantiles: list,
+    gt_dist: list,
+    delay_dist: list,
+    state: dict | None = None,
+) -> tuple[list[dict], dict]:
+    """
+    Perform R(t) estimation on daily case counts, reusing a previous estimation
+
+    Only the days that changed counts can affect through smoothing and the delay
+    and generation time distributions are re-estimated. Those days are estimated from
+    a separate bootstrap over a window starting that many days before them, and
+    spliced onto results for earlier days kept from the previous estimation.
+
+    This is an approximation of a full run: the window covers the counts each
+    re-estimated day depends on, but bootstrap samples, and smoothing at the start
+    of the window, differ from those over the whole period. Re-estimated days agree
+    with a full run to within bootstrap noise.
+
+    Args:
+        daily_counts (list[tuple]): (day, count) pairs, for days in the time period for analysis
+        quantiles (list): Points in a distribution that relate to its rank order of values
+        gt_dist (list): The generation time distribution
+        delay_dist (list): The delay distribution
+        state (dict | None, optional): State from a previous estimation with the same parameters
+
+    Returns:
+        tuple[list[dict], dict]: Analysis results, and state for the next estimation
+    """
+
+    cases = daily_case_series(counts_to_series(daily_counts))
+    if state is not None:
+        previous = state["cases"]
+        n_days = min(len(previous), len(cases))
+        if n_days and previous.index[0] == cases.index[0]:
+            changed = np.flatnonzero(previous.values[:n_days] != cases.values[:n_days])
+            first_changed = changed[0] if len(changed) else n_days
+            if first_changed == len(cases) == len(previous):
+                logging.debug("No changes in daily case counts since last estimation")
+                return state["results"], state
+            # Days whose estimates can depend on a given day's count, either side of it
+            affected_days = SMOOTHING_WINDOW + len(gt_dist) + len(delay_dist)
+            # Estimates from this day on can depend on changed counts
+            cutoff_day = min(first_changed, len(cases)) - affected_days
+            # Estimates from the cutoff day on depend on counts this far back, so the
+            # window starts earlier again, and results before the cutoff are discarded
+            tail_start = cutoff_day - affected_days
+            if tail_start > 0:
+                logging.debug(
+                    f"Estimating R(t) for last {len(cases) - tail_start} of {len(cases)} days"
+                )
+                cutoff = cases.index[cutoff_day]
+                tail = bag_records(
+                    cases.iloc[tail_start:], quantiles, gt_dist, delay_dist
+                )
+                results = [r for r in state["results"] if r["date"] < cutoff] + [
+                    r for r in tail if r["date"] >= cutoff
+                ]
+                return results, {"cases": cases, "results": results}
+
+    logging.debug(f"Estimating R(t) for all {len(cases)} days")
+    results = bag_records(cases, quantiles, gt_dist, delay_dist)
+    return results, {"cases": cases, "results": results}
+
+
+def counts_to_series(daily_counts: list[tuple]) -> pd.Series:
+    """
+    Turn (day, count) pairs into case counts indexed by day
+
+    Args:
+        daily_counts (list[tuple]): (day, count) pairs
+
+    Returns:
+        pd.Series: Case counts, indexed by day
+    """
+
+    return pd.Series(
+        [count for _, count in daily_counts],
+        index=pd.DatetimeIndex([day for day, _ in daily_counts]),
+        dtype="int64",
+    )
+
+
+def group_daily_counts(rows: Iterable[tuple]) -> dict[tuple, list[tuple]]:
+    """
+    Group daily case counts by pathogen and location, in one pass
+
+    Args:
+        rows (Iterable[tuple]): (pathogen, location, day, count) tuples
+
+    Returns:
+        dict[tuple, list[tuple]]: (day, count) pairs, by (pathogen, location)
+    """
+
+    groups = defaultdict(list)
+    for pathogen, location, day, count in rows:
+        groups[(pathogen, location)].append((day, count))
+    return dict(groups)
+
+
+def estimate_rt_batch(
+    grouped_counts: dict[tuple, list[tuple]],
+    quantiles: list,
+    gt_dist: list,
+    delay_dist: list,
+    executor: BoundedProcessPool,
+    timeout: float | None = None,
+) -> dict[tuple, list[dict] | Exception]:
+    """
+    Perform R(t) estimation for groups of daily case counts in parallel
+
+    The first group must be admitted by the pool at once. Later groups wait for room,
+    which the batch's own groups free as they finish, until the timeout.
+
+    Args:
+        grouped_counts (dict[tuple, list[tuple]]): (day, count) pairs, by group
+        quantiles (list): Points in a distribution that relate to its rank order of values
+        gt_dist (list): The generation time distribution
+        delay_dist (list): The delay distribution
+        executor (BoundedProcessPool): The process pool to run estimation in
+        timeout (float | None, optional): Seconds to wait for room for all groups, or None to wait until there is room
+
+    Returns:
+        dict[tuple, list[dict] | Exception]: Analysis results, or the error estimating them, by group
+
+    Raises:
+        WorkQueueFullError: The pool should have room for at least one group
+    """
+
+    logging.debug(f"Estimating R(t) for {len(grouped_counts)} groups")
+    deadline = None if timeout is None else monotonic() + timeout
+    futures = {}
+    results = {}
+    for group, daily_counts in grouped_counts.items():
+        if not futures:
+            wait = 0
+        elif deadline is None:
+            wait = None
         else:
-            counts_by_day[dt_date] = 1
-    running_count = 0
-    for day, count in counts_by_day.items():
-        running_count += count
-        counts_by_day[day] = running_count
-    cases = pd.Series(counts_by_day, index=counts_by_day.keys())
-    results = bag(cases.sort_index(), quantiles, gt_dist, delay_dist)
+            wait = deadline - monotonic()
+        try:
+            futures[group] = executor.submit_waiting(
+                wait,
+                estimate_rt_from_counts,
+                daily_counts,
+                quantiles,
+                gt_dist,
+                delay_dist,
+            )
+        except WorkQueueFullError as e:
+            if not futures:
+                raise
+            logging.warning(f"No room to estimate R(t) for group {group} in time")
+            results[group] = e
+        except Exception as e:
+            logging.exception(f"Could not submit R(t) estimation for group {group}")
+            results[group] = e
+    for group, future in futures.items():
+        try:
+            results[group] = future.result()
+        except Exception as e:
+            logging.exception(f"Could not estimate R(t) for group {group}")
+            results[group] = e
+
+    return results
+
+
+def bag_records(
+    cases: pd.Series, quantiles: list, gt_dist: list, delay_dist: list
+) -> list[dict]:
+    """
+    Compute aggregated bootstrapped R, and return one record per day
+
+    Args:
+        cases (pd.Series): Case data, indexed by day
+        quantiles (list): Points in a distribution that relate to its rank order of values
+        gt_dist (list): The generation time distribution
+        delay_dist (list): The delay distribution
+
+    Returns:
+        list[dict]: Analysis results
+    """
+
+    q_lower = quantiles[0]
+    q_upper = quantiles[1]
+    results = bag(cases, quantiles, gt_dist, delay_dist)
     results.reset_index(inplace=True)
     results.rename(
         columns={"index": "date", f"Q{q_lower}": "q_lower", f"Q{q_upper}": "q_upper"},
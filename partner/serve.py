@@ -0,0 +1,12 @@
+"""
+Partner data server entry point
+
+R(t) worker processes are spawned, and re-import the main module. This module
+imports the server only when run, so workers do not create its clients,
+caches, and pools.
+"""
+
+if __name__ == "__main__":
+    from data_server import main
+
+    main()
@@ -5,8 +5,10 @@ Partner database setup script for local development and testing
 import logging
 
 import psycopg
+from psycopg import sql
 
-from constants import DB_CONNECTION, TABLE_NAME
+from constants import TABLE_NAME, CASES_INSERTED_CHANNEL
+from db import close_pool, get_pool
 
 
 def setup_database() -> None:
@@ -15,24 +17,102 @@ def setup_database() -> None:
     """
 
     logging.info(f"Creating table {TABLE_NAME}")
-    with psycopg.connect(DB_CONNECTION) as conn:
+    table = sql.Identifier(TABLE_NAME)
+    with get_pool().connection() as conn:
         with conn.cursor() as cur:
             cur.execute(
-                f"""
-                CREATE TABLE IF NOT EXISTS "{TABLE_NAME}" (
+                sql.SQL(
+                    """
+                CREATE TABLE IF NOT EXISTS {table} (
                     id serial PRIMARY KEY,
                     location_information text,
                     outcome text,
-                    date_confirmation text,
+                    date_confirmation date,
                     hospitalized text,
                     pathogen text
                     )
                 """
+                ).format(table=table)
+            )
+            migrate_date_column(cur, table)
+            # Per-pathogen date windows, and per-pathogen streaming by ID
+            logging.info(f"Creating indexes on table {TABLE_NAME}")
+            for columns in [("pathogen", "date_confirmation"), ("pathogen", "id")]:
+                index = sql.Identifier(f"{TABLE_NAME}_{'_'.join(columns)}_idx")
+                query = sql.SQL(
+                    "CREATE INDEX IF NOT EXISTS {index} ON {table} ({columns})"
+                )
+                cur.execute(
+                    query.format(
+                        index=index,
+                        table=table,
+                        columns=sql.SQL(", ").join(map(sql.Identifier, columns)),
+                    )
+                )
+            # Notify listeners (such as cached R(t) results) of new cases per pathogen
+            logging.info(f"Creating case insert notifications on table {TABLE_NAME}")
+            function = sql.Identifier(f"{TABLE_NAME}_notify_cases_inserted")
+            cur.execute(
+                sql.SQL(
+                    """
+                CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+                BEGIN
+                    PERFORM pg_notify({channel}, NEW.pathogen);
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql
+                """
+                ).format(function=function, channel=sql.Literal(CASES_INSERTED_CHANNEL))
+            )
+            cur.execute(
+                sql.SQL(
+                    """
+                CREATE OR REPLACE TRIGGER {trigger} AFTER INSERT ON {table}
+                FOR EACH ROW EXECUTE FUNCTION {function}()
+                """
+                ).format(
+                    trigger=sql.Identifier(f"{TABLE_NAME}_cases_inserted"),
+                    table=table,
+                    function=function,
+                )
             )
             conn.commit()
 
 
+def migrate_date_column(cur: psycopg.Cursor, table: sql.Identifier) -> None:
+    """
+    Convert text dates in tables created before dates were stored as dates
+
+    Args:
+        cur (psycopg.Cursor): A database cursor
+        table (sql.Identifier): The case table
+
+    Raises:
+        psycopg.DataError: Text dates should be in MM-DD-YYYY format
+    """
+
+    cur.execute(
+        """SELECT data_type FROM information_schema.columns
+        WHERE table_name = %s AND column_name = 'date_confirmation'""",
+        (TABLE_NAME,),
+    )
+    row = cur.fetchone()
+    if row is None or row[0] == "date":
+        return
+    logging.info(f"Converting text dates in table {TABLE_NAME}")
+    # Parsed with an explicit format, rather than the server's DateStyle
+    cur.execute(
+        sql.SQL(
+            """ALTER TABLE {table} ALTER COLUMN date_confirmation TYPE date
+            USING to_date(NULLIF(date_confirmation, ''), 'MM-DD-YYYY')"""
+        ).format(table=table)
+    )
+
+
 if __name__ == "__main__":
     logging.info("Setting up database")
-    setup_database()
+    try:
+        setup_database()
+    finally:
+        close_pool()
     logging.info("Done setting up database")
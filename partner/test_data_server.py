@@ -2,24 +2,47 @@
 Partner data server test suite
 """
 
+from concurrent.futures import Future
+from datetime import date, datetime, timedelta
 import json
+import math
 import os
+import time
 
 import boto3
 from google.protobuf.json_format import MessageToDict
 import grpc
+from grpc_interceptor.exceptions import GrpcException
+import pandas as pd
 import pika
 import pika.exceptions
 import psycopg
+import pyarrow as pa
 import pytest
 import requests
 
-from cases_pb2 import CasesRequest
+from cases_pb2 import Case, CaseEncoding, CasesRequest, CasesResponse
 from cases_pb2_grpc import CasesStub
-from rt_estimate_pb2 import RtEstimateRequest
+from rt_estimate_pb2 import RtEstimateBatchRequest, RtEstimateRequest
 from rt_estimate_pb2_grpc import RtEstimatesStub
 
-from data_server import get_client_id, get_jwt, FLASK_PORT, get_certificate_arn
+import data_server
+from data_server import (
+    get_client_id,
+    get_jwt,
+    FLASK_PORT,
+    get_certificate_arn,
+    validate_case_data,
+)
+from jwks import VerifiedTokenCache
+from case_validation import CaseValidator, parse_date
+from arrow_cases import read_cases
+from run_epyestim import (
+    SMOOTHING_WINDOW,
+    estimate_rt_from_counts,
+    estimate_rt_incremental,
+)
+from workers import BoundedProcessPool, WorkQueueFullError
 from constants import (
     PATHOGEN_A,
     PATHOGENS,
@@ -30,6 +53,9 @@ from constants import (
     LOCALSTACK_URL,
     AWS_REGION,
     TABLE_NAME,
+    FIELD_VALIDATIONS,
+    DATE_FIELDS,
+    VALID_DATE,
 )
 
 
@@ -138,6 +164,52 @@ def get_cases(pathogen_name: str) -> list:
     return MessageToDict(response, preserving_proto_field_name=True).get("cases")
 
 
+def stream_cases(pathogen_name: str, cursor: int = 0, chunk_size: int = 0) -> list:
+    """
+    Stream case data from the database in chunks
+
+    Args:
+        pathogen_name (str): Pathogen name
+        cursor (int, optional): The case ID to resume after
+        chunk_size (int, optional): The maximum number of cases per chunk
+
+    Returns:
+        list: Chunks of case data
+    """
+
+    try:
+        credentials = get_client_credentials()
+        channel = grpc.secure_channel(f"{GRPC_HOST}:{GRPC_PORT}", credentials)
+        client = CasesStub(channel)
+        request = CasesRequest(
+            pathogen=pathogen_name, cursor=cursor, chunk_size=chunk_size
+        )
+        chunks = [
+            MessageToDict(chunk, preserving_proto_field_name=True)
+            for chunk in client.StreamCases(request)
+        ]
+    except Exception as exc:
+        print(f"Could not make gRPC request: {exc}")
+        raise
+
+    return chunks
+
+
+def strip_ids(cases: list[dict]) -> list[dict]:
+    """
+    Drop case IDs, which are set by the database
+
+    Args:
+        cases (list[dict]): Case data
+
+    Returns:
+        list[dict]: Case data without IDs
+    """
+
+    assert all(case.get("id") for case in cases)
+    return [{k: v for k, v in case.items() if k != "id"} for case in cases]
+
+
 def reset_database() -> None:
     """
     Delete all rows from a database table
@@ -188,7 +260,60 @@ def test_client_serves_cases_from_db():
     expected = [TEST_CASE]
     insert_case(PATHOGEN_A, expected[0])
     actual = get_cases(PATHOGEN_A)
-    assert expected == actual
+    assert expected == strip_ids(actual)
+
+
+def test_client_streams_cases_in_chunks():
+    """
+    The client should stream cases in bounded chunks that can be resumed
+    """
+
+    reset_database()
+    for _ in range(5):
+        insert_case(PATHOGEN_A, TEST_CASE)
+
+    chunks = stream_cases(PATHOGEN_A, chunk_size=2)
+    assert [len(chunk.get("cases")) for chunk in chunks] == [2, 2, 1]
+    cases = [case for chunk in chunks for case in chunk.get("cases")]
+    assert strip_ids(cases) == [TEST_CASE] * 5
+    assert [case["id"] for case in cases] == sorted(case["id"] for case in cases)
+
+    resumed = stream_cases(PATHOGEN_A, cursor=chunks[0].get("next_cursor"))
+    assert [len(chunk.get("cases")) for chunk in resumed] == [3]
+
+    reset_database()
+
+
+def test_client_serves_cases_as_arrow():
+    """
+    The client should serve cases as Arrow record batches when requested
+    """
+
+    reset_database()
+    for _ in range(3):
+        insert_case(PATHOGEN_A, TEST_CASE)
+
+    credentials = get_client_credentials()
+    channel = grpc.secure_channel(f"{GRPC_HOST}:{GRPC_PORT}", credentials)
+    client = CasesStub(channel)
+    request = CasesRequest(
+        pathogen=PATHOGEN_A, encoding=CaseEncoding.CASE_ENCODING_ARROW
+    )
+    response = client.GetCases(request)
+    assert not response.cases
+
+    table = read_cases(response.arrow_cases)
+    assert table.num_rows == 3
+    assert pa.types.is_dictionary(table.schema.field("outcome").type)
+    assert table.schema.field("date_confirmation").type == pa.date32()
+    assert table.column("outcome").to_pylist() == [TEST_CASE["outcome"]] * 3
+    assert all(table.column("id").to_pylist())
+    assert table.column("date_confirmation").to_pylist() == [date(2023, 1, 1)] * 3
+
+    chunks = list(client.StreamCases(request))
+    assert sum(read_cases(c.arrow_cases).num_rows for c in chunks) == 3
+
+    reset_database()
 
 
 def test_client_estimates_rt():
@@ -263,6 +388,294 @@ def test_client_estimates_rt():
     reset_database()
 
 
+def test_rt_estimates_cached():
+    """
+    The client should reuse R(t) estimates until new cases are added
+    """
+
+    for day in range(1, 31):
+        for _ in range(10):
+            insert_case(
+                PATHOGEN_A, {**TEST_CASE, "date_confirmation": f"01-{day}-2023"}
+            )
+
+    credentials = get_client_credentials()
+    channel = grpc.secure_channel(f"{GRPC_HOST}:{GRPC_PORT}", credentials)
+    client = RtEstimatesStub(channel)
+    request = RtEstimateRequest(
+        start_date="01-01-2023",
+        end_date="01-31-2023",
+        q_lower=0.3,
+        q_upper=0.7,
+        gt_distribution=[0.25, 0.5, 0.25],
+        delay_distribution=[0.1, 0.5, 0.4],
+        pathogen=PATHOGEN_A,
+    )
+
+    # Bootstrapped estimates differ between runs, so matching results come from the cache
+    first = client.GetRtEstimates(request)
+    second = client.GetRtEstimates(request)
+    assert first == second
+
+    reset_database()
+
+
+def test_rt_estimates_incremental():
+    """
+    The client should update R(t) estimates incrementally as cases are added
+    """
+
+    for month, days in [(1, 31), (2, 28)]:
+        for day in range(1, days + 1):
+            for _ in range(5):
+                insert_case(
+                    PATHOGEN_A,
+                    {**TEST_CASE, "date_confirmation": f"{month}-{day}-2023"},
+                )
+
+    credentials = get_client_credentials()
+    channel = grpc.secure_channel(f"{GRPC_HOST}:{GRPC_PORT}", credentials)
+    client = RtEstimatesStub(channel)
+    request = RtEstimateRequest(
+        start_date="01-01-2023",
+        end_date="03-31-2023",
+        q_lower=0.3,
+        q_upper=0.7,
+        gt_distribution=[0.25, 0.5, 0.25],
+        delay_distribution=[0.1, 0.5, 0.4],
+        pathogen=PATHOGEN_A,
+        incremental=True,
+    )
+    first = client.GetRtEstimates(request)
+
+    for day in range(1, 8):
+        for _ in range(5):
+            insert_case(
+                PATHOGEN_A, {**TEST_CASE, "date_confirmation": f"03-{day}-2023"}
+            )
+    second = client.GetRtEstimates(request)
+
+    # Bootstrapped estimates differ between runs, so matching early days were reused
+    assert len(second.estimates) > len(first.estimates)
+    assert second.estimates[:30] == first.estimates[:30]
+
+    reset_database()
+
+
+def test_rt_estimates_incremental_match_full():
+    """
+    Incrementally re-estimated days should match a full estimate, within bootstrap noise
+    """
+
+    quantiles = [0.3, 0.7]
+    gt_dist = [0.25, 0.5, 0.25]
+    delay_dist = [0.1, 0.5, 0.4]
+    daily_counts = [
+        (date(2023, 1, 1) + timedelta(days=day), int(20 + 15 * math.sin(day / 9)))
+        for day in range(66)
+    ]
+    _, state = estimate_rt_incremental(
+        daily_counts[:59], quantiles, gt_dist, delay_dist
+    )
+    incremental, _ = estimate_rt_incremental(
+        daily_counts, quantiles, gt_dist, delay_dist, state
+    )
+    full = estimate_rt_from_counts(daily_counts, quantiles, gt_dist, delay_dist)
+
+    assert [r["date"] for r in incremental] == [r["date"] for r in full]
+    # Earlier days are reused, and days the added counts can affect are re-estimated
+    cutoff_day = 59 - (SMOOTHING_WINDOW + len(gt_dist) + len(delay_dist))
+    cutoff = pd.Timestamp(daily_counts[cutoff_day][0])
+    reused = [r for r in incremental if r["date"] < cutoff]
+    assert reused == [r for r in state["results"] if r["date"] < cutoff]
+    recomputed = [r for r in incremental if r["date"] >= cutoff]
+    assert recomputed
+    for actual, expected in zip(recomputed, full[len(reused) :]):
+        assert actual["date"] == expected["date"]
+        for key in ["cases", "R_mean", "q_lower", "q_upper"]:
+            assert actual[key] == pytest.approx(expected[key], rel=0.05)
+
+
+def test_rt_estimates_batch():
+    """
+    The client should provide R(t) estimate data for each location in one request
+    """
+
+    locations = ["USA", "Canada"]
+    for location in locations:
+        for day in range(1, 31):
+            for _ in range(10):
+                insert_case(
+                    PATHOGEN_A,
+                    {
+                        **TEST_CASE,
+                        "location_information": location,
+                        "date_confirmation": f"01-{day}-2023",
+                    },
+                )
+
+    credentials = get_client_credentials()
+    channel = grpc.secure_channel(f"{GRPC_HOST}:{GRPC_PORT}", credentials)
+    client = RtEstimatesStub(channel)
+    request = RtEstimateBatchRequest(
+        pathogens=[PATHOGEN_A],
+        start_date="01-01-2023",
+        end_date="01-31-2023",
+        q_lower=0.3,
+        q_upper=0.7,
+        gt_distribution=[0.25, 0.5, 0.25],
+        delay_distribution=[0.1, 0.5, 0.4],
+    )
+    response = client.GetRtEstimatesBatch(request)
+
+    assert sorted(g.location_information for g in response.groups) == sorted(locations)
+    for group in response.groups:
+        assert group.pathogen == PATHOGEN_A
+        assert not group.error
+        assert group.estimates
+
+    reset_database()
+
+
+def test_rt_estimates_queue_bounded(monkeypatch):
+    """
+    R(t) requests should be rejected once the workers are busy and the queue is full
+    """
+
+    pool = BoundedProcessPool(1, 1)
+    try:
+        running = pool.submit(time.sleep, 2)
+        queued = pool.submit(time.sleep, 0)
+        with pytest.raises(WorkQueueFullError):
+            pool.submit(time.sleep, 0)
+
+        monkeypatch.setattr(data_server, "RT_WORKERS_POOL", pool)
+        monkeypatch.setattr(
+            data_server,
+            "get_db_daily_case_counts",
+            lambda *args: [(date(2023, 1, day), 10) for day in range(1, 31)],
+        )
+        request = RtEstimateRequest(
+            pathogen=PATHOGEN_A,
+            start_date="01-01-2023",
+            end_date="01-31-2023",
+            q_lower=0.1,
+            q_upper=0.9,
+            gt_distribution=[0.25, 0.5, 0.25],
+            delay_distribution=[0.1, 0.5, 0.4],
+        )
+        with pytest.raises(GrpcException) as exc_info:
+            data_server.RtEstimateService().GetRtEstimates(request, None)
+        assert exc_info.value.status_code == grpc.StatusCode.RESOURCE_EXHAUSTED
+
+        running.result()
+        queued.result()
+    finally:
+        pool.shutdown()
+
+
+def test_rt_estimates_cached_by_mode(monkeypatch):
+    """
+    Incremental and full R(t) estimates should be cached separately
+    """
+
+    submitted = []
+
+    class ImmediatePool:
+        def submit(self, fn, *args):
+            submitted.append(fn)
+            future = Future()
+            future.set_result(([], None) if fn is estimate_rt_incremental else [])
+            return future
+
+    monkeypatch.setattr(data_server, "RT_WORKERS_POOL", ImmediatePool())
+    monkeypatch.setattr(data_server, "RT_CACHE", data_server.RtEstimateCache(8))
+    monkeypatch.setattr(data_server, "RT_STATE", data_server.RtEstimateCache(8))
+    monkeypatch.setattr(
+        data_server,
+        "get_db_daily_case_counts",
+        lambda *args: [(date(2023, 1, day), 10) for day in range(1, 31)],
+    )
+    service = data_server.RtEstimateService()
+    for incremental in [False, True, False, True]:
+        request = RtEstimateRequest(
+            pathogen=PATHOGEN_A,
+            start_date="01-01-2023",
+            end_date="01-31-2023",
+            q_lower=0.1,
+            q_upper=0.9,
+            gt_distribution=[0.25, 0.5, 0.25],
+            delay_distribution=[0.1, 0.5, 0.4],
+            incremental=incremental,
+        )
+        service.GetRtEstimates(request, None)
+    assert submitted == [estimate_rt_from_counts, estimate_rt_incremental]
+
+
+def test_rt_estimates_batch_queue_bounded(monkeypatch):
+    """
+    Batches should be admitted while the queue has room, and their groups wait for slots within the deadline
+    """
+
+    class Context:
+        def __init__(self, time_remaining):
+            self.remaining = time_remaining
+
+        def time_remaining(self):
+            return self.remaining
+
+    pool = BoundedProcessPool(1, 1)
+    try:
+        monkeypatch.setattr(data_server, "RT_WORKERS_POOL", pool)
+        monkeypatch.setattr(data_server, "RT_CACHE", data_server.RtEstimateCache(0))
+        locations = ["Ottawa", "Toronto", "Montreal"]
+        monkeypatch.setattr(
+            data_server,
+            "iter_db_grouped_daily_case_counts",
+            lambda *args: [
+                (PATHOGEN_A, location, date(2023, 1, day), 10)
+                for location in locations
+                for day in range(1, 31)
+            ],
+        )
+        request = RtEstimateBatchRequest(
+            pathogens=[PATHOGEN_A],
+            start_date="01-01-2023",
+            end_date="01-31-2023",
+            q_lower=0.1,
+            q_upper=0.9,
+            gt_distribution=[0.25, 0.5, 0.25],
+            delay_distribution=[0.1, 0.5, 0.4],
+        )
+        service = data_server.RtEstimateService()
+
+        # More groups than slots: later groups wait for earlier ones
+        running = pool.submit(time.sleep, 2)
+        response = service.GetRtEstimatesBatch(request, Context(None))
+        assert len(response.groups) == len(locations)
+        assert not [g for g in response.groups if g.error]
+        running.result()
+
+        # Groups without a slot by the deadline fail, and the rest are estimated
+        running = pool.submit(time.sleep, 2)
+        response = service.GetRtEstimatesBatch(request, Context(0))
+        errors = [g for g in response.groups if g.error]
+        assert len(response.groups) == len(locations)
+        assert len(errors) == len(locations) - 1
+        running.result()
+
+        # Batches are rejected only when no group can be admitted
+        running = pool.submit(time.sleep, 2)
+        queued = pool.submit(time.sleep, 0)
+        with pytest.raises(GrpcException) as exc_info:
+            service.GetRtEstimatesBatch(request, Context(None))
+        assert exc_info.value.status_code == grpc.StatusCode.RESOURCE_EXHAUSTED
+        running.result()
+        queued.result()
+    finally:
+        pool.shutdown()
+
+
 def test_multiple_outbreaks():
     """
     The client should support case data for multiple pathogens
@@ -274,7 +687,7 @@ def test_multiple_outbreaks():
         insert_case(pathogen_name, expected[0])
 
         actual = get_cases(pathogen_name)
-        assert expected == actual
+        assert expected == strip_ids(actual)
 
         reset_database()
 
@@ -294,6 +707,32 @@ def test_schema_violations():
         }
     ]
 
+    with pytest.raises(ValueError):
+        validate_case_data(CasesResponse(cases=[Case(**cases[0])]))
+    invalid_date = Case(pathogen=PATHOGEN_A, date_confirmation="Wednesday")
+    with pytest.raises(ValueError):
+        validate_case_data(CasesResponse(cases=[invalid_date]))
+
+
+def test_schema_violations_from_db():
+    """
+    The client should error when stored data violates the G.h schema
+    """
+
+    # Dates are validated by the database column type
+    with pytest.raises(psycopg.DataError):
+        insert_case(PATHOGEN_A, {**TEST_CASE, "date_confirmation": "Wednesday"})
+
+    cases = [
+        {
+            "location_information": "USA",
+            "outcome": "A-OK",
+            "pathogen": PATHOGEN_A,
+            "date_confirmation": "01-01-2023",
+            "hospitalized": "Sure",
+        }
+    ]
+
     insert_case(PATHOGEN_A, cases[0])
 
     with pytest.raises(grpc._channel._InactiveRpcError):
@@ -302,6 +741,103 @@ def test_schema_violations():
     reset_database()
 
 
+def test_invalid_jwt_rejected():
+    """
+    The client should reject tokens not signed by the user pool, with keys cached
+    """
+
+    acm_client = boto3.client(
+        "acm", endpoint_url=LOCALSTACK_URL, region_name=AWS_REGION
+    )
+    response = acm_client.get_certificate(CertificateArn=get_certificate_arn())
+    certificate = bytes(response.get("Certificate"), encoding="utf8")
+    channel = grpc.secure_channel(
+        f"{GRPC_HOST}:{GRPC_PORT}", grpc.ssl_channel_credentials(certificate)
+    )
+    client = CasesStub(channel)
+
+    token = get_jwt(get_client_id())
+    header, payload, signature = token.split(".")
+    middle = len(signature) // 2
+    flipped = "A" if signature[middle] != "A" else "B"
+    forged = f"{header}.{payload}.{signature[:middle]}{flipped}{signature[middle + 1:]}"
+
+    # The first call fetches the keys, and later calls reuse them
+    _ = client.GetCases(
+        CasesRequest(pathogen=PATHOGEN_A),
+        metadata=[("authorization", f"bearer {token}")],
+    )
+    with pytest.raises(grpc.RpcError) as exc_info:
+        _ = client.GetCases(
+            CasesRequest(pathogen=PATHOGEN_A),
+            metadata=[("authorization", f"bearer {forged}")],
+        )
+    assert exc_info.value.code() == grpc.StatusCode.UNAUTHENTICATED
+
+
+def test_verified_tokens_cached():
+    """
+    Verified tokens should be trusted until they expire, least recently used first out
+    """
+
+    cache = VerifiedTokenCache(2)
+    assert not cache.contains("a")
+
+    cache.put("a", time.time() + 60)
+    cache.put("b", time.time() + 60)
+    assert cache.contains("a")
+    cache.put("c", time.time() + 60)
+    assert not cache.contains("b")
+    assert cache.contains("a")
+
+    cache.put("d", time.time() - 1)
+    assert not cache.contains("d")
+    assert cache.stats() == {"hits": 2, "misses": 3, "size": 2}
+
+
+def test_case_validator():
+    """
+    The case validator should check set enum and date fields
+    """
+
+    validator = CaseValidator(Case.DESCRIPTOR, FIELD_VALIDATIONS, DATE_FIELDS)
+    validator.validate([Case(**TEST_CASE), Case(pathogen=PATHOGEN_A)])
+
+    with pytest.raises(ValueError):
+        validator.validate([Case(**TEST_CASE), Case(outcome="A-OK")])
+    with pytest.raises(ValueError):
+        validator.validate([Case(date_confirmation="2023-01-01")])
+
+    # Dates should parse as with strptime
+    for value in ["01-31-2023", "1-2-2023", "12-31-1999"]:
+        assert (
+            parse_date(value, VALID_DATE) == datetime.strptime(value, VALID_DATE).date()
+        )
+    for value in ["02-30-2023", "13-01-2023", "00-10-2023", "01-01-23", "01/01/2023"]:
+        with pytest.raises(ValueError):
+            datetime.strptime(value, VALID_DATE)
+        with pytest.raises(ValueError):
+            parse_date(value, VALID_DATE)
+
+
+def test_case_queries_indexed():
+    """
+    The case table should be indexed for per-pathogen date windows
+    """
+
+    with psycopg.connect(DB_CONNECTION) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT indexdef FROM pg_indexes WHERE tablename = %s", (TABLE_NAME,)
+            )
+            index_definitions = [row[0] for row in cur.fetchall()]
+
+    assert any(
+        "(pathogen, date_confirmation)" in definition
+        for definition in index_definitions
+    )
+
+
 def test_idle_status():
     """
     The partner should return an idle status when idle
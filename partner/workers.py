@@ -0,0 +1,142 @@
+"""
+Process pool for CPU-bound work, kept off the gRPC server threads
+"""
+
+from collections.abc import Callable
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+import logging
+import multiprocessing
+import threading
+
+
+class WorkQueueFullError(Exception):
+
+    """
+    Raised when the pool has no room for more work
+    """
+
+    pass
+
+
+class BoundedProcessPool(Executor):
+
+    """
+    Process pool that rejects work once its workers are busy and its queue is full
+
+    Attributes:
+        max_workers (int): The number of worker processes
+        max_queued (int): The number of jobs that can wait for a worker
+        slots (threading.BoundedSemaphore): Room for running and queued jobs
+        executor (ProcessPoolExecutor | None): The process pool, created on first use
+        lock (threading.Lock): Lock for creating and shutting down the process pool
+    """
+
+    def __init__(self, max_workers: int, max_queued: int):
+        """
+        Constructor for bounded process pool
+
+        Args:
+            max_workers (int): The number of worker processes
+            max_queued (int): The number of jobs that can wait for a worker
+        """
+
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.slots = threading.BoundedSemaphore(max_workers + max_queued)
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        """
+        Get the process pool, creating it on first use
+
+        Returns:
+            ProcessPoolExecutor: The process pool
+        """
+
+        with self.lock:
+            if self.executor is None:
+                logging.info(f"Starting process pool with {self.max_workers} workers")
+                # Forking a process with running gRPC threads is unsafe
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self.executor
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """
+        Run a function in a worker process, if the pool has room for it now
+
+        Args:
+            fn (Callable): The function, which must be importable by worker processes
+            args (Any): Arguments for the function, which must be picklable
+
+        Returns:
+            Future: The pending result
+
+        Raises:
+            WorkQueueFullError: The pool should have room for more work
+        """
+
+        return self.submit_waiting(0, fn, *args)
+
+    def submit_waiting(self, timeout: float | None, fn: Callable, *args) -> Future:
+        """
+        Run a function in a worker process, waiting for the pool to have room for it
+
+        Args:
+            timeout (float | None): Seconds to wait for room, or None to wait until there is room
+            fn (Callable): The function, which must be importable by worker processes
+            args (Any): Arguments for the function, which must be picklable
+
+        Returns:
+            Future: The pending result
+
+        Raises:
+            WorkQueueFullError: The pool should have room for more work within the timeout
+        """
+
+        self.acquire(timeout)
+        try:
+            future = self.get_executor().submit(fn, *args)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def acquire(self, timeout: float | None = 0) -> None:
+        """
+        Take room for one job
+
+        Args:
+            timeout (float | None, optional): Seconds to wait for room, or None to wait until there is room
+
+        Raises:
+            WorkQueueFullError: The pool should have room for more work within the timeout
+        """
+
+        if timeout is not None and timeout <= 0:
+            acquired = self.slots.acquire(blocking=False)
+        else:
+            acquired = self.slots.acquire(timeout=timeout)
+        if not acquired:
+            raise WorkQueueFullError(
+                f"All {self.max_workers} workers busy and {self.max_queued} jobs queued"
+            )
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = True) -> None:
+        """
+        Shut down the process pool, if started
+
+        Args:
+            wait (bool, optional): Whether to wait for running jobs to finish
+            cancel_futures (bool, optional): Whether to cancel queued jobs
+        """
+
+        with self.lock:
+            if self.executor is not None:
+                logging.info("Shutting down process pool")
+                self.executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+                self.executor = None